@@ -6,7 +6,6 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.test.client import RequestFactory
 from post.views import post_list
-from service.utils.check_friend import check_friend
 from post.serializers import Post, PostSerializer
 import json
 import re
@@ -106,21 +105,8 @@ def chatgpt_response(request):
 
 def get_all_posts(request):
     author = request.user.author
-    follow_objects = author.following.filter(pending='no')
-    posts = Post.objects.filter(visibility='public') # all public
-    posts = posts | Post.objects.filter(author=author) # all mine
-    
-    if follow_objects: 
-        for follow in follow_objects:
-            if follow.pending == 'no':
-
-                if check_friend(follow.followed, author):
-                    posts = posts | Post.objects.filter(author=follow.followed, visibility__in=['unlisted', 'friends'])
-                else:
-                    posts = posts | Post.objects.filter(author=follow.followed, visibility='unlisted')
-    
-     
-    posts = posts.filter(is_deleted=False, visibility__in=['unlisted', 'friends', 'public'], content_type__in=['text/markdown', 'text/plain']).order_by("-updated_at")
+    # the author's materialized stream, text posts only
+    posts = Post.objects.filter(feed_entries__owner=author, content_type__in=['text/markdown', 'text/plain']).select_related('author').order_by("-feed_entries__updated_at")
     serializer = PostSerializer(posts, many=True, context={'request': request})
     posts = serializer.data
     
@@ -148,6 +148,32 @@ else:
     # }
     # }
 
+# Cache shared by every web worker and the scheduler process. The friend graph and the
+# token versions cached in it decide who sees friends-only posts and which login tokens
+# are revoked, so a change handled by one process must invalidate them for all of them;
+# a per-process cache (Django's default) cannot. Lookups in the database cache are
+# queries, so the hot entries are also kept in each process for a few seconds
+# (service/utils/local_cache.py).
+# The table is created by `python manage.py createcachetable`.
+# Responses of public objects (service/utils/response_cache.py) go to an in-memory cache
+# of their own instead: a hit in the database cache costs about as many queries as the
+# view. Each process has its own, so with several web workers point "responses" at a
+# shared memcached or redis for a change to drop the responses of every worker; a
+# per-process cache drops them in the worker that handled the change and the others
+# serve them until RESPONSE_CACHE_TIMEOUT (never once the post is private or deleted).
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "django_cache",
+        "OPTIONS": {"MAX_ENTRIES": 50000},
+    },
+    "responses": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        "LOCATION": "responses",
+        "OPTIONS": {"MAX_ENTRIES": 5000},
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -239,4 +265,92 @@ APSCHEDULER_DATETIME_FORMAT = "N j, Y, f:s a"
 # Longer running jobs should probably be handed over to a background task processing library
 # that supports multiple background worker processes instead (e.g. Dramatiq, Celery, Django-RQ,
 # etc. See: https://djangopackages.org/grids/g/workers-queues-tasks/ for popular options).
-APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
\ No newline at end of file
+APSCHEDULER_RUN_NOW_TIMEOUT = 25  # Seconds
+
+# Federation inbox deliveries (service/utils/delivery.py)
+# Size of the background thread pool sending inbox POSTs to remote nodes
+DELIVERY_MAX_WORKERS = int(os.environ.get("DELIVERY_MAX_WORKERS", 8))
+# Maximum concurrent requests to the same remote node
+DELIVERY_MAX_PER_NODE = int(os.environ.get("DELIVERY_MAX_PER_NODE", 2))
+
+# Outbox retries (service/utils/outbox.py): a failed delivery waits a random time up to
+# OUTBOX_BACKOFF_BASE * 2^(attempts-1) seconds (capped at OUTBOX_BACKOFF_MAX)
+# and becomes a dead letter after OUTBOX_MAX_ATTEMPTS
+OUTBOX_MAX_ATTEMPTS = 8
+OUTBOX_BACKOFF_BASE = 30
+OUTBOX_BACKOFF_MAX = 6 * 60 * 60
+
+# Most recipients carried by one POST /api/inbox/batch delivery
+INBOX_BATCH_MAX = 500
+
+# Shared HTTP client for node-to-node and GitHub traffic (service/utils/federation.py)
+# Timeouts are in seconds, retries only apply to idempotent requests and failed connects
+FEDERATION_CONNECT_TIMEOUT = 5
+FEDERATION_READ_TIMEOUT = 10
+FEDERATION_RETRIES = 2
+# kept-alive connections per remote host
+FEDERATION_POOL_SIZE = 4
+
+# Remote author sync (service/utils/author_sync.py): authors requested per page and
+# the most pages read from one node per run
+AUTHOR_SYNC_PAGE_SIZE = 100
+AUTHOR_SYNC_MAX_PAGES = 100
+
+# Author follow graphs (service/utils/friends.py): seconds a graph stays in CACHES, most
+# graphs per process and seconds a graph is kept in the process. Follow changes
+# invalidate them right away in the process that handles them; other processes see the
+# change within FRIENDS_CACHE_LOCAL_TTL.
+FRIENDS_CACHE_TIMEOUT = 600
+FRIENDS_CACHE_SIZE = 4096
+FRIENDS_CACHE_LOCAL_TTL = 5
+
+# Totals of paginated lists (service/utils/pagination.py): seconds a 'cached' count is
+# reused, and the planner estimate above which 'estimate' stops counting exactly
+PAGINATION_COUNT_CACHE_TIMEOUT = 60
+PAGINATION_ESTIMATE_THRESHOLD = 10000
+
+# Where image post bytes are kept (service/utils/images.py): 'filesystem' (MEDIA_ROOT,
+# copied in chunks) or 'database' (PostImage rows, each upload is read into memory whole,
+# up to IMAGE_MAX_UPLOAD_SIZE). Heroku dynos have no persistent disk, so they use the
+# database.
+IMAGE_STORE = 'database' if os.environ.get("DATABASE_URL") != None else 'filesystem'
+
+# Downscaled copies of post images served for ?w= (service/utils/images.py): widths in
+# pixels and WebP/JPEG quality
+IMAGE_VARIANT_WIDTHS = (320, 640, 1280)
+IMAGE_VARIANT_QUALITY = 80
+
+# Largest image upload accepted, in bytes (service/utils/images.py). Uploads above
+# FILE_UPLOAD_MAX_MEMORY_SIZE (2.5 MB) are spooled to a temporary file, not kept in memory.
+IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+
+# Verified node credentials kept by BackendAuthentication (service/utils/credentials.py):
+# most entries per process and seconds before a credential is checked with the hasher again
+BACKEND_AUTH_CACHE_SIZE = 1024
+BACKEND_AUTH_CACHE_TTL = 300
+
+# Login tokens (service/authentication.py): accept tokens carrying the author id and
+# flags without loading the user, seconds an author's token version (bumped to revoke
+# the tokens) stays in CACHES, and how many versions each process keeps and for how many
+# seconds. Other processes accept a revoked token for at most JWT_TOKEN_VERSION_LOCAL_TTL.
+JWT_STATELESS = True
+JWT_TOKEN_VERSION_TIMEOUT = 300
+JWT_TOKEN_VERSION_CACHE_SIZE = 4096
+JWT_TOKEN_VERSION_LOCAL_TTL = 30
+
+# Serialized author profiles nested in posts, comments, likes and follows
+# (service/utils/profiles.py): most entries per process, seconds an entry is kept in the
+# process and seconds it is kept in CACHES
+AUTHOR_CACHE_SIZE = 4096
+AUTHOR_CACHE_LOCAL_TTL = 60
+AUTHOR_CACHE_TIMEOUT = 600
+
+# Responses of public posts, their comments and likes and of author profiles
+# (service/utils/response_cache.py), in CACHES['responses']: seconds they are kept. Post,
+# comment, like and author changes invalidate them right away.
+RESPONSE_CACHE_TIMEOUT = 300
+
+# GitHub activity poller (service/utils/github.py): API base url (point it at a stub to
+# test offline) and seconds between polls of one feed when GitHub sends no X-Poll-Interval
+GITHUB_API_URL = 'https://api.github.com'
+GITHUB_POLL_INTERVAL = 60
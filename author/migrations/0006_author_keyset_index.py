@@ -0,0 +1,19 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:38
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_alter_author_display_name_alter_author_profile_image'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='author',
+            index=models.Index(fields=['updated_at', 'id'], name='author_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0006_author_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='author',
+            name='token_version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import connection, models, transaction
 from django.utils import timezone
 from django.contrib.auth.models import User
 
@@ -24,38 +24,64 @@ class Author(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
     is_deleted = models.BooleanField(default=False)
+    # bumped to revoke every login token of the author (see service.utils.jwt_auth)
+    token_version = models.PositiveIntegerField(default=0)
+
+    # last serial handed out to this author's posts, likes and comments (see next_serial)
+    SERIAL_COUNTERS = ('post_count', 'like_count', 'comment_count')
+
+    class Meta:
+        indexes = [
+            # keyset pagination of the author list
+            models.Index(fields=['updated_at', 'id'], name='author_updated_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if self._state.adding:
             
             if self.user:
                 self.serial = self.user.id
+        elif kwargs.get('update_fields') is None:
+            # profile edits; the serial counters are only written by next_serial and the
+            # token version by revoke_tokens
+            self.updated_at = timezone.now()
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.SERIAL_COUNTERS
+                                       and field.name != 'token_version']
         super().save(*args, **kwargs)
 
+    def next_serial(self, counter):
+        """
+        Atomically increments `counter` (one of SERIAL_COUNTERS) and returns its new value,
+        so concurrent saves for the same author never get the same serial.
+        Uses a single UPDATE ... RETURNING where the database supports it and a row lock
+        otherwise.
+        """
+        if counter not in self.SERIAL_COUNTERS:
+            raise ValueError(f"{counter} is not a serial counter")
+
+        if connection.vendor in ('postgresql', 'sqlite'):
+            table = connection.ops.quote_name(self._meta.db_table)
+            column = connection.ops.quote_name(self._meta.get_field(counter).column)
+            pk = connection.ops.quote_name(self._meta.pk.column)
+            with connection.cursor() as cursor:
+                cursor.execute(f"UPDATE {table} SET {column} = {column} + 1 WHERE {pk} = %s RETURNING {column}", [self.pk])
+                serial = cursor.fetchone()[0]
+        else:
+            with transaction.atomic():
+                serial = Author.objects.select_for_update().values_list(counter, flat=True).get(pk=self.pk) + 1
+                Author.objects.filter(pk=self.pk).update(**{counter: serial})
+
+        setattr(self, counter, serial)
+        return serial
+
     def __str__(self):
         return self.display_name  # Simpler __str__ for clarity
     
     def is_friend_with(self, other_author):
         """
-        Determines if the current author has a mutual friendship with another author.
-        
-        This function checks for a "friend" relationship by verifying that both authors follow each other
-        with non-pending follow requests (i.e., 'pending' status is set to 'no'). For two authors to be 
-        considered friends, both must have approved follow requests in each other's direction.
-
-        Args:
-            other_author (Author): The other author to check for mutual friendship.
-
-        Returns:
-            bool: True if there is a mutual friendship (i.e., both authors follow each other without 
-                pending requests), otherwise False.
-                
-        Note:
-            - Uses the Follow model to check for follow records where each author follows the other 
-            with 'pending' set to 'no'.
-            - This helps maintain the integrity of friendships, as only mutual, approved follows qualify.
+        Returns True if both authors follow each other with accepted follow requests.
+        Answered from the cached follow graph in `service.utils.friends`.
         """
-        from service.models import Follow
-        """Check if the current author and the specified author are friends (mutual follows)."""
-        return Follow.objects.filter(follower=self, followed=other_author, pending='no').exists() and \
-               Follow.objects.filter(follower=other_author, followed=self, pending='no').exists()
+        from service.utils import friends
+        return friends.are_friends(self, other_author)
@@ -1,6 +1,7 @@
 from datetime import timezone
 from rest_framework import serializers
 from .models import Author
+from service.utils.profiles import profiles
 
 
 
@@ -52,3 +53,23 @@ class AuthorSerializer(serializers.ModelSerializer):
         return value
 
 
+class CachedAuthorSerializer(AuthorSerializer):
+    """
+    Read-only author nested in posts, comments, likes and follows. The output is shared
+    through `service.utils.profiles` instead of being rendered for every occurrence.
+    """
+    def to_representation(self, instance):
+        return profiles.get(instance, super().to_representation)
+
+
+class RemoteAuthorSerializer(AuthorSerializer):
+    """
+    Validates author payloads received from other nodes before they are upserted as local
+    copies (see service.utils.author_sync.upsert_remote_authors). Existing fqids are
+    allowed and `profileImage` is read from the payload. `github` and `profileImage` are
+    optional: a copy keeps its stored value when they are missing.
+    """
+    profileImage = serializers.URLField(source="profile_image", required=False, allow_null=True, allow_blank=True)
+
+    def validate_id(self, value):
+        return value.rstrip("/")
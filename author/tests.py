@@ -4,6 +4,13 @@ from rest_framework import status
 from django.contrib.auth.models import User
 from .models import Author
 from .serializers import AuthorSerializer
+from post.models import Post
+from service.models import Node
+from service.utils import author_sync
+from service.utils.author_sync import sync_node_authors, upsert_remote_authors
+from service.utils.federation import client
+from unittest.mock import Mock, patch
+from django.utils import timezone
 
 class AuthorViewTest(BaseAPITestCase):
     
@@ -40,3 +47,85 @@ class AuthorViewTest(BaseAPITestCase):
         author1.refresh_from_db()
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertTrue(author1.display_name == "updated author")
+
+    def test_author_list_reads_local_rows_only(self):
+        Node.objects.create(name="remote", url="http://remote.test/api/", username="node", password="node", is_allowed=True)
+        with patch.object(client, "get") as get:
+            response = self.client.get(reverse('author-list'))
+            get.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_sync_node_authors_is_incremental(self):
+        node = Node.objects.create(name="remote", url="http://remote.test/api/", username="node", password="node", is_allowed=True)
+        remote = {"type": "author", "id": "http://remote.test/api/authors/7", "host": "http://remote.test/api/", "displayName": "remote"}
+        page = Mock(status_code=200, json=Mock(return_value={"type": "authors", "authors": [remote]}))
+
+        with patch.object(client, "get", return_value=page) as get:
+            self.assertEqual(sync_node_authors(node), 1)
+            self.assertNotIn("updated_since", get.call_args.kwargs["params"])
+            self.assertIsNotNone(node.authors_synced_at)
+
+            # known authors are refreshed in place and the watermark is sent
+            remote["displayName"] = "renamed"
+            self.assertEqual(sync_node_authors(node), 1)
+            self.assertIn("updated_since", get.call_args.kwargs["params"])
+        self.assertEqual(Author.objects.get(fqid=remote["id"], user__isnull=True).display_name, "renamed")
+
+        # remote nodes can ask for recent changes only
+        since = timezone.now().isoformat()
+        response = self.client.get(reverse('author-list'), {"updated_since": since})
+        self.assertEqual(response.data["authors"], [])
+
+    def test_truncated_sync_keeps_the_watermark(self):
+        node = Node.objects.create(name="remote", url="http://remote.test/api/", username="node", password="node", is_allowed=True)
+        pages = [Mock(status_code=200, json=Mock(return_value={"authors": [{"type": "author", "id": f"http://remote.test/api/authors/{i}",
+                                                                               "host": "http://remote.test/api/", "displayName": "remote"}]}))
+                 for i in range(2)]
+        pages.append(Mock(status_code=200, json=Mock(return_value={"authors": []})))
+        with patch.object(author_sync, "PAGE_SIZE", 1), patch.object(author_sync, "MAX_PAGES", 2), \
+             patch.object(client, "get", side_effect=pages) as get:
+            self.assertEqual(sync_node_authors(node), 2)
+            self.assertIsNone(node.authors_synced_at)
+            self.assertEqual(node.authors_sync_page, 3)
+
+            self.assertEqual(sync_node_authors(node), 0)
+            self.assertEqual(get.call_args.kwargs["params"]["page"], 3)
+        node.refresh_from_db()
+        self.assertIsNotNone(node.authors_synced_at)
+        self.assertIsNone(node.authors_sync_page)
+
+    def test_upsert_remote_authors(self):
+        payloads = [{"type": "author", "id": f"http://remote.test/api/authors/{i}", "host": "http://remote.test/api/", "displayName": f"remote {i}"}
+                    for i in range(50)]
+        payloads.append({"type": "author", "id": self.author1.fqid, "host": self.author1.host, "displayName": "impostor"})
+        payloads.append({"type": "author", "id": "not a url"})
+
+        # local authors, the upsert, the ids and dropping the cached profiles from CACHES
+        with self.assertNumQueries(4):
+            ids = upsert_remote_authors(payloads)
+        self.assertEqual(len(ids), 50)
+        self.assertEqual(ids[payloads[0]["id"]], Author.objects.get(fqid=payloads[0]["id"]).id)
+        self.author1.refresh_from_db()
+        self.assertNotEqual(self.author1.display_name, "impostor")
+
+        # fields missing from a later payload keep their value
+        full = {**payloads[0], "github": "https://github.com/remote", "profileImage": "http://remote.test/me.png"}
+        upsert_remote_authors([full])
+        upsert_remote_authors([{**payloads[0], "displayName": "renamed"}])
+        copy = Author.objects.get(fqid=full["id"])
+        self.assertEqual((copy.display_name, copy.github_url, copy.profile_image),
+                         ("renamed", "https://github.com/remote", "http://remote.test/me.png"))
+
+    def test_serials_are_allocated_atomically(self):
+        stale = Author.objects.get(pk=self.author1.pk)
+        serials = [Post.objects.create(author=self.author1, title=f"Post {i}", content_type="text/plain", content="c").serial
+                   for i in range(3)]
+        self.assertEqual(serials, [1, 2, 3])
+
+        # a profile edit from an instance loaded earlier does not rewind the counter
+        stale.display_name = "renamed"
+        stale.save()
+        post = Post.objects.create(author=stale, title="Post 4", content_type="text/plain", content="c")
+        self.assertEqual(post.serial, 4)
+        self.assertEqual(post.fqid, f"{self.author1.fqid}/posts/4")
+        self.assertEqual(Author.objects.get(pk=self.author1.pk).post_count, 4)
@@ -9,19 +9,26 @@ from rest_framework.pagination import PageNumberPagination
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 import requests
-from service.utils.jwt_auth import create_hearders
+from service.utils.federation import client
+from service.utils.push import find_node
+from service.utils.pagination import KeysetPaginationMixin
+from service.utils.response_cache import cache_response, cached_response
 from django.shortcuts import get_object_or_404
 from rest_framework.decorators import api_view
+from django.utils.dateparse import parse_datetime
 
-class AuthorPagination(PageNumberPagination):
+class AuthorPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 100  
     page_size_query_param = 'size'
     page_query_param = 'page'  
+    # the envelope has no total, pages are served without counting
+    count_mode = 'estimate'
     
     def get_paginated_response(self, data):
         response_data = {
             "type": "authors",
-            "authors": data
+            "authors": data,
+            **self.cursor_data()
         }
         return Response(response_data, status=status.HTTP_200_OK)
 
@@ -37,7 +44,7 @@ class AuthorView(ModelViewSet):
         else:
             queryset = Author.objects.filter(is_deleted=False)
             
-        return queryset.order_by('updated_at')
+        return queryset.order_by('updated_at', 'id')
     
     def list(self, request, *args, **kwargs):
         """
@@ -50,80 +57,39 @@ class AuthorView(ModelViewSet):
         Behavior:
         - GET [local, remote]: Retrieves all profiles on the node (paginated).
         - Local request:
-            - Returns local authors combined with authors from other allowed nodes.
+            - Returns local authors combined with the copies of authors from other allowed nodes.
         - Remote request:
             - Returns local authors only.
+        - Only local rows are read. Authors of other nodes are pulled in the background by the
+          `sync_remote_authors` job (see `service.utils.author_sync`).
 
         Query Parameters:
         - page: The current page number (optional).
         - size: The number of items per page (optional).
-
-        User Conditions:
-        - If the user is active and not a staff member:
-        - Fetches and integrates authors from allowed nodes into the local database.
-        - Ensures no duplicate authors are saved.
+        - updated_since: ISO 8601 datetime, only authors created or edited since then (optional).
+          Used by other nodes to sync incrementally.
+        - cursor: Keyset pagination instead of `page`, empty for the first page then the
+          `next` of the previous response (optional).
 
         Returns:
         - HTTP 200 with paginated serialized author data if successful.
-        - HTTP 400/500 for errors encountered during remote author validation or processing.
+        - HTTP 400 if `updated_since` is not a valid datetime.
 
         """
-            # local request return local authors + other nodes' authors
         user = request.user
-        if user.is_staff == False and user.is_active == True:
-            
-            allowed_nodes = Node.objects.filter(is_allowed=True)
-            
-            for node in allowed_nodes:
-                headers = create_hearders(node)
-                try:
-                    response = requests.get(f"{node.url}authors/", headers=headers, timeout=10)
-                    response.raise_for_status()
-                    if response.status_code == 200:
-                        authors = response.json().get("authors", [])
-                        for author in authors:
-                            fqid = author.get("id")
-                            author_exists = Author.objects.filter(fqid=fqid).exists()
-                            if author_exists:
-                                continue
-                            try:
-                                serializer = AuthorSerializer(data=author)
+        # local request return local authors + other nodes' authors
+        queryset = self.get_queryset(remote=not (user.is_staff == False and user.is_active == True))
+
+        updated_since = request.query_params.get('updated_since')
+        if updated_since:
+            since = parse_datetime(updated_since)
+            if since is None:
+                return Response({"error": "updated_since must be an ISO 8601 datetime."}, status=status.HTTP_400_BAD_REQUEST)
+            queryset = queryset.filter(updated_at__gte=since)
 
-                                if serializer.is_valid():
-                                    serializer.save()   
-                                else:
-                                    print(f"Author validation failed {serializer.errors}")
-                                    return Response({'errors': f"Author validation failed{node.url}: {serializer.errors}"}, status=status.HTTP_400_BAD_REQUEST)
-                        
-                            except ValidationError as e:
-                                print(f"Validation Error: {e.detail}")
-                                return Response({"error": e.detail}, status=status.HTTP_400_BAD_REQUEST)
-                            except Exception as e:
-                                print(f"Unexpected Error: {e}")
-                                print(f"Problematic Data: {author}")
-                                return Response({"error": "An unexpected error occurred."}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-                    else:
-                        print(f"Failed to fetch authors from {node.url}: {response.status_code}")
-                        
-                except requests.RequestException as e:
-                    print(f"Error fetching authors from {node.url}: {e}")
-                    continue
-                    
-            queryset = self.get_queryset()      
-            paged_queryset = self.paginate_queryset(queryset)
-        
-            if paged_queryset is not None:
-                serializer = self.get_serializer(paged_queryset, many=True)
-                return self.get_paginated_response(serializer.data)  
-            
-        # remote request return local authors only
-        # filtering
-        queryset = self.get_queryset(remote=True)
         paged_queryset = self.paginate_queryset(queryset)
-        
-        if paged_queryset is not None:
-            serializer = self.get_serializer(paged_queryset, many=True)
-            return self.get_paginated_response(serializer.data)
+        serializer = self.get_serializer(paged_queryset, many=True)
+        return self.get_paginated_response(serializer.data)
  
     @extend_schema(
         summary="Retrieve a single author",
@@ -188,14 +154,19 @@ def author_detail(request, AUTHOR_SERIAL=None, AUTHOR_FQID=None):
     Returns:
     - HTTP 200 with serialized author data if successful.
     - HTTP 400/404 if an error occurs.
+
+    Profiles stored on this node are cached per URL (see `service.utils.response_cache`)
+    and carry an ETag; `If-None-Match` gets a 304.
     """
-    
-    
+    cached = cached_response(request)
+    if cached is not None:
+        return cached
+
     if AUTHOR_SERIAL is not None:
         if request.method == "GET":
             author = get_object_or_404(Author, serial=AUTHOR_SERIAL, is_deleted=False, user__isnull=False)
             serializer = AuthorSerializer(author)
-            return Response(serializer.data)
+            return cache_response(request, Response(serializer.data))
         if request.method == "PUT":
             author = get_object_or_404(Author, serial=AUTHOR_SERIAL, is_deleted=False, user__isnull=False)
             serializer = AuthorSerializer(author,data=request.data, partial=True)
@@ -210,13 +181,10 @@ def author_detail(request, AUTHOR_SERIAL=None, AUTHOR_FQID=None):
             author = get_object_or_404(Author, fqid=AUTHOR_FQID, is_deleted=False)
             serializer = AuthorSerializer(author)
         else:
-            allowed_node_exists = Node.objects.filter(is_allowed=True, url__in=AUTHOR_FQID).exists()
-            if allowed_node_exists:
-                allowed_node = Node.objects.filter(is_allowed=True, url__in=AUTHOR_FQID)
-                headers = create_hearders(allowed_node)
-                
+            allowed_node = find_node(Node.objects.filter(is_allowed=True), AUTHOR_FQID)
+            if allowed_node:
                 try:
-                    response = requests.get(AUTHOR_FQID, headers=headers)
+                    response = client.get(AUTHOR_FQID, node=allowed_node)
                     
                     if response.status_code == 200:
                         try:
@@ -242,6 +210,6 @@ def author_detail(request, AUTHOR_SERIAL=None, AUTHOR_FQID=None):
                 print(f"Node object not found for {AUTHOR_FQID}")
                 return Response(f"Node object not found for {AUTHOR_FQID}", status=status.HTTP_400_BAD_REQUEST)
         
-        return Response(serializer.data)
+        return cache_response(request, Response(serializer.data))
             
                 
@@ -18,10 +18,15 @@ fi
 # Run Django migrations
 python3 manage.py makemigrations
 python3 manage.py migrate
+# Table of the shared cache (CACHES in settings.py)
+python3 manage.py createcachetable
 
 # Load initial mock data
 python3 manage.py loaddata mock_data2.json
 
+# Fixtures skip signals, so build the home streams explicitly
+python3 manage.py rebuild_feed
+
 # Navigate to frontend directory
 echo "Navigating to frontend directory..."
 cd frontend || { echo "Frontend directory not found. Exiting..."; exit 1; }
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_local_posts(apps, schema_editor):
+    Comment = apps.get_model('comment', 'Comment')
+    Post = apps.get_model('post', 'Post')
+    Comment.objects.update(
+        local_post=Subquery(Post.objects.filter(fqid=OuterRef('post')).order_by('id').values('id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0003_alter_comment_fqid_alter_comment_post'),
+        ('post', '0007_post_fqid_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='local_post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='comments', to='post.post'),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='post',
+            field=models.URLField(blank=True, db_index=True, max_length=500, null=True),
+        ),
+        migrations.RunPython(link_local_posts, migrations.RunPython.noop),
+    ]
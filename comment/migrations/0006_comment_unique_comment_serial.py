@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def renumber_duplicate_serials(apps, schema_editor):
+    """
+    Gives comments that got the same serial as an older comment of their author
+    (concurrent saves) the next free serial, so the unique constraint can be added. The
+    likes linked to a renumbered comment follow its new fqid.
+    """
+    Comment = apps.get_model('comment', 'Comment')
+    Author = apps.get_model('author', 'Author')
+    Like = apps.get_model('like', 'Like')
+    duplicates = (Comment.objects.filter(serial__gt=0).values('author', 'serial')
+                  .annotate(rows=Count('id')).filter(rows__gt=1))
+    for duplicate in duplicates:
+        author = Author.objects.get(pk=duplicate['author'])
+        author.comment_count = max(author.comment_count, Comment.objects.filter(author=author).aggregate(Max('serial'))['serial__max'])
+        comments = Comment.objects.filter(author=author, serial=duplicate['serial']).order_by('created_at', 'id')
+        for comment in list(comments)[1:]:
+            author.comment_count += 1
+            comment.serial = author.comment_count
+            comment.fqid = f"{author.fqid}/commented/{comment.serial}"
+            comment.save(update_fields=['serial', 'fqid'])
+            Like.objects.filter(local_comment=comment).update(object=comment.fqid)
+        author.save(update_fields=['comment_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_alter_author_display_name_alter_author_profile_image'),
+        ('comment', '0005_comment_like_count'),
+        ('like', '0004_like_local_object'),
+        ('post', '0008_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_serials, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='comment',
+            constraint=models.UniqueConstraint(condition=models.Q(('serial__gt', 0)), fields=('author', 'serial'), name='unique_comment_serial'),
+        ),
+    ]
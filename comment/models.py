@@ -10,24 +10,43 @@ class Comment(models.Model):
     # READ ONLY
     type = models.CharField(max_length=10, default="comment", editable=False)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='comments')
-    post = models.URLField(blank=True, null=True, max_length=500)
+    post = models.URLField(blank=True, null=True, max_length=500, db_index=True)
+    # the commented post when it is stored on this node (resolved from `post`)
+    local_post = models.ForeignKey(Post, on_delete=models.SET_NULL, related_name='comments', blank=True, null=True)
     fqid = models.URLField(blank=True, null=True, max_length=500, unique=True)
     serial = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
     is_deleted = models.BooleanField(default=False)
+    # maintained with F() by the like signals, repaired by `reconcile_counts`
+    like_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # remote copies keep serial 0
+            models.UniqueConstraint(fields=['author', 'serial'], condition=models.Q(serial__gt=0), name='unique_comment_serial'),
+        ]
+        indexes = [
+            # keyset pagination of the comments of a post or an author
+            models.Index(fields=['local_post', 'created_at', 'id'], name='comment_post_created_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='comment_author_created_idx'),
+        ]
      
     def save(self, *args, **kwargs):
         if self._state.adding:
             if self.author.user is not None:
                 # for serial increament
-                self.serial = self.author.comment_count + 1
-                self.author.comment_count = self.serial
-                self.author.save(update_fields=['comment_count']) 
+                self.serial = self.author.next_serial('comment_count')
                 # for fqid
                 self.fqid = self.author.fqid + "/commented/" + str(self.serial)
+            if self.post and self.local_post_id is None:
+                self.local_post = Post.objects.filter(fqid=self.post).first()
         else:
             self.updated_at = timezone.now()
+            if kwargs.get('update_fields') is None:
+                # never write back a like_count read before a concurrent like
+                kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                           if not field.primary_key and field.name != 'like_count']
         super().save(*args, **kwargs)
         
     
@@ -1,21 +1,63 @@
 from rest_framework import serializers
+from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import RowNumber
 from comment.models import Comment
-from author.serializers import AuthorSerializer 
-from like.serializers import Like, LikeSerializer
+from author.serializers import CachedAuthorSerializer
+from like.serializers import Like, LikeSerializer, first_page_likes
 from like.views import LikePagination
 
+
+def first_page_comments(post_ids, size):
+    """
+    Loads the first page of comments (oldest first, same as CommentPagination) of every
+    local post in `post_ids` with a single query, authors included.
+
+    Returns:
+    - dict mapping each post id to its list of `Comment` objects.
+    """
+    comments = {pk: [] for pk in post_ids}
+    if not comments:
+        return comments
+
+    queryset = Comment.objects.filter(local_post__in=comments.keys()).select_related('author').annotate(
+        row=Window(RowNumber(), partition_by=[F('local_post')], order_by=[F('created_at').asc(), F('id').asc()])
+    ).filter(row__lte=size).order_by('created_at', 'id')
+
+    for comment in queryset:
+        comments[comment.local_post_id].append(comment)
+    return comments
+
+
+def get_first_page_size(paginator, request):
+    if request is None:
+        return paginator.page_size
+    return paginator.get_page_size(request)
+
+
+class CommentListSerializer(serializers.ListSerializer):
+    """
+    Loads the likes of every comment in the list with one query before serializing.
+    """
+    def to_representation(self, data):
+        comments = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.child.prefetch_likes(comments)
+        return super().to_representation(comments)
+
+
 class CommentSerializer(serializers.ModelSerializer):
     
     id = serializers.URLField(source='fqid', read_only=True)
     contentType = serializers.CharField(source='content_type', required=True)
     comment = serializers.CharField(source='content', required=True)
-    author = AuthorSerializer(read_only=True)
+    author = CachedAuthorSerializer(read_only=True)
     published = serializers.DateTimeField(source='created_at', read_only=True)
     post = serializers.URLField(required=True)
     likes = serializers.SerializerMethodField(read_only=True)
     
     class Meta:
         model = Comment
+        list_serializer_class = CommentListSerializer
         fields = [
             "type",
             "author",
@@ -26,22 +68,35 @@ class CommentSerializer(serializers.ModelSerializer):
             "post",
             "likes",        
         ]
+
+    def prefetch_likes(self, comments):
+        """
+        Store the first page of likes of `comments` in the context, skipping the ones
+        a parent serializer already loaded.
+        """
+        prefetched = self.context.setdefault('prefetched_comment_likes', {})
+        missing = [comment.pk for comment in comments if comment.pk not in prefetched]
+        if missing:
+            size = get_first_page_size(LikePagination(), self.context.get('request'))
+            prefetched.update(first_page_likes(size, comment_ids=missing)[1])
         
     def get_likes(self, obj):
-        likes_queryset = Like.objects.filter(object=obj.fqid)
-        paginator = LikePagination()
+        self.prefetch_likes([obj])
+        likes = self.context['prefetched_comment_likes'][obj.pk]
         request = self.context.get('request', None)
-        page = paginator.paginate_queryset(likes_queryset, request, view=None)
+        paginator = LikePagination()
 
         url = self.context['request'].build_absolute_uri().strip('/')
-        paginated_response = paginator.get_paginated_response(
-            LikeSerializer(page, many=True).data,
-            url=url
+        return paginator.get_response_data(
+            LikeSerializer(likes, many=True).data,
+            url,
+            1,
+            get_first_page_size(paginator, request),
+            obj.like_count
         )
-        return paginated_response.data
     
     # def create(self, validated_data):
     #     comment = Comment.objects.create(validated_data)
         
         
-    #     return comment
\ No newline at end of file
+    #     return comment
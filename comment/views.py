@@ -10,12 +10,16 @@ from author.serializers import Author, AuthorSerializer
 from post.serializers import Post
 from rest_framework.pagination import PageNumberPagination
 from service.utils.push import push
+from service.utils.pagination import KeysetPaginationMixin
+from service.utils.response_cache import cache_response, cached_response
 from rest_framework.exceptions import ValidationError
 
-class CommentPagination(PageNumberPagination):
+class CommentPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 5
     page_size_query_param = 'size'
     page_query_param = 'page'  
+    # lists of a post or comment report its counter, lists of an author a cached count
+    count_mode = 'cached'
     
     # sorting
     def paginate_queryset(self, queryset, request, view=None):
@@ -23,18 +27,21 @@ class CommentPagination(PageNumberPagination):
             queryset = queryset.order_by('created_at')
         return super().paginate_queryset(queryset, request, view=view)
     
-    def get_paginated_response(self, data, url):
+    def get_paginated_response(self, data, url, count=None):
+        response_data = self.get_response_data(data, url, self.page_number, self.get_page_size(self.request), count)
+        response_data.update(self.cursor_data())
+        return Response(response_data, status=status.HTTP_200_OK)
 
-        response_data = {
+    def get_response_data(self, data, url, page_number, size, count=None):
+        return {
                 "type":"comments",
                 "page": url,
                 "id":f'{url}/comments',
-                "page_number":self.page.number,
-                "size": self.get_page_size(self.request),
-                "count": len(data),
+                "page_number":page_number,
+                "size": size,
+                "count": len(data) if count is None else count,
                 "src": data
             }
-        return Response(response_data, status=status.HTTP_200_OK)
 
 class CommentView(ModelViewSet):
     queryset = Comment.objects
@@ -125,7 +132,14 @@ def comment_list(request, AUTHOR_SERIAL=None, POST_SERIAL=None, POST_FQID=None):
     Returns:
     - Paginated list of comments (HTTP 200) with serialized data if successful.
     - HTTP 404 if the post or comments are not found.
+
+    Comments of public posts are cached per URL (see `service.utils.response_cache`) and
+    carry an ETag; `If-None-Match` gets a 304.
     """
+    cached = cached_response(request)
+    if cached is not None:
+        return cached
+
     if AUTHOR_SERIAL is not None and POST_SERIAL is not None:
         author = get_object_or_404(Author, serial=AUTHOR_SERIAL, is_deleted=False)
         post = get_object_or_404(Post, serial=POST_SERIAL, author__serial=author.serial, is_deleted=False)
@@ -135,12 +149,15 @@ def comment_list(request, AUTHOR_SERIAL=None, POST_SERIAL=None, POST_FQID=None):
         return Response({"detail": "Comment not found."}, status=status.HTTP_404_NOT_FOUND)
         
     url = post.fqid
-    comments = Comment.objects.filter(post=post.fqid)
+    comments = Comment.objects.filter(local_post=post)
     
     paginator = CommentPagination()
     paged_comments = paginator.paginate_queryset(comments, request)
     serializer = CommentSerializer(paged_comments, many=True, context={'request': request})
-    return paginator.get_paginated_response(serializer.data, url)
+    response = paginator.get_paginated_response(serializer.data, url, post.comment_count)
+    if post.visibility == 'public':
+        return cache_response(request, response, post=post)
+    return response
 
 @api_view(['GET'])    
 def comment_detail_post(request,  AUTHOR_SERIAL=None, POST_SERIAL=None, REMOTE_COMMENT_FQID=None):
@@ -168,7 +185,7 @@ def comment_detail_post(request,  AUTHOR_SERIAL=None, POST_SERIAL=None, REMOTE_C
     if AUTHOR_SERIAL is not None and POST_SERIAL is not None and REMOTE_COMMENT_FQID is not None:
         author = get_object_or_404(Author, serial=AUTHOR_SERIAL, is_deleted=False)
         post = get_object_or_404(Post, serial=POST_SERIAL, author__serial=author.serial, is_deleted=False)
-        comment = get_object_or_404(Comment, post=post.fqid, fqid=REMOTE_COMMENT_FQID)
+        comment = get_object_or_404(Comment, local_post=post, fqid=REMOTE_COMMENT_FQID)
     else:
         return Response({"detail": "Comment not found."}, status=status.HTTP_404_NOT_FOUND)
     serializer = CommentSerializer(comment, context={'request': request})
@@ -221,7 +238,7 @@ def author_comment_list(request, AUTHOR_SERIAL=None, AUTHOR_FQID=None):
         paginator = CommentPagination()
         paged_comments = paginator.paginate_queryset(comments, request)
         serializer = CommentSerializer(paged_comments, many=True, context={'request': request})
-        return paginator.get_paginated_response(serializer.data, url)
+        return paginator.get_paginated_response(serializer.data, url, paginator.get_count())
 
     elif request.method == 'POST':
         if AUTHOR_SERIAL is not None:
@@ -98,9 +98,12 @@ export default function PostCards({ post, currenAuthor, onClick }) {
   };
 
   // if type is image then format the image url
+  // ?w= asks the server for a downscaled variant, the browser picks one from srcSet
   let imageURL = null;
+  let imageSrcSet = null;
   if (post.contentType.startsWith("image/")) {
-    imageURL = `${post.id}/image`;
+    imageURL = `${post.id}/image?w=640`;
+    imageSrcSet = [320, 640, 1280].map((width) => `${post.id}/image?w=${width} ${width}w`).join(", ");
   } else {
     imageURL = null;
   }
@@ -208,7 +211,7 @@ export default function PostCards({ post, currenAuthor, onClick }) {
       <div className="post-card-content" dangerouslySetInnerHTML={getMarkdownContent()} />
       {imageURL && (
         <div className="post-card-image">
-          <img src={imageURL} alt="Post" className="post-image" />
+          <img src={imageURL} srcSet={imageSrcSet} sizes="(max-width: 640px) 100vw, 640px" alt="Post" className="post-image" />
         </div>
       )}
       <p className="post-card-update-date">Published at: {new Date(post.published).toLocaleString()}</p>
@@ -34,6 +34,7 @@ export default function Stream() {
   const [dropdownOpen, setDropdownOpen] = useState(false);
   const follow_id = localStorage.getItem("follow_id");
   const [streamPosts, setstreamPosts] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [pendingFollowRequests, setPendingFollowRequests] = useState([]);
   const currentAuthorId = localStorage.getItem("currentAuthorId")
   const subtitle = "Stream";
@@ -65,13 +66,19 @@ export default function Stream() {
   //   }
   // };
 
-  // Get the posts list
-  useEffect(() => {
-    cusFetch(`${apiUrl}posts/`)
+  // Get the posts list, a page at a time: `next` is the cursor of the following page
+  // (null on the last one)
+  const loadStreamPosts = (cursor) => {
+    cusFetch(`${apiUrl}posts/?cursor=${encodeURIComponent(cursor)}`)
       .then((response) => response.json())
       .then((data) => {
-        setstreamPosts(data.src);
+        setstreamPosts((prevPosts) => (cursor ? [...prevPosts, ...data.src] : data.src));
+        setNextCursor(data.next);
       });
+  };
+
+  useEffect(() => {
+    loadStreamPosts("");
   }, []);
 
   // get the posts owned by the current user
@@ -225,6 +232,11 @@ export default function Stream() {
             />
           ))
           }
+          {nextCursor && (
+            <button className="load-more-btn" onClick={() => loadStreamPosts(nextCursor)}>
+              Load more
+            </button>
+          )}
         </div>
       )}
       {!isVisible && (
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:28
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def link_local_objects(apps, schema_editor):
+    Like = apps.get_model('like', 'Like')
+    Post = apps.get_model('post', 'Post')
+    Comment = apps.get_model('comment', 'Comment')
+    Like.objects.filter(object__contains='/commented/').update(
+        local_comment=Subquery(Comment.objects.filter(fqid=OuterRef('object')).values('id')[:1]))
+    Like.objects.exclude(object__contains='/commented/').update(
+        local_post=Subquery(Post.objects.filter(fqid=OuterRef('object')).order_by('id').values('id')[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('comment', '0004_comment_local_post'),
+        ('like', '0003_alter_like_fqid_alter_like_object'),
+        ('post', '0007_post_fqid_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='like',
+            name='local_comment',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='likes', to='comment.comment'),
+        ),
+        migrations.AddField(
+            model_name='like',
+            name='local_post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='likes', to='post.post'),
+        ),
+        migrations.AlterField(
+            model_name='like',
+            name='object',
+            field=models.URLField(blank=True, db_index=True, max_length=500, null=True),
+        ),
+        migrations.RunPython(link_local_objects, migrations.RunPython.noop),
+    ]
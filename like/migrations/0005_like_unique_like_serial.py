@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def renumber_duplicate_serials(apps, schema_editor):
+    """
+    Gives likes that got the same serial as an older like of their author (concurrent
+    saves) the next free serial, so the unique constraint can be added.
+    """
+    Like = apps.get_model('like', 'Like')
+    Author = apps.get_model('author', 'Author')
+    duplicates = (Like.objects.filter(serial__gt=0).values('author', 'serial')
+                  .annotate(rows=Count('id')).filter(rows__gt=1))
+    for duplicate in duplicates:
+        author = Author.objects.get(pk=duplicate['author'])
+        author.like_count = max(author.like_count, Like.objects.filter(author=author).aggregate(Max('serial'))['serial__max'])
+        likes = Like.objects.filter(author=author, serial=duplicate['serial']).order_by('created_at', 'id')
+        for like in list(likes)[1:]:
+            author.like_count += 1
+            like.serial = author.like_count
+            like.fqid = f"{author.fqid}/liked/{like.serial}"
+            like.save(update_fields=['serial', 'fqid'])
+        author.save(update_fields=['like_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_alter_author_display_name_alter_author_profile_image'),
+        ('comment', '0006_comment_unique_comment_serial'),
+        ('like', '0004_like_local_object'),
+        ('post', '0008_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_serials, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='like',
+            constraint=models.UniqueConstraint(condition=models.Q(('serial__gt', 0)), fields=('author', 'serial'), name='unique_like_serial'),
+        ),
+    ]
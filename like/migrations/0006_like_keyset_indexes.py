@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0006_author_keyset_index'),
+        ('comment', '0007_comment_keyset_indexes'),
+        ('like', '0005_like_unique_like_serial'),
+        ('post', '0010_post_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['local_post', 'created_at', 'id'], name='like_post_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['local_comment', 'created_at', 'id'], name='like_comment_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['author', 'created_at', 'id'], name='like_author_created_idx'),
+        ),
+    ]
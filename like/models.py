@@ -1,16 +1,32 @@
 from django.db import models
 from author.models import Author
 from post.models import Post
+from comment.models import Comment
 from django.utils import timezone
 
 class Like(models.Model):    
     # READ ONLY
     type = models.CharField(max_length=10, default="like", editable=False)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='likes')
-    object = models.URLField(blank=True, null=True, max_length=500)
+    object = models.URLField(blank=True, null=True, max_length=500, db_index=True)
+    # the liked post or comment when it is stored on this node (resolved from `object`)
+    local_post = models.ForeignKey(Post, on_delete=models.SET_NULL, related_name='likes', blank=True, null=True)
+    local_comment = models.ForeignKey(Comment, on_delete=models.SET_NULL, related_name='likes', blank=True, null=True)
     fqid = models.URLField(blank=True, null=True, max_length=500, unique=True)
     serial = models.PositiveIntegerField(default=0)
     created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            # remote copies keep serial 0
+            models.UniqueConstraint(fields=['author', 'serial'], condition=models.Q(serial__gt=0), name='unique_like_serial'),
+        ]
+        indexes = [
+            # keyset pagination of the likes of a post, a comment or an author
+            models.Index(fields=['local_post', 'created_at', 'id'], name='like_post_created_idx'),
+            models.Index(fields=['local_comment', 'created_at', 'id'], name='like_comment_created_idx'),
+            models.Index(fields=['author', 'created_at', 'id'], name='like_author_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.author} Likes on {self.object}"
@@ -20,11 +36,22 @@ class Like(models.Model):
         if self._state.adding:
             # for serial increament
             if self.author.user is not None:
-                self.serial = self.author.like_count + 1
-                self.author.like_count = self.serial
-                self.author.save(update_fields=['like_count']) 
+                self.serial = self.author.next_serial('like_count')
                 # for fqid
                 self.fqid = self.author.fqid + "/liked/" + str(self.serial)
+            self.resolve_object()
                 
         super().save(*args, **kwargs)
+
+    def resolve_object(self):
+        """
+        Points `local_post`/`local_comment` at the liked object if this node has it.
+        Objects that arrive later are linked by the post/comment post_save signals.
+        """
+        if not self.object or self.local_post_id or self.local_comment_id:
+            return
+        if "/commented/" in self.object:
+            self.local_comment = Comment.objects.filter(fqid=self.object).first()
+        else:
+            self.local_post = Post.objects.filter(fqid=self.object).first()
     
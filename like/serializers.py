@@ -1,12 +1,14 @@
 from rest_framework import serializers
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
 from .models import Like
-from author.serializers import AuthorSerializer
+from author.serializers import CachedAuthorSerializer
 from comment.models import Comment
 
 
 class LikeSerializer(serializers.ModelSerializer):
     id = serializers.URLField(source='fqid', read_only=True)
-    author = AuthorSerializer(read_only=True)
+    author = CachedAuthorSerializer(read_only=True)
     published = serializers.DateTimeField(source='created_at', read_only=True)
     object = serializers.URLField(required=True)
         
@@ -18,4 +20,33 @@ class LikeSerializer(serializers.ModelSerializer):
             "published",
             "id",
             "object",       
-        ]
\ No newline at end of file
+        ]
+
+
+def first_page_likes(size, post_ids=(), comment_ids=()):
+    """
+    Loads the first page of likes (oldest first, same as LikePagination) of the local
+    posts `post_ids` and comments `comment_ids` with a single query, authors included.
+
+    Returns:
+    - `(post likes, comment likes)`: dicts mapping each post / comment id to its list
+      of `Like` objects.
+    """
+    post_likes = {pk: [] for pk in post_ids}
+    comment_likes = {pk: [] for pk in comment_ids}
+    if not post_likes and not comment_likes:
+        return post_likes, comment_likes
+
+    queryset = Like.objects.filter(
+        Q(local_post__in=post_likes.keys()) | Q(local_comment__in=comment_likes.keys())
+    ).select_related('author').annotate(
+        row=Window(RowNumber(), partition_by=[F('local_post'), F('local_comment')],
+                   order_by=[F('created_at').asc(), F('id').asc()])
+    ).filter(row__lte=size).order_by('created_at', 'id')
+
+    for like in queryset:
+        if like.local_post_id in post_likes:
+            post_likes[like.local_post_id].append(like)
+        else:
+            comment_likes[like.local_comment_id].append(like)
+    return post_likes, comment_likes
@@ -1,3 +1,5 @@
+from io import StringIO
+from django.core.management import call_command
 from django.test import TestCase
 from service.tests import BaseAPITestCase
 from rest_framework import status
@@ -92,4 +94,63 @@ class LikeViewTest(BaseAPITestCase):
         post = Post.objects.create(author=author1, title="Test Post 1", description = "This is a test post", content_type = "text/markdown", content = "Content of the post", visibility = "public")
         like = Like.objects.create(author=author1, object=post.fqid)
         response = self.client.get(reverse('fqid_like_detail', args=[like.fqid]))
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
\ No newline at end of file
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_likes_link_to_local_objects(self):
+        post = Post.objects.create(author=self.author1, title="Test Post 1", content_type="text/markdown", content="Content", visibility="public")
+        like = Like.objects.create(author=self.author2, object=post.fqid)
+        self.assertEqual(like.local_post, post)
+
+        # a like that arrives before the post copy is linked when the copy is stored
+        remote = Author.objects.create(display_name="remote", host="http://remote.test/api/", fqid="http://remote.test/api/authors/1")
+        fqid = "http://remote.test/api/authors/1/posts/9"
+        early = Like.objects.create(author=self.author2, object=fqid)
+        self.assertIsNone(early.local_post)
+        copy = Post.objects.create(author=remote, fqid=fqid, title="Remote", content_type="text/plain", content="Content")
+        early.refresh_from_db()
+        self.assertEqual(early.local_post, copy)
+
+        response = self.client.get(reverse('liked_post', args=[1, post.serial]))
+        self.assertEqual([like["id"] for like in response.data["src"]], [like.fqid])
+
+    def test_like_and_comment_counters(self):
+        post = Post.objects.create(author=self.author1, title="Test Post 1", content_type="text/markdown", content="Content", visibility="public")
+        comment = Comment.objects.create(author=self.author2, post=post.fqid, content="Nice")
+        like = Like.objects.create(author=self.author2, object=post.fqid)
+        Like.objects.create(author=self.author3, object=post.fqid)
+        Like.objects.create(author=self.author3, object=comment.fqid)
+        like.delete()
+
+        post.refresh_from_db()
+        comment.refresh_from_db()
+        self.assertEqual((post.like_count, post.comment_count, comment.like_count), (1, 1, 1))
+        # editing a stale instance keeps the counters
+        Post.objects.get(pk=post.pk).save()
+        stale = Post.objects.get(pk=post.pk)
+        Like.objects.create(author=self.author1, object=post.fqid)
+        stale.title = "edited"
+        stale.save()
+        post.refresh_from_db()
+        self.assertEqual((post.title, post.like_count), ("edited", 2))
+
+        Post.objects.filter(pk=post.pk).update(like_count=7)
+        out = StringIO()
+        call_command("reconcile_counts", stdout=out)
+        post.refresh_from_db()
+        self.assertEqual(post.like_count, 2)
+        self.assertIn("post.like_count: 1 rows repaired", out.getvalue())
+
+        response = self.client.get(reverse('liked_post', args=[1, post.serial]), {"size": 1})
+        self.assertEqual((len(response.data["src"]), response.data["count"]), (1, 2))
+
+    def test_get_author_liked_by_cursor(self):
+        likes = []
+        for i in range(3):
+            post = Post.objects.create(author=self.author2, title=f"Post {i}", content_type="text/markdown", content="Content", visibility="public")
+            likes.append(Like.objects.create(author=self.author1, object=post.fqid).fqid)
+
+        response = self.client.get(reverse('things_liked_by_author', args=[1]), {"cursor": "", "size": 2})
+        self.assertEqual([like["id"] for like in response.data["src"]], likes[:2])
+        response = self.client.get(reverse('things_liked_by_author', args=[1]), {"cursor": response.data["next"], "size": 2})
+        self.assertEqual([like["id"] for like in response.data["src"]], likes[2:])
+        self.assertEqual((response.data["page_number"], response.data["next"]), (2, None))
@@ -10,12 +10,16 @@ from rest_framework import status
 from django.shortcuts import get_object_or_404
 from rest_framework.pagination import PageNumberPagination
 from service.utils.push import push
+from service.utils.pagination import KeysetPaginationMixin
+from service.utils.response_cache import cache_response, cached_response
 from rest_framework.exceptions import ValidationError
 
-class LikePagination(PageNumberPagination):
+class LikePagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 5
     page_size_query_param = 'size'
     page_query_param = 'page'  
+    # lists of a post or comment report its counter, lists of an author a cached count
+    count_mode = 'cached'
     
     # sorting
     def paginate_queryset(self, queryset, request, view=None):
@@ -23,18 +27,21 @@ class LikePagination(PageNumberPagination):
             queryset = queryset.order_by('created_at')
         return super().paginate_queryset(queryset, request, view=view)
     
-    def get_paginated_response(self, data, url):
+    def get_paginated_response(self, data, url, count=None):
+        response_data = self.get_response_data(data, url, self.page_number, self.get_page_size(self.request), count)
+        response_data.update(self.cursor_data())
+        return Response(response_data, status=status.HTTP_200_OK)
 
-        response_data = {
+    def get_response_data(self, data, url, page_number, size, count=None):
+        return {
         "type":"likes",
         "page": url,
         "id": f'{url}/likes',
-        "page_number":self.page.number,
-        "size": self.get_page_size(self.request),
-        "count": len(data),
+        "page_number":page_number,
+        "size": size,
+        "count": len(data) if count is None else count,
         "src": data
     }
-        return Response(response_data, status=status.HTTP_200_OK)
 
 
 class LikeView(ModelViewSet):
@@ -139,19 +146,28 @@ def who_liked_this_post(request, AUTHOR_SERIAL=None, POST_SERIAL=None, POST_FQID
     - HTTP 200 with paginated serialized likes if successful.
     - HTTP 404 if the post or likes are not found.
     - HTTP 400 if the request is invalid.
+
+    Likes of public local posts are cached per URL (see `service.utils.response_cache`)
+    and carry an ETag; `If-None-Match` gets a 304.
     """
-    
+    cached = cached_response(request)
+    if cached is not None:
+        return cached
+
+    post = None
     if AUTHOR_SERIAL is not None and POST_SERIAL is not None:
         try:
             post = Post.objects.get(serial=POST_SERIAL, author__serial=AUTHOR_SERIAL)
             url = post.fqid
-            likes_of_object = Like.objects.filter(object=url)
+            count = post.like_count
+            likes_of_object = Like.objects.filter(local_post=post)
         except Post.DoesNotExist:
             return Response({"detail": "Post not found with AUTHOR_SERIAL/POST_SERIAL."}, status=status.HTTP_404_NOT_FOUND)
     elif POST_FQID is not None:
         try:
             likes_of_object = Like.objects.filter(object=POST_FQID)
             url = POST_FQID
+            count = None
         except:
             return Response({"detail": "Post not found with POST_FQID."}, status=status.HTTP_404_NOT_FOUND)
     else:
@@ -160,7 +176,12 @@ def who_liked_this_post(request, AUTHOR_SERIAL=None, POST_SERIAL=None, POST_FQID
     paginator = LikePagination()
     paged_likes = paginator.paginate_queryset(likes_of_object, request)
     serializer = LikeSerializer(paged_likes, many=True)
-    return paginator.get_paginated_response(serializer.data, url)
+    if count is None:
+        count = paginator.get_count()
+    response = paginator.get_paginated_response(serializer.data, url, count)
+    if post is not None and post.visibility == 'public':
+        return cache_response(request, response, post=post)
+    return response
     
 
 @api_view(['GET'])
@@ -189,15 +210,15 @@ def who_liked_this_comment(request, AUTHOR_SERIAL, POST_SERIAL, COMMENT_FQID):
     - HTTP 500 if an unexpected error occurs.
     """
     post = get_object_or_404(Post, serial=POST_SERIAL, author__serial=AUTHOR_SERIAL)
-    comment = get_object_or_404(Comment, fqid=COMMENT_FQID, post__id=post.id)
+    comment = get_object_or_404(Comment, fqid=COMMENT_FQID, local_post=post)
     url = comment.fqid
     
-    likes_of_object = Like.objects.filter(object=url)
+    likes_of_object = Like.objects.filter(local_comment=comment)
 
     paginator = LikePagination()
     paged_likes = paginator.paginate_queryset(likes_of_object, request)
     serializer = LikeSerializer(paged_likes, many=True)
-    return paginator.get_paginated_response(serializer.data, url)
+    return paginator.get_paginated_response(serializer.data, url, comment.like_count)
 
 '''
 Liked API
@@ -293,7 +314,7 @@ def things_liked_by_author(request, AUTHOR_SERIAL=None, AUTHOR_FQID=None):
     paginator = LikePagination()
     paged_likes = paginator.paginate_queryset(likes_of_object, request)
     serializer = LikeSerializer(paged_likes, many=True)
-    return paginator.get_paginated_response(serializer.data, url)
+    return paginator.get_paginated_response(serializer.data, url, paginator.get_count())
 
 @api_view(['GET'])
 def like_detail(request, AUTHOR_SERIAL=None, LIKE_SERIAL=None, LIKE_FQID=None):
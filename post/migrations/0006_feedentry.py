@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:04
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_alter_author_display_name_alter_author_profile_image'),
+        ('post', '0005_alter_post_fqid_alter_post_github_event_id'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('updated_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to='author.author')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='post.post')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['owner', '-updated_at', '-id'], name='feed_owner_updated_idx')],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'post'), name='unique_feed_entry')],
+            },
+        ),
+    ]
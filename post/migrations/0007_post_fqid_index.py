@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0006_feedentry'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='post',
+            name='fqid',
+            field=models.URLField(blank=True, db_index=True, max_length=500, null=True),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:31
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_of(model, field):
+    rows = (model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def fill_counters(apps, schema_editor):
+    Post = apps.get_model('post', 'Post')
+    Comment = apps.get_model('comment', 'Comment')
+    Like = apps.get_model('like', 'Like')
+    Post.objects.update(like_count=count_of(Like, 'local_post'), comment_count=count_of(Comment, 'local_post'))
+    Comment.objects.update(like_count=count_of(Like, 'local_comment'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0007_post_fqid_index'),
+        ('comment', '0005_comment_like_count'),
+        ('like', '0004_like_local_object'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:34
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def renumber_duplicate_serials(apps, schema_editor):
+    """
+    Gives posts that got the same serial as an older post of their author (concurrent
+    saves) the next free serial, so the unique constraint can be added. The comments and
+    likes linked to a renumbered post follow its new fqid.
+    """
+    Post = apps.get_model('post', 'Post')
+    Author = apps.get_model('author', 'Author')
+    Comment = apps.get_model('comment', 'Comment')
+    Like = apps.get_model('like', 'Like')
+    duplicates = (Post.objects.filter(serial__gt=0).values('author', 'serial')
+                  .annotate(rows=Count('id')).filter(rows__gt=1))
+    for duplicate in duplicates:
+        author = Author.objects.get(pk=duplicate['author'])
+        author.post_count = max(author.post_count, Post.objects.filter(author=author).aggregate(Max('serial'))['serial__max'])
+        posts = Post.objects.filter(author=author, serial=duplicate['serial']).order_by('created_at', 'id')
+        for post in list(posts)[1:]:
+            author.post_count += 1
+            post.serial = author.post_count
+            post.fqid = f"{author.fqid}/posts/{post.serial}"
+            if post.image_url:
+                post.image_url = f"{post.fqid}/image"
+            post.save(update_fields=['serial', 'fqid', 'image_url'])
+            Comment.objects.filter(local_post=post).update(post=post.fqid)
+            Like.objects.filter(local_post=post).update(object=post.fqid)
+        author.save(update_fields=['post_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_alter_author_display_name_alter_author_profile_image'),
+        ('comment', '0005_comment_like_count'),
+        ('like', '0004_like_local_object'),
+        ('post', '0008_post_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(renumber_duplicate_serials, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='post',
+            constraint=models.UniqueConstraint(condition=models.Q(('serial__gt', 0)), fields=('author', 'serial'), name='unique_post_serial'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0006_author_keyset_index'),
+        ('post', '0009_post_unique_post_serial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'updated_at', 'id'], name='post_author_updated_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+from django.core.files.storage import default_storage
+from io import BytesIO
+from PIL import Image, UnidentifiedImageError
+import base64
+import binascii
+import hashlib
+
+
+# The image store as it was when this migration was written: bytes in PostImage.data,
+# keyed by their SHA-256.
+
+def decode_content(content):
+    if content.startswith('data:'):
+        content = content.partition(',')[2]
+    try:
+        return base64.b64decode(''.join(content.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def dimensions(data):
+    try:
+        with Image.open(BytesIO(data)) as image:
+            return image.size
+    except (UnidentifiedImageError, OSError):
+        return None, None
+
+
+def move_images_to_store(apps, schema_editor):
+    """
+    Moves the base64 content of image posts into the image store.
+    Posts whose content is not valid base64 are left as they are.
+    """
+    Post = apps.get_model('post', 'Post')
+    PostImage = apps.get_model('post', 'PostImage')
+    posts = Post.objects.filter(content_type__contains='image', image__isnull=True).exclude(content='').exclude(content=None)
+    for post in posts.only('id', 'content', 'content_type').iterator(chunk_size=100):
+        data = decode_content(post.content)
+        if data is None:
+            continue
+        key = hashlib.sha256(data).hexdigest()
+        if not PostImage.objects.filter(pk=key).exists():
+            width, height = dimensions(data)
+            PostImage.objects.create(key=key, content_type=post.content_type.split(';')[0], size=len(data),
+                                     width=width, height=height, storage='database', data=data)
+        Post.objects.filter(pk=post.pk).update(image_id=key, content='')
+
+
+def restore_image_content(apps, schema_editor):
+    Post = apps.get_model('post', 'Post')
+    for post in Post.objects.filter(image__isnull=False).select_related('image').iterator(chunk_size=100):
+        image = post.image
+        if image.storage == 'database':
+            data = bytes(image.data)
+        else:
+            with default_storage.open(f"post_images/{image.key[:2]}/{image.key}") as file:
+                data = file.read()
+        Post.objects.filter(pk=post.pk).update(content=base64.b64encode(data).decode('utf-8'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0010_post_keyset_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostImage',
+            fields=[
+                ('key', models.CharField(max_length=64, primary_key=True, serialize=False)),
+                ('content_type', models.CharField(max_length=50)),
+                ('size', models.PositiveIntegerField()),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('storage', models.CharField(default='database', max_length=20)),
+                ('data', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='posts', to='post.postimage'),
+        ),
+        migrations.RunPython(move_images_to_store, restore_image_content),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:48
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0011_post_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImageVariant',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_width', models.PositiveIntegerField()),
+                ('format', models.CharField(max_length=10)),
+                ('content_type', models.CharField(max_length=50)),
+                ('size', models.PositiveIntegerField()),
+                ('width', models.PositiveIntegerField()),
+                ('height', models.PositiveIntegerField()),
+                ('storage', models.CharField(default='database', max_length=20)),
+                ('data', models.BinaryField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('image', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='variants', to='post.postimage')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('image', 'max_width', 'format'), name='unique_image_variant')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:09
+
+from django.db import migrations, models
+
+
+def drop_public_entries(apps, schema_editor):
+    """
+    Public posts are no longer copied into every stream.
+    """
+    FeedEntry = apps.get_model('post', 'FeedEntry')
+    FeedEntry.objects.exclude(post__visibility__in=['unlisted', 'friends']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0007_author_token_version'),
+        ('post', '0012_image_variant'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_public_entries, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['visibility', 'updated_at', 'id'], name='post_visibility_updated_idx'),
+        ),
+    ]
@@ -3,8 +3,54 @@ from django.utils import timezone
 from author.models import Author
 from django.db.models import Max
 from django.utils.text import slugify
+from service.utils import images
 import os
 
+
+class PostImage(models.Model):
+    '''
+    Image of an image post, keyed by the SHA-256 of its bytes.
+    The bytes live in `data` or in a file, depending on the store (see service.utils.images).
+    '''
+    key = models.CharField(max_length=64, primary_key=True)
+    content_type = models.CharField(max_length=50)
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField(blank=True, null=True)
+    height = models.PositiveIntegerField(blank=True, null=True)
+    storage = models.CharField(max_length=20, default='database')
+    data = models.BinaryField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.key} ({self.content_type}, {self.size} bytes)"
+
+
+class ImageVariant(models.Model):
+    '''
+    Downscaled copy of a `PostImage`, at most `max_width` pixels wide, served by the
+    image endpoints for `?w=` (see service.utils.images.get_variant).
+    '''
+    image = models.ForeignKey(PostImage, on_delete=models.CASCADE, related_name='variants')
+    max_width = models.PositiveIntegerField()
+    format = models.CharField(max_length=10)
+    content_type = models.CharField(max_length=50)
+    size = models.PositiveIntegerField()
+    width = models.PositiveIntegerField()
+    height = models.PositiveIntegerField()
+    storage = models.CharField(max_length=20, default='database')
+    data = models.BinaryField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['image', 'max_width', 'format'], name='unique_image_variant'),
+        ]
+
+    @property
+    def key(self):
+        return f"{self.image_id}-{self.max_width}.{self.format}"
+
+
 class Post(models.Model):
     title = models.CharField(max_length=255)
     description = models.TextField(blank=True, null=True)
@@ -32,38 +78,77 @@ class Post(models.Model):
     # READ ONLY
     type = models.CharField(max_length=10, default="post", editable=False)
     author = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='posts')
-    fqid = models.URLField(blank=True, null=True, max_length=500)
+    fqid = models.URLField(blank=True, null=True, max_length=500, db_index=True)
     serial = models.PositiveIntegerField(default=0)
     github_event_id = models.CharField(max_length=500, unique=True, blank=True, null=True)
     image_url = models.URLField(blank=True, null=True)
+    # image posts keep their bytes here and an empty `content`
+    image = models.ForeignKey(PostImage, on_delete=models.PROTECT, blank=True, null=True, related_name='posts')
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(default=timezone.now)
     is_deleted = models.BooleanField(default=False)
+    # maintained with F() by the like/comment signals, repaired by `reconcile_counts`
+    like_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    COUNTER_FIELDS = ('like_count', 'comment_count')
+
+    class Meta:
+        constraints = [
+            # remote copies keep serial 0
+            models.UniqueConstraint(fields=['author', 'serial'], condition=models.Q(serial__gt=0), name='unique_post_serial'),
+        ]
+        indexes = [
+            # keyset pagination of an author's posts
+            models.Index(fields=['author', 'updated_at', 'id'], name='post_author_updated_idx'),
+            # the public timeline merged into every stream
+            models.Index(fields=['visibility', 'updated_at', 'id'], name='post_visibility_updated_idx'),
+        ]
         
     
     def save(self, *args, **kwargs):
+        self.store_image()
         if self._state.adding:
             if self.visibility == 'deleted':
                 self.is_deleted = True
             # for serial increament
             if self.author.user is not None:
-                self.serial = self.author.post_count + 1
-                self.author.post_count = self.serial
-                self.author.save(update_fields=['post_count']) 
+                self.serial = self.author.next_serial('post_count')
                 # for fqid
                 self.fqid = self.author.fqid + "/posts/" + str(self.serial)
-                if 'image' in self.content_type and self.content:
+                if self.image_id is not None:
                     self.image_url = self.fqid + "/image"
         else:
             self.updated_at = timezone.now()
             if self.visibility == 'deleted':
                 self.is_deleted = True
+            if kwargs.get('update_fields') is None:
+                # never write back counters that were read before a concurrent like/comment
+                kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                           if not field.primary_key and field.name not in self.COUNTER_FIELDS]
             
             
         super(Post, self).save(*args, **kwargs)
     
     def __str__(self):
         return f"{self.author.display_name}:  {self.title}"
+
+    @property
+    def is_image(self):
+        return 'image' in self.content_type
+
+    def store_image(self):
+        """
+        Moves base64 image content into the image store and keeps a reference to it.
+        """
+        if not self.is_image:
+            self.image = None
+            return
+        if not self.content:
+            return
+        data = images.decode_content(self.content)
+        if data is not None:
+            self.image = images.store_image(data, self.content_type.split(';')[0])
+            self.content = ''
     
     @property
     def visibility_display(self):
@@ -72,6 +157,29 @@ class Post(models.Model):
         """
         return dict(self.VISIBILITY_CHOICES).get(self.visibility, self.visibility).upper()
     
+
+
+class FeedEntry(models.Model):
+    '''
+    One row per (local author, non-public post) in that author's home stream.
+    Rows are written when posts are saved and when follows change (see service.utils.feed);
+    public posts are merged in from the public timeline when the stream is read.
+    '''
+    owner = models.ForeignKey(Author, on_delete=models.CASCADE, related_name='feed')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE, related_name='feed_entries')
+    # copy of post.updated_at so the stream can be ordered without joining posts
+    updated_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'post'], name='unique_feed_entry'),
+        ]
+        indexes = [
+            models.Index(fields=['owner', '-updated_at', '-id'], name='feed_owner_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} <- {self.post}"
 '''
 def upload_post_image(instance, filename):
     # - sukh 
@@ -1,11 +1,38 @@
 from rest_framework import serializers
-from author.serializers import AuthorSerializer, Author
-from .models import Post
-from like.serializers import Like, LikeSerializer
-from comment.serializer import Comment, CommentSerializer
+from django.db import models
+from author.serializers import CachedAuthorSerializer, Author
+from .models import Post, PostImage
+from service.utils import images
+from like.serializers import Like, LikeSerializer, first_page_likes
+from comment.serializer import Comment, CommentSerializer, first_page_comments, get_first_page_size
 from like.views import LikePagination
 from comment.views import CommentPagination
 
+
+class PostListSerializer(serializers.ListSerializer):
+    """
+    Loads the first page of likes and comments (and the comments' likes) of every post
+    in the list with a fixed number of grouped queries before serializing.
+    """
+    def to_representation(self, data):
+        posts = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        fields = self.child.fields
+        if 'likes' in fields or 'comments' in fields:
+            self.child.prefetch_interactions(posts)
+        if 'content' in fields:
+            self.child.prefetch_images(posts)
+        return super().to_representation(posts)
+
+
+# characters of `content` sent as `preview`
+PREVIEW_LENGTH = 300
+# only sent when asked for with `?fields=`
+OPTIONAL_FIELDS = ('preview', 'image')
+# `?summary=true`: everything but the body and the nested likes/comments
+SUMMARY_FIELDS = ('type', 'title', 'id', 'page', 'description', 'contentType', 'author',
+                  'published', 'visibility', 'preview', 'image')
+
+
 class PostSerializer(serializers.ModelSerializer):
     title = serializers.CharField(required=True)
     id = serializers.URLField(source='fqid', read_only=True)
@@ -13,7 +40,7 @@ class PostSerializer(serializers.ModelSerializer):
     description = serializers.CharField(required=False)
     contentType = serializers.CharField(required=True, source='content_type')
     content = serializers.CharField(required=True)
-    author = AuthorSerializer(read_only=True)
+    author = CachedAuthorSerializer(read_only=True)
     comments = serializers.SerializerMethodField(read_only=True)
 
     # comments = serializers.ListSerializer(
@@ -22,10 +49,13 @@ class PostSerializer(serializers.ModelSerializer):
     likes = serializers.SerializerMethodField(read_only=True)
     published = serializers.DateTimeField(source='created_at', read_only=True)
     visibility = serializers.CharField(required=True)
+    preview = serializers.SerializerMethodField(read_only=True)
+    image = serializers.URLField(source='image_url', read_only=True)
     
     class Meta:
         
         model = Post
+        list_serializer_class = PostListSerializer
         fields = [
             "type",
             "title",
@@ -39,34 +69,113 @@ class PostSerializer(serializers.ModelSerializer):
             "likes",
             "published",
             "visibility",
+            "preview",
+            "image",
         ]
         
         
+    def get_fields(self):
+        """
+        `post_fields` in the context (see post.views.list_fields) limits the representation
+        to those fields; otherwise OPTIONAL_FIELDS are left out.
+        """
+        fields = super().get_fields()
+        # uploaded images arrive as a file (see post.views.image_upload), not as content
+        if self.context.get('image') is not None:
+            fields['content'].required = False
+        requested = self.context.get('post_fields')
+        if requested is None:
+            for name in OPTIONAL_FIELDS:
+                fields.pop(name)
+        else:
+            fields = {name: field for name, field in fields.items() if name in requested}
+        return fields
+
+    def get_preview(self, obj):
+        """
+        Start of a text post's content, None for image posts (see `image`).
+        Uses the `content_preview` annotation when `content` was deferred.
+        """
+        if obj.image_id is not None:
+            return None
+        preview = getattr(obj, 'content_preview', None)
+        if preview is None:
+            preview = (obj.content or '')[:PREVIEW_LENGTH]
+        return preview
+
+    def prefetch_interactions(self, posts):
+        """
+        Store the first page of likes and comments of `posts` in the context, skipping
+        the ones that are already loaded.
+        """
+        request = self.context.get('request', None)
+        prefetched_likes = self.context.setdefault('prefetched_likes', {})
+        prefetched_comments = self.context.setdefault('prefetched_comments', {})
+        prefetched_comment_likes = self.context.setdefault('prefetched_comment_likes', {})
+
+        missing = [post.pk for post in posts if post.pk not in prefetched_comments]
+        if not missing:
+            return
+        prefetched_comments.update(first_page_comments(missing, get_first_page_size(CommentPagination(), request)))
+
+        comment_ids = [comment.pk for pk in missing for comment in prefetched_comments[pk]
+                       if comment.pk not in prefetched_comment_likes]
+        post_likes, comment_likes = first_page_likes(get_first_page_size(LikePagination(), request),
+                                                     post_ids=missing, comment_ids=comment_ids)
+        prefetched_likes.update(post_likes)
+        prefetched_comment_likes.update(comment_likes)
+        
+    def prefetch_images(self, posts):
+        """
+        Store the images of the image posts in `posts` in the context, with one query.
+        Their bytes are not loaded here but when the content of each post is serialized
+        (see `images.read_image`), so a page never holds every blob at once.
+        """
+        prefetched_images = self.context.setdefault('prefetched_images', {})
+        keys = {post.image_id for post in posts if post.image_id is not None} - prefetched_images.keys()
+        if keys:
+            prefetched_images.update(PostImage.objects.defer('data').in_bulk(keys))
+
+    def get_content(self, obj):
+        """
+        Image posts are sent as base64, read from the image store.
+        """
+        if obj.image_id is None:
+            return obj.content
+        self.prefetch_images([obj])
+        return images.read_base64(self.context['prefetched_images'][obj.image_id])
+
     def get_likes(self, obj):
-        likes_queryset = Like.objects.filter(object=obj.fqid)
-        paginator = LikePagination()
+        self.prefetch_interactions([obj])
+        likes = self.context['prefetched_likes'][obj.pk]
         request = self.context.get('request', None)
-        page = paginator.paginate_queryset(likes_queryset, request, view=None)
+        paginator = LikePagination()
 
         url = self.context['request'].build_absolute_uri().strip('/')
-        paginated_response = paginator.get_paginated_response(
-            LikeSerializer(page, many=True).data,
-            url=url
+        return paginator.get_response_data(
+            LikeSerializer(likes, many=True).data,
+            url,
+            1,
+            get_first_page_size(paginator, request),
+            obj.like_count
         )
-        return paginated_response.data
     
     def get_comments(self, obj):
-        comments_queryset = Comment.objects.filter(post=obj.fqid)
-        paginator = CommentPagination()
+        self.prefetch_interactions([obj])
+        comments = self.context['prefetched_comments'][obj.pk]
         request = self.context.get('request', None)
-        page = paginator.paginate_queryset(comments_queryset, request, view=None)
+        paginator = CommentPagination()
 
         url = self.context['request'].build_absolute_uri().strip('/')
-        paginated_response = paginator.get_paginated_response(
-            CommentSerializer(page, many=True, context={'request': request}).data,
-            url=url
+        # the comments' likes are already in prefetched_likes
+        context = {'request': request, 'prefetched_comment_likes': self.context['prefetched_comment_likes']}
+        return paginator.get_response_data(
+            CommentSerializer(comments, many=True, context=context).data,
+            url,
+            1,
+            get_first_page_size(paginator, request),
+            obj.comment_count
         )
-        return paginated_response.data
     
     def validate_visibility(self, value):
         # Normalize value to lowercase and ensure it matches a valid choice
@@ -90,10 +199,19 @@ class PostSerializer(serializers.ModelSerializer):
     
     def to_representation(self, instance):
         """
-        Override representation to return visibility in uppercase.
+        Override representation to return visibility in uppercase and image content as base64.
+        Upload responses (an `image` in the context) link the stored image as `image`
+        instead of encoding it back.
         """
         representation = super().to_representation(instance)
-        representation['visibility'] = instance.visibility_display
+        if 'visibility' in representation:
+            representation['visibility'] = instance.visibility_display
+        if 'content' in representation:
+            if instance.image_id is not None and self.context.get('image') is not None:
+                del representation['content']
+                representation['image'] = instance.image_url
+            else:
+                representation['content'] = self.get_content(instance)
         return representation
     
     
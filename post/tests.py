@@ -2,13 +2,27 @@ from service.tests import BaseAPITestCase
 from django.urls import reverse
 from rest_framework import status
 import base64
-from io import BytesIO
+from io import BytesIO, StringIO
+from django.core.management import call_command
 from PIL import Image
-from .models import Post
+from .models import Post, FeedEntry, PostImage, ImageVariant
 from author.models import Author
 from django.contrib.auth.models import User
 from service.models import Follow
 from author.serializers import AuthorSerializer
+from post.serializers import PostSerializer
+from like.models import Like
+from comment.models import Comment
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from django.test import override_settings
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import patch
+from contextlib import contextmanager
+from django.core.files.uploadedfile import SimpleUploadedFile, UploadedFile
+from service.utils import images
 
 class PostViewTest(BaseAPITestCase):
 
@@ -71,6 +85,47 @@ class PostViewTest(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["title"], "Test Post 1")
 
+    def test_responses_are_not_cached_in_the_database_cache(self):
+        post = Post.objects.create(author=self.author1, title="Cached", content_type="text/plain", content="c", visibility="public")
+        url = reverse("post_detail", args=[self.author1.serial, post.serial])
+        self.client.get(url)
+        # a hit there would cost about as many queries as the view
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertIn("ETag", response)
+        self.assertFalse([query for query in queries if "django_cache" in query["sql"]])
+
+    def test_public_post_responses_are_cached(self):
+        post = Post.objects.create(author=self.author1, title="Cached", content_type="text/plain", content="c", visibility="public")
+        url = reverse("post_detail", args=[self.author1.serial, post.serial])
+        response = self.client.get(url)
+        etag = response["ETag"]
+        # one query per hit, to check that the post is still public, and one read of the
+        # cache for the entry and the versions of its tags
+        with self.assertNumQueries(2), \
+                patch.object(LocMemCache, "get_many", autospec=True, side_effect=LocMemCache.get_many) as get_many:
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(self.client.get(url).data, response.data)
+        self.assertEqual(get_many.call_count, 2)
+
+        # not served once the post is private, even without an invalidation
+        Post.objects.filter(pk=post.pk).update(visibility="friends")
+        self.assertNotIn("ETag", self.client.get(url))
+        Post.objects.filter(pk=post.pk).update(visibility="public")
+
+        # a new comment (or like, edit, author change) shows up right away
+        with self.captureOnCommitCallbacks(execute=True):
+            Comment.objects.create(author=self.author2, local_post=post, post=post.fqid, content="hi")
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["comments"]["count"], 1)
+
+        # friends-only posts are never cached
+        with patch("service.utils.feed.pool.submit"), self.captureOnCommitCallbacks(execute=True):
+            post.visibility = "friends"
+            post.save()
+        self.assertNotIn("ETag", self.client.get(url))
+
     # ://service/api/authors/{AUTHOR_SERIAL}/posts/ Get
     def test_get_authors_posts(self):
         author1 = self.client.get(reverse('author-detail', args=[1]))
@@ -91,7 +146,49 @@ class PostViewTest(BaseAPITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         post = Post.objects.get(author=author1)
         self.assertEqual(post.title, "Test Post 1")
-        
+
+    def test_post_image_upload(self):
+        image = BytesIO()
+        Image.new("RGB", (50, 40), color="red").save(image, format="PNG")
+        upload = SimpleUploadedFile("red.png", image.getvalue(), content_type="image/png")
+        data = {"title": "Upload", "contentType": "image/png", "visibility": "PUBLIC", "content": upload}
+        with patch("post.views.images.store_file", wraps=images.store_file) as store_file, \
+                patch("post.serializers.images.read_base64") as read_base64:
+            response = self.client.post(reverse("post_list", args=[1]), data, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # the upload itself is handed to the store and never encoded back for the response
+        self.assertIsInstance(store_file.call_args.args[0], UploadedFile)
+        read_base64.assert_not_called()
+        post = Post.objects.get(title="Upload")
+        self.assertNotIn("content", response.data)
+        self.assertEqual(response.data["image"], post.image_url)
+        self.assertEqual(self.client.get(reverse("post_image", args=[1, post.serial])).content, image.getvalue())
+        self.assertEqual((post.content, post.content_type, post.image.width), ("", "image/png;base64", 50))
+
+        not_image = SimpleUploadedFile("fake.jpg", b"not an image", content_type="image/jpeg")
+        response = self.client.put(reverse("post_detail", args=[1, post.serial]), {"content": not_image}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        with patch.object(images, "MAX_UPLOAD_SIZE", 10):
+            upload.seek(0)
+            response = self.client.post(reverse("post_list", args=[1]), {**data, "content": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        # refused before the body is parsed
+        with patch.object(images, "MAX_UPLOAD_SIZE", 10), patch("post.views.UPLOAD_FORM_OVERHEAD", 0), \
+                patch("rest_framework.request.Request._load_data_and_files") as load:
+            upload.seek(0)
+            response = self.client.post(reverse("post-list"), {**data, "content": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+        load.assert_not_called()
+
+        # nothing is stored when the other fields are invalid
+        blue = BytesIO()
+        Image.new("RGB", (50, 40), color="blue").save(blue, format="PNG")
+        upload = SimpleUploadedFile("blue.png", blue.getvalue(), content_type="image/png")
+        images_before = PostImage.objects.count()
+        response = self.client.post(reverse("post_list", args=[1]), {**data, "title": "", "content": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(PostImage.objects.count(), images_before)
+
     # ://service/api/authors/{AUTHOR_SERIAL}/posts/{POST_SERIAL}/image
     def test_get_image_post(self):    
         author1 = self.client.get(reverse('author-detail', args=[1]))
@@ -131,5 +228,237 @@ class PostViewTest(BaseAPITestCase):
         response = self.client.get(reverse("fqid_post_image", args=[post.fqid]))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_image_posts_use_the_image_store(self):
+        image = BytesIO()
+        Image.new("RGB", (40, 30), color="red").save(image, format="PNG")
+        image_content = base64.b64encode(image.getvalue()).decode("utf-8")
+        post = Post.objects.create(author=self.author1, title="Image", content_type="image/png;base64", content=image_content, visibility="public")
+
+        post.refresh_from_db()
+        self.assertEqual(post.content, "")
+        self.assertEqual((post.image.size, post.image.width, post.image.height, post.image.content_type),
+                         (len(image.getvalue()), 40, 30, "image/png"))
+        self.assertEqual(post.image_url, f"{post.fqid}/image")
+        self.assertEqual((post.image.storage, post.image.data), ("filesystem", None))
+        response = self.client.get(reverse("post_detail", args=[self.author1.serial, post.serial]))
+        self.assertEqual(response.data["content"], image_content)
+        response = self.client.get(reverse("post_image", args=[self.author1.serial, post.serial]))
+        self.assertEqual((response.content, response["Content-Type"]), (image.getvalue(), "image/png"))
+
+        # identical images are stored once
+        Post.objects.create(author=self.author2, title="Copy", content_type="image/png;base64", content=image_content, visibility="public")
+        self.assertEqual(PostImage.objects.count(), 1)
+
+        with override_settings(IMAGE_STORE="database"):
+            image = BytesIO()
+            Image.new("RGB", (10, 10), color="blue").save(image, format="JPEG")
+            post = Post.objects.create(author=self.author1, title="Row", content_type="image/jpeg;base64",
+                                       content=base64.b64encode(image.getvalue()).decode("utf-8"), visibility="public")
+            self.assertEqual((post.image.storage, bytes(post.image.data)), ("database", image.getvalue()))
+            response = self.client.get(reverse("fqid_post_image", args=[post.fqid]))
+            self.assertEqual(response.content, image.getvalue())
+
+            # lists read each blob while serializing its post, not every blob with the images
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse("post_list", args=[self.author1.serial]))
+            row_post = next(item for item in response.data["src"] if item["title"] == "Row")
+            self.assertEqual(row_post["content"], base64.b64encode(image.getvalue()).decode("utf-8"))
+            image_queries = [query["sql"] for query in queries if '"post_postimage"' in query["sql"]]
+            self.assertEqual(len(image_queries), 2)
+            self.assertNotIn('"post_postimage"."data"', image_queries[0])
+
+    def test_image_validators_and_cache_headers(self):
+        image = BytesIO()
+        Image.new("RGB", (10, 10), color="red").save(image, format="PNG")
+        post = Post.objects.create(author=self.author1, title="Image", content_type="image/png;base64",
+                                   content=base64.b64encode(image.getvalue()).decode("utf-8"), visibility="public")
+        url = reverse("post_image", args=[self.author1.serial, post.serial])
+
+        response = self.client.get(url)
+        self.assertEqual(response["ETag"], f'"{post.image_id}"')
+        self.assertIn("no-cache", response["Cache-Control"])
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual((response.status_code, response.content), (status.HTTP_304_NOT_MODIFIED, b""))
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.content, image.getvalue())
+
+        response = self.client.get(reverse("fqid_post_image", args=[post.fqid]))
+        self.assertEqual(set(response["Cache-Control"].split(", ")), {"public", "no-cache"})
+        self.assertEqual(response["ETag"], f'"{post.image_id}"')
+        post.visibility = "friends"
+        post.save()
+        response = self.client.get(reverse("fqid_post_image", args=[post.fqid]))
+        self.assertEqual(set(response["Cache-Control"].split(", ")), {"private", "no-cache"})
+
+    def test_image_variants(self):
+        image = BytesIO()
+        Image.new("RGB", (2000, 1000), color="red").save(image, format="PNG")
+        with self.captureOnCommitCallbacks() as callbacks:
+            post = Post.objects.create(author=self.author1, title="Image", content_type="image/png;base64",
+                                       content=base64.b64encode(image.getvalue()).decode("utf-8"), visibility="public")
+        # rendered in the background after the commit
+        self.assertEqual(len(callbacks), 1)
+        with patch("service.utils.images.pool.submit", side_effect=lambda key, fn, *args: fn(*args)):
+            callbacks[0]()
+        self.assertEqual(ImageVariant.objects.filter(image=post.image).count(), 6)
+
+        url = reverse("post_image", args=[self.author1.serial, post.serial])
+        response = self.client.get(url, {"w": 500}, HTTP_ACCEPT="image/webp,*/*")
+        with Image.open(BytesIO(response.content)) as variant:
+            self.assertEqual((variant.format, variant.size), ("WEBP", (640, 320)))
+        self.assertEqual(response["Content-Type"], "image/webp")
+        self.assertIn("Accept", response["Vary"])
+        response = self.client.get(url, {"w": 300})
+        with Image.open(BytesIO(response.content)) as variant:
+            self.assertEqual((variant.format, variant.size), ("JPEG", (320, 160)))
+        self.assertEqual(response["ETag"], f'"{post.image_id}-320.jpeg"')
+
+        # no upscaling, the original is served
+        small = BytesIO()
+        Image.new("RGB", (100, 100), color="red").save(small, format="PNG")
+        post = Post.objects.create(author=self.author1, title="Small", content_type="image/png;base64",
+                                   content=base64.b64encode(small.getvalue()).decode("utf-8"), visibility="public")
+        response = self.client.get(reverse("fqid_post_image", args=[post.fqid]), {"w": 320})
+        self.assertEqual(response.content, small.getvalue())
+        response = self.client.get(reverse("fqid_post_image", args=[post.fqid]), {"w": "wide"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StreamFeedTest(BaseAPITestCase):
+
+    @contextmanager
+    def updating_streams(self):
+        """
+        Runs the stream updates scheduled inside the block in this thread, after the block.
+        """
+        with patch("service.utils.feed.pool.submit", side_effect=lambda key, fn, *args: fn(*args)):
+            with self.captureOnCommitCallbacks(execute=True):
+                yield
+
+    # ://service/api/posts/
+    def test_stream_visibility(self):
+        with self.updating_streams():
+            Post.objects.create(author=self.author1, title="Mine", content_type="text/markdown", content="mine", visibility="friends")
+            Post.objects.create(author=self.author2, title="Public", content_type="text/markdown", content="public", visibility="public")
+            Post.objects.create(author=self.author2, title="Unlisted", content_type="text/markdown", content="unlisted", visibility="unlisted")
+            Post.objects.create(author=self.author2, title="Friends", content_type="text/markdown", content="friends", visibility="friends")
+            Post.objects.create(author=self.author3, title="Stranger", content_type="text/markdown", content="friends", visibility="friends")
+
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual({post["title"] for post in response.data["src"]}, {"Mine", "Public"})
+
+        # following shows unlisted posts, becoming friends shows friends posts
+        with self.updating_streams():
+            follow = Follow.objects.create(follower=self.author1, followed=self.author2, pending="no")
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual({post["title"] for post in response.data["src"]}, {"Mine", "Public", "Unlisted"})
+
+        with self.updating_streams():
+            Follow.objects.create(follower=self.author2, followed=self.author1, pending="no")
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual(response.data["count"], 4)
+
+        # unfollowing removes them again
+        with self.updating_streams():
+            follow.delete()
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual({post["title"] for post in response.data["src"]}, {"Mine", "Public"})
+
+    def test_stream_writes_only_non_public_posts(self):
+        Follow.objects.create(follower=self.author1, followed=self.author2, pending="no")
+        with self.captureOnCommitCallbacks() as callbacks:
+            public = Post.objects.create(author=self.author2, title="Public", content_type="text/markdown", content="public", visibility="public")
+        # nothing to fan out for a new public post, and nothing is written in the request
+        self.assertEqual(callbacks, [])
+
+        with self.updating_streams():
+            post = Post.objects.create(author=self.author2, title="Unlisted", content_type="text/markdown", content="unlisted", visibility="unlisted")
+        self.assertEqual(set(FeedEntry.objects.values_list("owner", "post")), {(self.author1.id, post.id), (self.author2.id, post.id)})
+
+        # made public, soft deleted: gone from the streams either way
+        with self.updating_streams():
+            post.visibility = "public"
+            post.save()
+        self.assertFalse(FeedEntry.objects.exists())
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual([post["title"] for post in response.data["src"]], ["Unlisted", "Public"])
+
+        with self.updating_streams():
+            public.visibility = "deleted"
+            public.save()
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual([post["title"] for post in response.data["src"]], ["Unlisted"])
+
+    def test_stream_rebuild(self):
+        Follow.objects.create(follower=self.author1, followed=self.author2, pending="no")
+        Post.objects.create(author=self.author2, title="Unlisted", content_type="text/markdown", content="unlisted", visibility="unlisted")
+        Post.objects.create(author=self.author2, title="Friends", content_type="text/markdown", content="friends", visibility="friends")
+        call_command("rebuild_feed", stdout=StringIO())
+        response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual([post["title"] for post in response.data["src"]], ["Unlisted"])
+
+    def test_list_serialization_prefetches_likes_and_comments(self):
+        for i in range(3):
+            post = Post.objects.create(author=self.author1, title=f"Post {i}", content_type="text/markdown", content="content", visibility="public")
+            for author in [self.author2, self.author3]:
+                Like.objects.create(author=author, object=post.fqid)
+                comment = Comment.objects.create(author=author, content="comment", post=post.fqid)
+                Like.objects.create(author=self.author1, object=comment.fqid)
+
+        request = Request(APIRequestFactory().get("/api/posts/"))
+        posts = list(Post.objects.select_related('author'))
+        # the author profiles are cached by a first serialization
+        PostSerializer(posts, many=True, context={'request': request}).data
+        # one query for the comments, one for the likes of posts and comments, both on
+        # the local post/comment keys rather than the fqids
+        with CaptureQueriesContext(connection) as queries:
+            data = PostSerializer(posts, many=True, context={'request': request}).data
+        self.assertEqual(len(queries), 2)
+        self.assertTrue(all('"local_post_id" IN' in query["sql"] for query in queries))
+        self.assertEqual(len(data[0]["likes"]["src"]), 2)
+        self.assertEqual(len(data[0]["comments"]["src"]), 2)
+        self.assertEqual(len(data[0]["comments"]["src"][0]["likes"]["src"]), 1)
+
+    def test_stream_cursor_pagination(self):
+        for i in range(5):
+            Post.objects.create(author=self.author2, title=f"Post {i}", content_type="text/markdown", content="public", visibility="public")
+
+        response = self.client.get(reverse("get_all_visible_post"), {"cursor": "", "size": 2})
+        self.assertEqual([post["title"] for post in response.data["src"]], ["Post 4", "Post 3"])
+        self.assertEqual(response.data["page_number"], 1)
+        self.assertEqual(response.data["count"], 5)
+
+        # posts published while paging neither shift nor repeat the following pages
+        Post.objects.create(author=self.author2, title="Post 5", content_type="text/markdown", content="public", visibility="public")
+        titles = []
+        while response.data["next"]:
+            response = self.client.get(reverse("get_all_visible_post"), {"cursor": response.data["next"], "size": 2})
+            titles += [post["title"] for post in response.data["src"]]
+        self.assertEqual(titles, ["Post 2", "Post 1", "Post 0"])
+        self.assertEqual(response.data["page_number"], 3)
+
+        response = self.client.get(reverse("get_all_visible_post"), {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_stream_summary_defers_content(self):
+        Post.objects.create(author=self.author2, title="Long", content_type="text/plain", content="x" * 1000, visibility="public")
+        image = BytesIO()
+        Image.new("RGB", (10, 10), color="red").save(image, format="PNG")
+        post = Post.objects.create(author=self.author2, title="Image", content_type="image/png;base64",
+                                   content=base64.b64encode(image.getvalue()).decode("utf-8"), visibility="public")
 
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("get_all_visible_post"), {"summary": "true"})
+        image_post, text_post = response.data["src"]
+        self.assertNotIn("content", text_post)
+        self.assertNotIn("likes", text_post)
+        self.assertEqual((len(text_post["preview"]), text_post["image"]), (300, None))
+        self.assertEqual((image_post["preview"], image_post["image"]), (None, f"{post.fqid}/image"))
+        feed_query = next(query["sql"] for query in queries if "UNION" in query["sql"] and "LIMIT" in query["sql"])
+        self.assertNotIn(', "post_post"."content",', feed_query)
 
+        response = self.client.get(reverse("post_list", args=[self.author2.serial]), {"fields": "title,content"})
+        self.assertEqual(response.data["src"][0], {"title": "Long", "content": "x" * 1000})
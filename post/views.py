@@ -1,7 +1,7 @@
 from django.shortcuts import render, get_object_or_404
 from author.serializers import AuthorSerializer, Author
 from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
-from post.serializers import PostSerializer
+from post.serializers import PostSerializer, PREVIEW_LENGTH, SUMMARY_FIELDS
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
@@ -9,20 +9,25 @@ from post.models import Post
 from rest_framework import status
 from rest_framework.permissions import AllowAny
 from rest_framework.authentication import get_authorization_header
-import base64
 from django.http import HttpResponse
+from django.db.models.functions import Substr
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.pagination import PageNumberPagination
 from service.utils.push import push
-from service.utils.check_friend import check_friend
+from service.utils import feed, friends, images
+from service.utils.response_cache import cache_response, cached_response
+from service.utils.pagination import KeysetPaginationMixin
 from rest_framework.exceptions import PermissionDenied, ValidationError
 
 
 
-class PostPagination(PageNumberPagination):
+class PostPagination(KeysetPaginationMixin, PageNumberPagination):
     page_size = 5
     page_size_query_param = 'size'
     page_query_param = 'page'  
+    count_mode = 'estimate'
     
     # sorting
     def paginate_queryset(self, queryset, request, view=None):
@@ -33,14 +38,83 @@ class PostPagination(PageNumberPagination):
     def get_paginated_response(self, data, count):
         response_data = {
                 "type":"posts",
-                "page_number":self.page.number,
+                "page_number":self.page_number,
                 "size": self.get_page_size(self.request),
                 "count": count,
-                "src": data
+                "src": data,
+                **self.cursor_data()
             }     
         return Response(response_data, status=status.HTTP_200_OK)
 
 
+class StreamPagination(PostPagination):
+    page_size = 50
+
+
+def list_fields(request):
+    """
+    Post fields asked for with `?summary=true` or `?fields=a,b,...`, None for the full
+    representation.
+    """
+    if request.query_params.get('summary', '').lower() in ('true', '1'):
+        return set(SUMMARY_FIELDS)
+    fields = request.query_params.get('fields')
+    if fields:
+        return {field.strip() for field in fields.split(',')}
+    return None
+
+
+def defer_content(queryset, fields, prefix=''):
+    """
+    Leaves `content` out of a post list query unless `fields` needs it, and annotates
+    `content_preview` (the first PREVIEW_LENGTH characters, cut by the database) when
+    the preview is asked for. `prefix` is the path to the post, e.g. 'post__'.
+    """
+    if fields is None or 'content' in fields:
+        return queryset
+    queryset = queryset.defer(f'{prefix}content')
+    if 'preview' in fields:
+        queryset = queryset.annotate(content_preview=Substr(f'{prefix}content', 1, PREVIEW_LENGTH))
+    return queryset
+
+
+# bytes allowed for the form fields sent along an image upload
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+
+def check_upload_length(request):
+    """
+    Refuses with a 413 requests larger than IMAGE_MAX_UPLOAD_SIZE (plus room for the other
+    fields), before anything reads the body.
+    """
+    if int(request.META.get('CONTENT_LENGTH') or 0) > images.MAX_UPLOAD_SIZE + UPLOAD_FORM_OVERHEAD:
+        raise images.ImageTooLarge()
+
+
+def image_upload(request):
+    """
+    Checks the image file uploaded as `content` (multipart) and returns `(data, upload)`:
+    the other request fields and the file. Store it with `store_upload` once the other
+    fields are valid. Returns `(request.data, None)` when no file was uploaded.
+    """
+    check_upload_length(request)
+    image_file = request.FILES.get('content')
+    if image_file is None:
+        return request.data, None
+    images.validate_upload(image_file)
+    data = {key: value for key, value in request.data.items() if key != 'content'}
+    return data, image_file
+
+
+def store_upload(upload):
+    """
+    Stores a file returned by `image_upload` and returns its `PostImage`. The file is hashed
+    and copied into the image store chunk by chunk, it is never base64 encoded or copied
+    with the form.
+    """
+    return images.store_file(upload, upload.content_type)
+
+
 class PostView(ModelViewSet):
     queryset = Post.objects.select_related('author').all()
     serializer_class = PostSerializer
@@ -119,26 +193,18 @@ class PostView(ModelViewSet):
     )
     def create(self, request, *args, **kwargs):
         '''
-        Handle image upload, encode the image file to base64 data
+        Handle image upload, the file goes straight into the image store
         '''
+        check_upload_length(request)
         content_type = request.data.get('content_type')
-        print(content_type)
         if content_type == 'image/jpeg':
-        
-            image_file = request.FILES.get('content')
-            if not image_file:
+            data, upload = image_upload(request)
+            if upload is None:
                 return Response({"error": "An image file is required."},
                                 status=status.HTTP_400_BAD_REQUEST)            
-            # base64 encode
-            image_data = image_file.read()
-            base64_data = base64.b64encode(image_data).decode('utf-8')
-            
-            # request.data is immutable
-            modified_data = request.data.copy()  
-            modified_data['content'] = base64_data 
-            serializer = self.get_serializer(data=modified_data)
+            serializer = self.get_serializer(data=data, context={'request': request, 'image': upload})
             serializer.is_valid(raise_exception=True)
-            self.perform_create(serializer)
+            serializer.save(image=store_upload(upload), content='')
             headers = self.get_success_headers(serializer.data)
         
             return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
@@ -165,7 +231,7 @@ class PostView(ModelViewSet):
             post_author = post.author
 
             # Check if the current user and the post author are mutual followers (friends)
-            if author.is_friend_with(post_author):
+            if friends.are_friends(author, post_author):
                 serializer = self.get_serializer(post)
                 return Response(serializer.data, status=status.HTTP_200_OK)
             else:
@@ -201,7 +267,7 @@ class PostView(ModelViewSet):
                 title=f"Shared: {original_post.title}",
                 content=original_post.content,
                 content_type=original_post.content_type,
-                image_content=original_post.image_content,
+                image=original_post.image,
                 visibility="public",  # Shared posts are public by default
             )
             serializer = self.get_serializer(shared_post)
@@ -224,12 +290,8 @@ class PostView(ModelViewSet):
         author_id = request.query_params.get('author_id')
         post_id = request.query_params.get('post_id')
         
-        image_post = get_object_or_404(Post, author=author_id, id=post_id)
-        
-        image_binary = base64.b64decode(image_post.content)
-        content_type = image_post.content_type
-
-        return HttpResponse(image_binary, content_type=content_type)
+        image_post = get_object_or_404(Post.objects.select_related('image'), author=author_id, id=post_id, image__isnull=False)
+        return HttpResponse(images.read_image(image_post.image), content_type=image_post.image.content_type)
 
     
 
@@ -252,7 +314,7 @@ def post_detail(request, POST_SERIAL=None, AUTHOR_SERIAL=None):
     2. **PUT** [local]:
     - Updates a post identified by `POST_SERIAL` for the author identified by `AUTHOR_SERIAL`.
     - Only the authenticated author of the post can update it.
-    - Handles updates, including handling image content by encoding it in base64.
+    - Handles updates, including replacing the image with an uploaded file (multipart `content`).
 
     3. **DELETE** [local]:
     - Performs a soft delete on a post identified by `POST_SERIAL` for the author identified by `AUTHOR_SERIAL`.
@@ -279,9 +341,18 @@ def post_detail(request, POST_SERIAL=None, AUTHOR_SERIAL=None):
     - HTTP 400 if the post deletion fails.
 
     Special Cases:
-    - If the post visibility is "friends," the `check_friend` function verifies access rights for the requesting user.
-    - Handles image uploads by converting image content to base64 format for storage.
+    - If the post visibility is "friends," `friends.are_friends` verifies access rights for the requesting user.
+    - GET responses of public posts are cached (see `service.utils.response_cache`) and
+      carry an ETag; `If-None-Match` gets a 304.
+    - Uploaded image files are streamed into the image store once the other fields are valid
+      (see `store_upload`), base64 `content` is moved there when the post is saved
+      (see `Post.store_image`). The response to an upload links the stored image as
+      `image` instead of sending it back as `content`.
     """
+    cached = cached_response(request)
+    if cached is not None:
+        return cached
+
     if POST_SERIAL is not None and AUTHOR_SERIAL is not None:
         author = get_object_or_404(Author, serial=AUTHOR_SERIAL)
         post = get_object_or_404(Post, serial=POST_SERIAL, author=author.id)
@@ -296,12 +367,13 @@ def post_detail(request, POST_SERIAL=None, AUTHOR_SERIAL=None):
         
         serializer = PostSerializer(post, context={'request': request})
         if serializer.data.get("visibility") == "friends":
-            if check_friend(author, request.user.author) or request.user.author == author:
+            if friends.are_friends(author, request.user.author) or request.user.author == author:
                 return Response(serializer.data, status=status.HTTP_200_OK)
             else:
                 return Response({"detail": "You are not authorized to get this post."}, status=status.HTTP_403_FORBIDDEN)
 
-            
+        if post.visibility == 'public':
+            return cache_response(request, Response(serializer.data, status=status.HTTP_200_OK), post=post)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     elif request.method == 'PUT':
@@ -309,26 +381,14 @@ def post_detail(request, POST_SERIAL=None, AUTHOR_SERIAL=None):
             return Response({"detail": "You are not authorized to update this post."}, status=status.HTTP_403_FORBIDDEN)
         
         # handle image post
-        image_file = request.FILES.get('content')
-        if image_file and image_file.content_type == 'image/jpeg':
-            if not image_file:
-                return Response({"error": "An image file is required."},
-                                status=status.HTTP_400_BAD_REQUEST)            
-            # base64 encode
-            image_data = image_file.read()
-            base64_data = base64.b64encode(image_data).decode('utf-8')
-            
-            # request.data is immutable
-            request_data = request.data.copy()
-            request_data['content'] = base64_data
-
-            serializer = PostSerializer(post, data=request_data,  partial=True, context={'request': request})
-        else:
-            serializer = PostSerializer(post, data=request.data, partial=True, context={'request': request})
-        print(request.data)
+        data, upload = image_upload(request)
+        serializer = PostSerializer(post, data=data, partial=True, context={'request': request, 'image': upload})
         try:
             if serializer.is_valid():
-                serializer.save()  
+                if upload is not None:
+                    serializer.save(image=store_upload(upload), content='')
+                else:
+                    serializer.save()  
                 push(author, request, serializer.data)
                 return Response(serializer.data, status=status.HTTP_200_OK)
         except ValidationError as e:
@@ -383,10 +443,14 @@ def fqid_post_detail(request, POST_FQID=None):
 
     Special Cases:
     - Ensures that deleted posts (`is_deleted=True`) are not accessible.
-    - Visibility checks are performed using the `check_friend` function for posts restricted to "friends."
+    - Visibility checks are performed using `friends.are_friends` for posts restricted to "friends."
+    - Responses of public posts are cached and carry an ETag, like `post_detail`.
     """
     if POST_FQID is None:
         return Response({"detail": "Post not found with POST_FQID."}, status=status.HTTP_404_NOT_FOUND)
+    cached = cached_response(request)
+    if cached is not None:
+        return cached
     
     post = get_object_or_404(Post, fqid=POST_FQID)
     if post.is_deleted == True:
@@ -396,11 +460,13 @@ def fqid_post_detail(request, POST_FQID=None):
     serializer = PostSerializer(post, context={'request': request})
     if serializer.data.get("visibility") == "friends":
         author = post.author
-        if check_friend(author, request.user.author) or request.user.author == author:
+        if friends.are_friends(author, request.user.author) or request.user.author == author:
             return Response(serializer.data, status=status.HTTP_200_OK)
         else:
             return Response({"detail": "You are not authorized to get this post."}, status=status.HTTP_403_FORBIDDEN)
-        
+
+    if post.visibility == 'public':
+        return cache_response(request, Response(serializer.data, status=status.HTTP_200_OK), post=post)
     return Response(serializer.data, status=status.HTTP_200_OK)
     
     
@@ -430,24 +496,33 @@ def post_list(request, AUTHOR_SERIAL):
 
     2. **POST**:
     - Allows the authenticated author to create a new post.
-    - Supports handling of image content, which is base64 encoded before saving.
+    - Supports image uploads (multipart `content`), streamed into the image store.
     - The new post is pushed to the appropriate inbox.
 
     Parameters:
     - AUTHOR_SERIAL: Numeric identifier for the author.
 
+    Query Parameters (GET):
+    - page, size, cursor: Pagination (optional).
+    - summary: `true` for posts without their body and likes/comments, with a `preview` of
+      text posts and the `image` URL of image posts instead (optional).
+    - fields: Comma separated post fields to return, e.g. `id,title,preview` (optional).
+
     Returns:
     - GET:
     - HTTP 200 with paginated serialized posts if successful.
-    - Pagination includes a count of the returned posts.
+    - Pagination includes the total number of visible posts (planner estimate on large lists).
     - POST:
     - HTTP 201 with serialized post data if successful.
     - HTTP 403 if the user is unauthorized to create a post for the author.
     - HTTP 400 for validation errors.
 
     Special Cases:
-    - Image posts: Image content is base64 encoded before saving.
-    - Friends-only posts: Access is determined using the `check_friend` function.
+    - Image posts: uploaded files are streamed into the image store once the other fields are valid
+      (see `store_upload`), base64 `content` is moved there when the post is saved
+      (see `Post.store_image`). The response to an upload links the stored image as
+      `image` instead of sending it back as `content`.
+    - Friends-only posts: Access is determined using `friends.are_friends`.
     - Push notifications: Created posts are pushed to the author's inbox.
     """
 
@@ -457,15 +532,16 @@ def post_list(request, AUTHOR_SERIAL):
         current_author = getattr(request.user, 'author', None)
         if current_author == author:
             posts = Post.objects.filter(author=author)
-        elif check_friend(current_author, author):
+        elif friends.are_friends(current_author, author):
             posts = Post.objects.filter(author=author).filter(visibility__in=['public', 'friends'])
         else:
             posts = Post.objects.filter(author=author, visibility='public')
         
+        fields = list_fields(request)
         paginator = PostPagination()
-        paged_posts = paginator.paginate_queryset(posts, request)
-        serializer = PostSerializer(paged_posts, many=True, context={'request': request})
-        return paginator.get_paginated_response(serializer.data,len(serializer.data)) 
+        paged_posts = paginator.paginate_queryset(defer_content(posts, fields), request)
+        serializer = PostSerializer(paged_posts, many=True, context={'request': request, 'post_fields': fields})
+        return paginator.get_paginated_response(serializer.data, paginator.get_count())
         
 
     elif request.method == 'POST':
@@ -473,35 +549,55 @@ def post_list(request, AUTHOR_SERIAL):
             return Response({"detail": "You are not authorized to create a post for this author."}, status=status.HTTP_403_FORBIDDEN)
 
         # handle image post
-        image_file = request.FILES.get('content')
-        if image_file and image_file.content_type == 'image/jpeg':
-            if not image_file:
-                return Response({"error": "An image file is required."},
-                                status=status.HTTP_400_BAD_REQUEST)            
-            # base64 encode
-            image_data = image_file.read()
-            base64_data = base64.b64encode(image_data).decode('utf-8')
-            
-            # request.data is immutable
-            request_data = request.data.copy()
-            request_data['content'] = base64_data
-
-            # serializer = PostSerializer(data=request_data)
-            serializer = PostSerializer(data=request_data, context={'request': request})
-        else:   
-            # serializer = PostSerializer(data=request.data)
-            serializer = PostSerializer(data=request.data, context={'request': request})
+        data, upload = image_upload(request)
+        serializer = PostSerializer(data=data, context={'request': request, 'image': upload})
             
         if serializer.is_valid():
-            serializer.save(author=author)
+            if upload is not None:
+                serializer.save(author=author, image=store_upload(upload), content='')
+            else:
+                serializer.save(author=author)
             # push to inbox
             push(author, request, serializer.data)
-            print(serializer.data)
-           
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         else:
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
+def image_response(request, image_post):
+    """
+    Response carrying the image of `image_post`, or a 304 when the client's copy (matched by
+    `If-None-Match`, else `If-Modified-Since`) is still current. The ETag is the image's
+    content hash, so a 304 never reads the image bytes.
+
+    `?w=` asks for an image about that many pixels wide: a downscaled WebP (if the client
+    accepts it) or JPEG variant is served instead of the original when it is smaller.
+
+    Both image URLs name a post, which can be edited, deleted or made private, so caches
+    revalidate on every use. Images of posts that are not public are only cached by the client.
+    """
+    image = image_post.image
+    requested = request.query_params.get('w')
+    if requested is not None:
+        if not requested.isdigit() or int(requested) == 0:
+            raise ValidationError({"w": "Must be a positive number of pixels."})
+        max_width = images.variant_width(image, int(requested))
+        if max_width is not None:
+            image_format = 'webp' if 'image/webp' in request.META.get('HTTP_ACCEPT', '') else 'jpeg'
+            image = images.get_variant(image, max_width, image_format) or image
+    etag = f'"{image.key}"'
+    last_modified = int(image_post.updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = HttpResponse(images.read_image(image), content_type=image.content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    scope = {"public": True} if image_post.visibility == "public" else {"private": True}
+    patch_cache_control(response, no_cache=True, **scope)
+    if requested is not None:
+        patch_vary_headers(response, ['Accept'])
+    return response
+
+
 @api_view(['GET'])
 @permission_classes([AllowAny])
 def post_image(request, POST_SERIAL=None, AUTHOR_SERIAL=None, POST_FQID=None):
@@ -522,9 +618,16 @@ def post_image(request, POST_SERIAL=None, AUTHOR_SERIAL=None, POST_FQID=None):
     - Returns HTTP 404 if the post's content is not an image.
 
     Behavior:
-    - Converts the base64-encoded content of a post to binary and returns it as an image.
-    - Verifies that the post's content type is either `image/png` or `image/jpeg`.
+    - Reads the post's image from the image store (see `service.utils.images`) and returns it
+      with the content type it was uploaded with. The post's other columns are not loaded.
     - Handles retrieval for both `AUTHOR_SERIAL/POST_SERIAL` and `POST_FQID` formats.
+    - Sends a strong `ETag` (the image's content hash) and `Last-Modified` (the post's last
+      edit). `If-None-Match`/`If-Modified-Since` requests for an unchanged image get a 304
+      without reading the image.
+    - Both URLs are revalidated on every use (`no-cache`): the post can be edited or made
+      private, and the ETag keeps the revalidation cheap.
+    - `?w=<pixels>` serves a downscaled WebP/JPEG variant (see `service.utils.images`), e.g.
+      http://127.0.0.1:8000/api/authors/3/posts/7/image?w=640
 
     Parameters:
     - AUTHOR_SERIAL: Numeric identifier for the author.
@@ -533,32 +636,27 @@ def post_image(request, POST_SERIAL=None, AUTHOR_SERIAL=None, POST_FQID=None):
 
     Returns:
     - HTTP 200 with the binary image data if successful.
+    - HTTP 304 if the client's copy is current.
+    - HTTP 400 if `w` is not a positive integer.
     - HTTP 404 if the post or its image content is not found.
-    - HTTP 404 if the post's content type is not an image (e.g., `image/png` or `image/jpeg`).
-
-    Special Cases:
-    - Base64-encoded content is decoded into binary format before returning.
-    - Content type is verified to ensure only image formats are supported.
+    - HTTP 404 if the post is not an image post.
     """
 
+    # image metadata only, the bytes are read when the client has no current copy
+    posts = Post.objects.select_related('image').only('updated_at', 'visibility', 'image__content_type', 'image__storage', 'image__width')
     if POST_SERIAL is not None and AUTHOR_SERIAL is not None:
         author = get_object_or_404(Author, serial=AUTHOR_SERIAL)
-        image_post = get_object_or_404(Post, author=author.id, serial=POST_SERIAL)
-        # if 'image/png;base64' != post.content_type or 'image/jpeg;base64' not in post.content_type
-        if 'image/png;base64' == image_post.content_type or 'image/jpeg;base64' == image_post.content_type:
-            image_binary = base64.b64decode(image_post.content)
-            content_type = image_post.content_type
-            return HttpResponse(image_binary, content_type=content_type)
+        image_post = get_object_or_404(posts, author=author.id, serial=POST_SERIAL)
+        if image_post.image is not None:
+            return image_response(request, image_post)
         
         return Response({"detail": "Image not found with AUTHOR_SERIAL/POST_SERIAL."}, status=status.HTTP_404_NOT_FOUND)
     
     elif POST_FQID is not None:
         
-        image_post = get_object_or_404(Post, fqid=POST_FQID)
-        if 'image/png' == image_post.content_type or 'image/jpeg' == image_post.content_type:
-            image_binary = base64.b64decode(image_post.content)
-            content_type = image_post.content_type
-            return HttpResponse(image_binary, content_type=content_type)
+        image_post = get_object_or_404(posts, fqid=POST_FQID)
+        if image_post.image is not None:
+            return image_response(request, image_post)
         
         return Response({"detail": "Image not found with POST_FQID."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -574,6 +672,7 @@ def get_all_visible_post(request):
     - ://service/api/posts/
     Example:
     - GET: Retrieves all visible posts based on the user's authentication and relationships.
+    - http://localhost:8000/api/posts/?page=2&size=10
 
     Behavior:
     - Retrieves posts visible to the authenticated user, including:
@@ -582,44 +681,41 @@ def get_all_visible_post(request):
     - Posts from followed authors:
         - If the followed author is a friend, includes posts with visibility `unlisted` and `friends`.
         - Otherwise, includes posts with visibility `unlisted`.
+    - Public posts come from the public timeline, the others from the author's materialized
+      feed (`FeedEntry`), which is written in the background when posts are saved and
+      follows change (see `service.utils.feed`).
 
     - Filters out deleted posts (`is_deleted=False`) and orders the posts by the latest updates.
 
     Parameters:
-    - None (uses the authenticated user from the request).
+    - page: The current page number (optional).
+    - size: The number of posts per page (optional).
+    - cursor: Keyset pagination, empty for the first page then the `next` of the previous
+      page (optional). Replaces `page`; deep pages cost the same as the first one.
+    - summary: `true` for a light list without the post bodies and their likes/comments:
+      a `preview` of text posts and the `image` URL of image posts instead (optional).
+    - fields: Comma separated post fields to return, e.g. `id,title,preview` (optional).
+      `content` is only read from the database when it is asked for.
 
     Returns:
-    - HTTP 200 with a serialized list of visible posts:
+    - HTTP 200 with a paginated list of visible posts:
     - "type": Always set to "posts".
+    - "page_number": The current page.
+    - "size": The page size.
     - "count": Total number of visible posts.
     - "src": Serialized post data.
+    - "next": Cursor of the following page, None on the last one (only with `cursor`).
 
     Special Cases:
     - Handles posts with visibility settings (`public`, `friends`, `unlisted`) based on the user's relationships.
     - Posts are ordered by the `updated_at` timestamp in descending order.
     """
 
-    
     author = request.user.author
-    follow_objects = author.following.filter(pending='no')
-    posts = Post.objects.filter(visibility='public') # all public
-    posts = posts | Post.objects.filter(author=author) # all mine
-    
-    if follow_objects: 
-        for follow in follow_objects:
-            if follow.pending == 'no':
+    fields = list_fields(request)
+    posts = feed.stream(author, lambda posts: defer_content(posts.select_related('author'), fields))
 
-                if check_friend(follow.followed, author):
-                    posts = posts | Post.objects.filter(author=follow.followed, visibility__in=['unlisted', 'friends'])
-                else:
-                    posts = posts | Post.objects.filter(author=follow.followed, visibility='unlisted')
-    
-     
-    posts = posts.filter(is_deleted=False, visibility__in=['unlisted', 'friends', 'public']).order_by("-updated_at")
-    serializer = PostSerializer(posts, many=True, context={'request': request})
-    response_data = {
-            "type":"posts",
-            "count": len(serializer.data),
-            "src": serializer.data
-        }
-    return Response(response_data, status=status.HTTP_200_OK)
\ No newline at end of file
+    paginator = StreamPagination()
+    posts = paginator.paginate_queryset(posts, request)
+    serializer = PostSerializer(posts, many=True, context={'request': request, 'post_fields': fields})
+    return paginator.get_paginated_response(serializer.data, paginator.get_count())
@@ -11,3 +11,5 @@ admin.site.register(Comment)
 admin.site.register(Like)
 admin.site.register(models.Follow)
 admin.site.register(models.Node)
+admin.site.register(models.Outbox)
+admin.site.register(models.GithubPoll)
@@ -5,4 +5,4 @@ class ServiceConfig(AppConfig):
     name = 'service'
     
     def ready(self):
-        pass
+        from . import signals  # noqa: F401
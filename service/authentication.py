@@ -6,11 +6,84 @@ from django.conf import settings
 from rest_framework import exceptions
 from django.contrib.auth.models import User
 from django.contrib.auth.hashers import check_password
+from django.db.models import Model
+from django.utils.functional import SimpleLazyObject, empty
 import base64
+from author.models import Author
+from service.utils.credentials import credentials
+from service.utils.jwt_auth import token_version
+
+STATELESS = getattr(settings, 'JWT_STATELESS', True)
+
+
+class PartialInstance(SimpleLazyObject):
+    """
+    Stand-in for a model instance of which some fields are already known (`known`).
+    Reading those does not touch the database; anything else loads the row once.
+    Compares and hashes like the model instance (by primary key) without loading it, and
+    passes for one in `isinstance` checks, so it can be used in ORM filters
+    (`Post.objects.filter(author=request.user.author)`) without being loaded.
+    """
+
+    def __init__(self, model, known):
+        pk = known['pk']
+        super().__init__(lambda: model._default_manager.get(pk=pk))
+        self.__dict__['_model'] = model
+        self.__dict__['_known'] = {'_meta': model._meta, **known}
+
+    @property
+    def __class__(self):
+        return self._model
+
+    def __getattr__(self, name):
+        known = self.__dict__['_known']
+        if name in known:
+            return known[name]
+        if self._wrapped is empty and name != '_state' and not hasattr(self._model, name):
+            # probes such as the ORM's hasattr(value, 'resolve_expression'): a model
+            # instance would not have the attribute either
+            raise AttributeError(name)
+        return super().__getattr__(name)
+
+    def __eq__(self, other):
+        if isinstance(other, PartialInstance):
+            return self._model is other._model and self.pk == other.pk
+        if isinstance(other, Model):
+            return other._meta.concrete_model is self._model and other.pk == self.pk
+        return NotImplemented
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __hash__(self):
+        return hash(self.pk)
+
+    def __bool__(self):
+        # permission classes test `request.user and ...`
+        return True
+
+
+def token_user(payload):
+    """
+    The user of a login token (see `create_user_token`) as a `PartialInstance`: `id`,
+    `username`, the flags and `author.pk`/`author.serial` come from the token.
+    """
+    author = PartialInstance(Author, {'pk': payload['author'], 'id': payload['author'],
+                                      'serial': payload['id'], 'user_id': payload['id']})
+    return PartialInstance(User, {'pk': payload['id'], 'id': payload['id'], 'username': payload['username'],
+                                  'is_active': payload['active'], 'is_staff': payload['staff'],
+                                  'is_authenticated': True, 'is_anonymous': False, 'author': author})
 
 
 class JwtQueryParamsAuthentication(BaseAuthentication):
-    
+    """
+    Login tokens, sent as `Authorization: Bearer <token>` or a `token` header.
+    Tokens from `create_user_token` are checked against the author's cached token version
+    and give a lazy user that is only loaded when a view needs more than the token
+    carries; older tokens load the user.
+    """
+
     def authenticate(self, request):
         token = None
         auth_header = request.headers.get('Authorization')
@@ -31,6 +104,11 @@ class JwtQueryParamsAuthentication(BaseAuthentication):
         except Exception:
             raise exceptions.AuthenticationFailed('Invalid token')
 
+        if STATELESS and 'ver' in payload:
+            if not payload['active'] or token_version(payload['author']) != payload['ver']:
+                raise exceptions.AuthenticationFailed('Token has been revoked')
+            return (token_user(payload), token)
+
         try:
             if 'id' in payload and 'username' in payload:
                 user = User.objects.get(id=payload['id'], username=payload['username'])
@@ -44,6 +122,8 @@ class BackendAuthentication(BaseAuthentication):
     """
     For backend-to-backend communication.
     Backends must include a shared token in headers.
+    Verified credentials are cached (see `service.utils.credentials`), so only the first
+    request of a node pays for the password hasher.
     """
 
     def authenticate(self, request):
@@ -55,7 +135,6 @@ class BackendAuthentication(BaseAuthentication):
             base64_credentials = auth_header.split("Basic ")[1]
             decoded_credentials = base64.b64decode(base64_credentials).decode("utf-8")
             username, password = decoded_credentials.split(":", 1)  # Split into username and password
-            print(username, password)
         except (IndexError, ValueError, base64.binascii.Error):
             raise exceptions.AuthenticationFailed("Invalid Basic Auth header")
         
@@ -63,7 +142,7 @@ class BackendAuthentication(BaseAuthentication):
         try:
             user = User.objects.get(username=username)
             
-            if not user.check_password(password):
+            if not user.is_active or not credentials.verify(user, password):
                 raise exceptions.AuthenticationFailed("Invalid username or password")
         except User.DoesNotExist:
             raise exceptions.AuthenticationFailed("Invalid username or password")
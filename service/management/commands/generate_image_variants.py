@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from post.models import PostImage
+from service.utils.images import generate_variants
+
+
+class Command(BaseCommand):
+    help = "Renders the missing downscaled variants of stored post images (e.g. images moved in by a migration)."
+
+    def handle(self, *args, **options):
+        keys = list(PostImage.objects.filter(variants__isnull=True).values_list('key', flat=True))
+        rendered = sum(generate_variants(key) for key in keys)
+        self.stdout.write(f"{rendered} variants rendered for {len(keys)} images")
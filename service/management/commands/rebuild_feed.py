@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from author.models import Author
+from service.utils.feed import local_readers, rebuild_feed
+
+
+class Command(BaseCommand):
+    help = "Backfills/rebuilds the materialized home stream (FeedEntry) of local authors."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--author', type=int, action='append', dest='serials',
+                            help="Only rebuild the stream of the author with this serial (repeatable).")
+
+    def handle(self, *args, **options):
+        authors = local_readers()
+        if options['serials']:
+            authors = authors.filter(serial__in=options['serials'])
+
+        total = 0
+        for author in authors:
+            count = rebuild_feed(author)
+            total += count
+            self.stdout.write(f"{author} ({author.serial}): {count} entries")
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {authors.count()} streams, {total} entries"))
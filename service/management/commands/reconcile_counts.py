@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from post.models import Post
+from comment.models import Comment
+from like.models import Like
+from service.utils.counters import reconcile_counts
+
+
+class Command(BaseCommand):
+    help = "Repairs the denormalized like/comment counters of posts and comments."
+
+    def handle(self, *args, **options):
+        for counter, repaired in reconcile_counts(Post, Comment, Like).items():
+            self.stdout.write(f"{counter}: {repaired} rows repaired")
@@ -1,13 +1,13 @@
 # runapscheduler.py
 import logging
-import requests
-from django.utils import timezone
-from author.models import Author
-from post.models import Post
 from django.conf import settings
+from service.utils.outbox import process_outbox
+from service.utils.github import poll_github_activity
+from service.utils.author_sync import sync_remote_authors
 
 from apscheduler.schedulers.blocking import BlockingScheduler
 from apscheduler.triggers.cron import CronTrigger
+from apscheduler.triggers.interval import IntervalTrigger
 from django.core.management.base import BaseCommand
 from django_apscheduler.jobstores import DjangoJobStore
 from django_apscheduler.models import DjangoJobExecution
@@ -16,56 +16,34 @@ from django_apscheduler import util
 logger = logging.getLogger(__name__)
 
 
+@util.close_old_connections
 def fetch_github_activity_task():
-    try:
-        logger.info("Starting GitHub activity fetch")
-        authors = Author.objects.all()
-        
-        for author in authors:
-            if not author.github_url or author.serial == 0:
-                continue
-                
-            github_username = author.github_url.rstrip('/').split('/')[-1]
-            url = f'https://api.github.com/users/{github_username}/events/public'
-            
-            headers = {
-                'Accept': 'application/vnd.github.v3+json',
-            }
-            
-            response = requests.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                events = response.json()
-                created_count = 0
-                
-                for event in events:
-                    event_type = event['type']
-                    event_id = event['id']
-                    
-                    if Post.objects.filter(github_event_id=event_id).exists():
-                        continue
-                    elif event_type != 'PushEvent':
-                        continue
-                    
-                    title = f"{event_type} on {event['repo']['name']}"
-                    content = f"Event data: {event['payload']}"
-                    
-                    Post.objects.create(
-                        author=author,
-                        title=title,
-                        content=content,
-                        created_at=timezone.now(),
-                        github_event_id=event_id
-                    )
-                    created_count += 1
-                
-                logger.info(f"Created {created_count} new posts for {github_username}")
-            else:
-                logger.error(f"Failed to fetch GitHub events for {github_username}. Status code: {response.status_code}")
-                
-    except Exception as e:
-        logger.error(f"Error in fetch_github_activity_task: {str(e)}")
-        raise
+  """
+  This job turns new GitHub push events of local authors into posts (see service.utils.github).
+  """
+  created = poll_github_activity()
+  if created:
+    logger.info(f"Created {created} posts from GitHub activity")
+
+
+@util.close_old_connections
+def process_outbox_task():
+  """
+  This job retries due federation deliveries from the outbox (see service.utils.outbox).
+  """
+  sent = process_outbox()
+  if sent:
+    logger.info(f"Processed {sent} outbox deliveries")
+
+
+@util.close_old_connections
+def sync_remote_authors_task():
+  """
+  This job pulls new and edited authors from every allowed node (see service.utils.author_sync).
+  """
+  for node_url, synced in sync_remote_authors().items():
+    if synced:
+      logger.info(f"Synced {synced} authors from {node_url}")
 
 
 # The `close_old_connections` decorator ensures that database connections, that have become
@@ -93,13 +71,31 @@ class Command(BaseCommand):
 
     scheduler.add_job(
       fetch_github_activity_task,
-      trigger=CronTrigger(minute="*/1"),  # Every 10 seconds
+      trigger=CronTrigger(minute="*/1"),  # every minute, feeds are only read when due
       id="fetch_github_activity_task",  # The `id` assigned to each job MUST be unique
       max_instances=1,
       replace_existing=True,
     )
     logger.info("Added job 'fetch_github_activity_task'.")
 
+    scheduler.add_job(
+      process_outbox_task,
+      trigger=IntervalTrigger(seconds=15),
+      id="process_outbox_task",
+      max_instances=1,
+      replace_existing=True,
+    )
+    logger.info("Added job 'process_outbox_task'.")
+
+    scheduler.add_job(
+      sync_remote_authors_task,
+      trigger=IntervalTrigger(minutes=5),
+      id="sync_remote_authors_task",
+      max_instances=1,
+      replace_existing=True,
+    )
+    logger.info("Added job 'sync_remote_authors_task'.")
+
     scheduler.add_job(
       delete_old_job_executions,
       trigger=CronTrigger(
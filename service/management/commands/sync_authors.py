@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from service.models import Node
+from service.utils.author_sync import sync_node_authors
+
+
+class Command(BaseCommand):
+    help = "Pulls new and edited authors from allowed nodes into local author copies."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true',
+                            help="Ignore the per node watermark and read every author again.")
+
+    def handle(self, *args, **options):
+        nodes = Node.objects.filter(is_allowed=True)
+        if options['full']:
+            nodes.update(authors_synced_at=None, authors_sync_page=None, authors_sync_started_at=None)
+
+        for node in nodes:
+            synced = sync_node_authors(node)
+            if synced is None:
+                self.stdout.write(self.style.WARNING(f"{node.url}: sync failed"))
+            else:
+                self.stdout.write(f"{node.url}: {synced} authors")
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0004_outbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='supports_batch_inbox',
+            field=models.BooleanField(blank=True, null=True),
+        ),
+    ]
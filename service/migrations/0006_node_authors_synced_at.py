@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0005_node_supports_batch_inbox'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='authors_synced_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 20:26
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def delete_duplicate_follows(apps, schema_editor):
+    """
+    Keeps one Follow per (follower, followed) pair: the accepted one over a pending one,
+    then the oldest.
+    """
+    Follow = apps.get_model('service', 'Follow')
+    pairs = Follow.objects.values('follower', 'followed').annotate(rows=Count('id')).filter(rows__gt=1)
+    duplicates = []
+    for pair in pairs:
+        ids = list(Follow.objects.filter(follower=pair['follower'], followed=pair['followed'])
+                   # 'no' (accepted) sorts before 'yes' (pending)
+                   .order_by('pending', 'created_at', 'id').values_list('id', flat=True))
+        duplicates.extend(ids[1:])
+    Follow.objects.filter(id__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0005_alter_author_display_name_alter_author_profile_image'),
+        ('service', '0006_node_authors_synced_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(delete_duplicate_follows, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followed', 'pending'], name='follow_followed_pending_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', 'pending'], name='follow_follower_pending_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='follow',
+            constraint=models.UniqueConstraint(fields=('follower', 'followed'), name='unique_follow'),
+        ),
+    ]
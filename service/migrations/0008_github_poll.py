@@ -0,0 +1,27 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0007_author_token_version'),
+        ('service', '0007_follow_unique_and_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GithubPoll',
+            fields=[
+                ('author', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='github_poll', serialize=False, to='author.author')),
+                ('username', models.CharField(blank=True, default='', max_length=100)),
+                ('etag', models.CharField(blank=True, max_length=200, null=True)),
+                ('poll_interval', models.PositiveIntegerField(default=60)),
+                ('next_poll_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_status_code', models.PositiveIntegerField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 21:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('service', '0008_github_poll'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='node',
+            name='authors_sync_page',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='node',
+            name='authors_sync_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0013_post_public_timeline'),
+        ('service', '0009_node_author_sync_page'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outbox',
+            name='post',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='outbox', to='post.post'),
+        ),
+    ]
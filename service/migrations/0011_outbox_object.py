@@ -0,0 +1,43 @@
+# Generated by Django 5.1.1 on 2026-10-18 22:34
+
+from django.db import migrations, models
+
+
+def fill_objects(apps, schema_editor):
+    """
+    Reads the delivered object of the recorded deliveries from their payload.
+    """
+    Outbox = apps.get_model('service', 'Outbox')
+    for entry in Outbox.objects.only('id', 'payload').iterator(chunk_size=500):
+        payload = entry.payload
+        if payload.get('type') == 'inbox-batch':
+            payload = payload.get('object') or {}
+        if isinstance(payload.get('id'), str):
+            Outbox.objects.filter(pk=entry.pk).update(object=payload['id'][:500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('author', '0007_author_token_version'),
+        ('post', '0013_post_public_timeline'),
+        ('service', '0010_outbox_post'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outbox',
+            name='object',
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+        migrations.AddField(
+            model_name='outbox',
+            name='results',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_objects, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='outbox',
+            index=models.Index(fields=['author', 'object'], name='outbox_author_object_idx'),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from django.db import models
 from django.utils import timezone
+from datetime import timedelta
 from author.models import Author
 
 
@@ -9,6 +10,13 @@ class Node(models.Model):
     username = models.CharField(max_length=20, editable = True, blank=True, null=True)
     password = models.CharField(max_length=20, editable = True, blank=True, null=True)
     is_allowed = models.BooleanField(default = False)
+    # whether the node accepts POST /api/inbox/batch; None until probed (see service.utils.outbox)
+    supports_batch_inbox = models.BooleanField(blank=True, null=True)
+    # watermark of the last successful author sync (see service.utils.author_sync)
+    authors_synced_at = models.DateTimeField(blank=True, null=True)
+    # where a sync cut short by AUTHOR_SYNC_MAX_PAGES resumes, and when its window started
+    authors_sync_page = models.PositiveIntegerField(blank=True, null=True)
+    authors_sync_started_at = models.DateTimeField(blank=True, null=True)
     
     def __str__(self):
         if self.is_allowed:
@@ -32,6 +40,16 @@ class Follow(models.Model):
     pending = models.CharField(max_length=10, choices=PENDING_CHOICES, default='yes')
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['follower', 'followed'], name='unique_follow'),
+        ]
+        indexes = [
+            # follow requests / followers of an author, and what an author follows
+            models.Index(fields=['followed', 'pending'], name='follow_followed_pending_idx'),
+            models.Index(fields=['follower', 'pending'], name='follow_follower_pending_idx'),
+        ]
+
     def __str__(self):
         return f"{self.follower} follows {self.followed}"
     
@@ -58,6 +76,80 @@ class Follow(models.Model):
         """
         return self.pending == 'no'
     
+class OutboxManager(models.Manager):
+    def stats(self, window=timedelta(hours=1)):
+        """
+        Per node queue depth and delivery latency.
+        Latency is averaged over the deliveries of the last `window`.
+        """
+        now = timezone.now()
+        recent = models.Q(outbox__status='delivered', outbox__delivered_at__gte=now - window)
+        nodes = Node.objects.annotate(
+            pending=models.Count('outbox', filter=models.Q(outbox__status__in=['pending', 'sending'])),
+            dead=models.Count('outbox', filter=models.Q(outbox__status='dead')),
+            delivered=models.Count('outbox', filter=recent),
+            avg_latency_ms=models.Avg('outbox__latency_ms', filter=recent),
+            oldest_pending=models.Min('outbox__created_at', filter=models.Q(outbox__status__in=['pending', 'sending'])),
+        )
+        return [
+            {
+                "node": node.name or node.url,
+                "url": node.url,
+                "pending": node.pending,
+                "dead": node.dead,
+                "delivered": node.delivered,
+                "avg_latency_ms": round(node.avg_latency_ms) if node.avg_latency_ms is not None else None,
+                "oldest_pending_seconds": (now - node.oldest_pending).total_seconds() if node.oldest_pending else None,
+            }
+            for node in nodes
+        ]
+
+
+class Outbox(models.Model):
+    """
+    A federation delivery (an inbox POST to a remote node) that must eventually succeed.
+    Pending deliveries are retried with jittered exponential backoff until they are
+    delivered or run out of attempts and become dead letters (see service.utils.outbox).
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sending', 'Sending'),
+        ('delivered', 'Delivered'),
+        ('dead', 'Dead'),
+    ]
+    node = models.ForeignKey(Node, on_delete=models.CASCADE, related_name='outbox', blank=True, null=True)
+    author = models.ForeignKey(Author, on_delete=models.SET_NULL, related_name='outbox', blank=True, null=True)
+    recipient = models.URLField(max_length=500)
+    url = models.URLField(max_length=500, blank=True, null=True)
+    payload = models.JSONField(default=dict)
+    # posts are stored without their content, which is read from the post when sending
+    post = models.ForeignKey('post.Post', on_delete=models.CASCADE, related_name='outbox', blank=True, null=True)
+    # fqid of the delivered post, comment or like, for the status of its deliveries
+    object = models.URLField(max_length=500, blank=True, null=True)
+    # inbox status code of every recipient serial of a delivered batch
+    results = models.JSONField(blank=True, null=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_status_code = models.PositiveIntegerField(blank=True, null=True)
+    last_error = models.TextField(blank=True, null=True)
+    latency_ms = models.PositiveIntegerField(blank=True, null=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    delivered_at = models.DateTimeField(blank=True, null=True)
+
+    objects = OutboxManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outbox_due_idx'),
+            models.Index(fields=['node', 'status'], name='outbox_node_status_idx'),
+            models.Index(fields=['author', 'object'], name='outbox_author_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.payload.get('type')} to {self.recipient} ({self.status})"
+
+
 class FollowManager(models.Manager):
     def active(self):
         """
@@ -68,3 +160,20 @@ class FollowManager(models.Manager):
 
 
     
+
+
+class GithubPoll(models.Model):
+    """
+    Conditional polling state of an author's public GitHub events (see service.utils.github):
+    the ETag of the last feed read and when GitHub allows the next poll.
+    """
+    author = models.OneToOneField(Author, on_delete=models.CASCADE, primary_key=True, related_name='github_poll')
+    # the ETag belongs to this user's feed
+    username = models.CharField(max_length=100, blank=True, default='')
+    etag = models.CharField(max_length=200, blank=True, null=True)
+    poll_interval = models.PositiveIntegerField(default=60)
+    next_poll_at = models.DateTimeField(default=timezone.now)
+    last_status_code = models.PositiveIntegerField(blank=True, null=True)
+
+    def __str__(self):
+        return f"GitHub events of {self.username or self.author_id}"
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Follow
-from author.serializers import Author, AuthorSerializer
+from author.serializers import Author, CachedAuthorSerializer
 from django.contrib.auth.models import User
 
 
@@ -48,7 +48,7 @@ class SignUpSerializer(serializers.ModelSerializer):
         
 class FollowSerializer(serializers.ModelSerializer):
     
-    follower = AuthorSerializer(read_only=True)
+    follower = CachedAuthorSerializer(read_only=True)
     created_at = serializers.DateTimeField(read_only=True)
     pending = serializers.CharField(write_only=True)
     class Meta:
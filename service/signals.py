@@ -0,0 +1,168 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from django.db import transaction
+from django.db.models import F
+from django.contrib.auth.models import User
+from author.models import Author
+from post.models import Post
+from comment.models import Comment
+from like.models import Like
+from service.models import Follow
+from service.utils import feed, friends
+from service.utils.jwt_auth import revoke_tokens
+from service.utils.profiles import profiles
+from service.utils import response_cache
+from service.utils.response_cache import author_tag, post_tag
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    """
+    Fan a created/edited post out to the streams that can see it, in the background.
+    This also covers post copies created by inbox deliveries, which also pick up the
+    likes and comments that arrived before the post.
+    """
+    if kwargs.get('raw'):
+        return
+    if created and instance.fqid:
+        likes = Like.objects.filter(object=instance.fqid, local_post__isnull=True).update(local_post=instance)
+        comments = Comment.objects.filter(post=instance.fqid, local_post__isnull=True).update(local_post=instance)
+        if likes or comments:
+            Post.objects.filter(pk=instance.pk).update(like_count=F('like_count') + likes,
+                                                       comment_count=F('comment_count') + comments)
+    # a new public post is read from the public timeline, no stream holds it
+    if not created or instance.visibility in feed.FEED_VISIBILITIES:
+        feed.schedule(feed.fan_out_post, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    """
+    Count a new comment on its post and link likes that arrived before the comment copy.
+    """
+    if not created or kwargs.get('raw'):
+        return
+    if instance.local_post_id:
+        Post.objects.filter(pk=instance.local_post_id).update(comment_count=F('comment_count') + 1)
+    if instance.fqid:
+        likes = Like.objects.filter(object=instance.fqid, local_comment__isnull=True).update(local_comment=instance)
+        if likes:
+            Comment.objects.filter(pk=instance.pk).update(like_count=F('like_count') + likes)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    if instance.local_post_id:
+        Post.objects.filter(pk=instance.local_post_id, comment_count__gt=0).update(comment_count=F('comment_count') - 1)
+
+
+@receiver(post_save, sender=Like)
+def like_saved(sender, instance, created, **kwargs):
+    """
+    Count a new like (local or received in an inbox) on the liked post or comment.
+    """
+    if not created or kwargs.get('raw'):
+        return
+    if instance.local_post_id:
+        Post.objects.filter(pk=instance.local_post_id).update(like_count=F('like_count') + 1)
+    elif instance.local_comment_id:
+        Comment.objects.filter(pk=instance.local_comment_id).update(like_count=F('like_count') + 1)
+
+
+@receiver(post_delete, sender=Like)
+def like_deleted(sender, instance, **kwargs):
+    if instance.local_post_id:
+        Post.objects.filter(pk=instance.local_post_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+    elif instance.local_comment_id:
+        Comment.objects.filter(pk=instance.local_comment_id, like_count__gt=0).update(like_count=F('like_count') - 1)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """
+    A follow request, accept or unfollow changes both authors' follow graph and
+    what they can see (unlisted posts for the follower, friends posts for both).
+    """
+    if kwargs.get('raw'):
+        return
+    friends.invalidate(instance.follower_id, instance.followed_id)
+    origin = kwargs.get('origin')
+    if origin is not None and getattr(origin, 'model', type(origin)) is not Follow:
+        # cascading delete of one of the authors, their feed rows go with them
+        return
+    feed.schedule(feed.refresh_feed_between, instance.follower_id, instance.followed_id)
+    feed.schedule(feed.refresh_feed_between, instance.followed_id, instance.follower_id)
+
+
+@receiver(post_save, sender=Author)
+def author_saved(sender, instance, created, **kwargs):
+    """
+    Drop the cached profile of the author.
+    """
+    profiles.invalidate(instance.fqid)
+    invalidate_responses(author_tag(instance.fqid))
+
+
+@receiver(post_delete, sender=Author)
+def author_deleted(sender, instance, **kwargs):
+    profiles.invalidate(instance.fqid)
+    invalidate_responses(author_tag(instance.fqid))
+
+
+def invalidate_responses(*tags):
+    # after the commit, so a concurrent request cannot cache the old rows again
+    transaction.on_commit(lambda: response_cache.invalidate(*tags))
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def post_changed(sender, instance, created=False, **kwargs):
+    # nothing can be cached yet for a new post
+    if not created:
+        invalidate_responses(post_tag(instance.pk))
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def comment_changed(sender, instance, **kwargs):
+    if instance.local_post_id:
+        invalidate_responses(post_tag(instance.local_post_id))
+
+
+@receiver(post_save, sender=Like)
+@receiver(post_delete, sender=Like)
+def like_changed(sender, instance, **kwargs):
+    """
+    Likes show up in the responses of their post, likes of comments through the comment.
+    """
+    post_id = instance.local_post_id
+    if post_id is None and instance.local_comment_id:
+        post_id = Comment.objects.filter(pk=instance.local_comment_id).values_list('local_post_id', flat=True).first()
+    if post_id:
+        invalidate_responses(post_tag(post_id))
+
+
+# changes that must end the sessions opened with earlier login tokens
+TOKEN_FIELDS = ('password', 'is_active', 'is_staff')
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, **kwargs):
+    if instance.pk is None or kwargs.get('raw'):
+        return
+    previous = User.objects.filter(pk=instance.pk).values(*TOKEN_FIELDS).first()
+    instance._revoke_tokens = previous is not None and any(previous[field] != getattr(instance, field) for field in TOKEN_FIELDS)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    """
+    Revoke the login tokens of a user whose password, active or staff flag changed:
+    the tokens carry those flags.
+    """
+    if getattr(instance, '_revoke_tokens', False):
+        instance._revoke_tokens = False
+        author_id = Author.objects.filter(user=instance).values_list('id', flat=True).first()
+        if author_id is not None:
+            revoke_tokens(author_id)
@@ -1,17 +1,52 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.urls import reverse
+from django.utils import timezone
+from django.core.cache import cache
 from rest_framework.test import APITestCase, APIClient
 from rest_framework import status
 from django.contrib.auth.models import User
 from author.models import Author
 from post.models import Post
+from like.models import Like
 from service import models
 from .serializers import SignUpSerializer
 from author.models import Author
+from service.utils import delivery, friends, outbox
+from service.utils.federation import FederationClient, client
+from service.utils.push import push
+from service.utils.pagination import CountingPaginator
+from service.utils.credentials import credentials
+from service.utils.profiles import profiles
+from service.utils.author_sync import upsert_remote_authors
+from service.utils import github
+from author.serializers import AuthorSerializer, CachedAuthorSerializer
+from service.authentication import BackendAuthentication, JwtQueryParamsAuthentication
+from service.utils import jwt_auth, response_cache
+from service.utils.jwt_auth import create_token
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIRequestFactory
+import base64
+from django.core.paginator import EmptyPage
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from unittest.mock import Mock, patch
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 # class for set up testcase
 class BaseAPITestCase(APITestCase):
     def setUp(self):
         super().setUp()
+        # cached follow graphs (service.utils.friends) outlive the rolled back rows
+        cache.clear()
+        profiles.clear()
+        friends.graphs.clear()
+        jwt_auth.versions.clear()
+        response_cache.clear()
+        # image posts are kept in files (IMAGE_STORE)
+        self.enterContext(override_settings(MEDIA_ROOT=self.enterContext(tempfile.TemporaryDirectory())))
         self.user1, self.author1 = self.create_test_user_and_author("http://127.0.0.1:8000/")
         self.user2, self.author2 = self.create_test_user_and_author("http://127.0.0.1:8000/")
         self.user3, self.author3 = self.create_test_user_and_author("http://127.0.0.1:8000/")
@@ -152,4 +187,432 @@ class FollowViewTest(BaseAPITestCase):
         follow = models.Follow.objects.all()
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
         self.assertEqual(len(follow), 1)
- 
\ No newline at end of file
+
+        # a redelivered request finds the existing row
+        response = self.client.post(reverse("inbox", args=[2]), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(models.Follow.objects.count(), 1)
+
+    # ://service/api/inbox/batch
+    def test_batch_inbox(self):
+        response = self.client.get(reverse("inbox_batch"))
+        self.assertEqual(response.data["type"], "inbox-batch")
+
+        data = {"type": "inbox-batch", "recipients": [2, 3, 999],
+                "object": {"type": "follow", "actor": {"type": "author", "id": self.author1.fqid}}}
+        response = self.client.post(reverse("inbox_batch"), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["results"], {"2": 201, "3": 201, "999": 404})
+        self.assertEqual(models.Follow.objects.filter(follower=self.author1, pending="yes").count(), 2)
+
+        # a like is only for the owner of the liked post
+        post = Post.objects.create(author=self.author2, title="Post", content_type="text/plain", content="c", visibility="public")
+        like = {"type": "like", "id": f"{self.author1.fqid}/liked/1", "object": post.fqid,
+                "author": {"type": "author", "id": self.author1.fqid}}
+        data = {"type": "inbox-batch", "recipients": [self.author3.serial, self.author2.serial], "object": like}
+        response = self.client.post(reverse("inbox_batch"), data, format="json")
+        self.assertEqual(response.data["results"], {str(self.author2.serial): 201, str(self.author3.serial): 400})
+        self.assertEqual(Like.objects.filter(object=post.fqid).count(), 1)
+ 
+
+class PushDeliveryTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.node = models.Node.objects.create(name="remote", url="http://remote.test/api/", username="node", password="node", is_allowed=True)
+        self.remote_author = Author.objects.create(display_name="remote", host=self.node.url, fqid=f"{self.node.url}authors/1")
+
+    def test_push_records_outbox_without_sending(self):
+        models.Follow.objects.create(follower=self.remote_author, followed=self.author1, pending="no")
+        models.Follow.objects.create(follower=self.author2, followed=self.author1, pending="no")
+        with patch.object(client, "post") as post:
+            entries = push(self.author1, None, {"type": "post", "id": "http://127.0.0.1:8000/api/authors/1/posts/1"})
+            post.assert_not_called()
+
+        # local followers read the same tables, only the remote one gets a delivery
+        self.assertEqual([entry.recipient for entry in entries], [self.remote_author.fqid])
+        self.assertEqual(entries[0].status, "pending")
+        self.assertEqual(entries[0].url, f"{self.remote_author.fqid}/inbox")
+
+    def test_push_batches_followers_on_the_same_node(self):
+        self.node.supports_batch_inbox = True
+        self.node.save()
+        other = Author.objects.create(display_name="remote2", host=self.node.url, fqid=f"{self.node.url}authors/2")
+        models.Follow.objects.create(follower=self.remote_author, followed=self.author1, pending="no")
+        models.Follow.objects.create(follower=other, followed=self.author1, pending="no")
+        data = {"type": "post", "id": "http://127.0.0.1:8000/api/authors/1/posts/1"}
+
+        entries = push(self.author1, None, data)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0].url, "http://remote.test/api/inbox/batch")
+        self.assertEqual(sorted(entries[0].payload["recipients"]), ["1", "2"])
+        self.assertEqual(entries[0].payload["object"], data)
+
+        # a node that dropped batch support gets one delivery per follower instead
+        with patch.object(client, "post", return_value=Mock(status_code=404, ok=False)):
+            outbox.deliver(entries[0].id)
+        self.node.refresh_from_db()
+        self.assertFalse(self.node.supports_batch_inbox)
+        self.assertEqual(sorted(models.Outbox.objects.values_list("url", flat=True)),
+                         [f"{self.remote_author.fqid}/inbox", f"{other.fqid}/inbox"])
+
+    def test_delivery_status_per_recipient(self):
+        self.node.supports_batch_inbox = True
+        self.node.save()
+        other = Author.objects.create(display_name="remote2", host=self.node.url, fqid=f"{self.node.url}authors/2")
+        models.Follow.objects.create(follower=self.remote_author, followed=self.author1, pending="no")
+        models.Follow.objects.create(follower=other, followed=self.author1, pending="no")
+        post = Post.objects.create(author=self.author1, title="Post", content_type="text/plain", content="c", visibility="public")
+        entries = push(self.author1, None, {"type": "post", "id": post.fqid})
+
+        answer = Mock(status_code=200, ok=True)
+        answer.json.return_value = {"type": "inbox-batch", "results": {"1": 201, "2": 404}}
+        with patch.object(client, "post", return_value=answer):
+            outbox.deliver(entries[0].id)
+        response = self.client.get(reverse("outbox_status", args=[self.author1.serial]), {"object": post.fqid})
+        self.assertEqual({delivery["recipient"]: (delivery["status"], delivery["status_code"]) for delivery in response.data["src"]},
+                         {self.remote_author.fqid: ("delivered", 201), other.fqid: ("delivered", 404)})
+
+        response = self.client.get(reverse("outbox_status", args=[self.author2.serial]), {"object": post.fqid})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_post_content_is_read_when_sending(self):
+        other = Author.objects.create(display_name="remote2", host=self.node.url, fqid=f"{self.node.url}authors/2")
+        models.Follow.objects.create(follower=self.remote_author, followed=self.author1, pending="no")
+        models.Follow.objects.create(follower=other, followed=self.author1, pending="no")
+        image = base64.b64encode(b"\x89PNG image bytes").decode("utf-8")
+        post = Post.objects.create(author=self.author1, title="Image", content_type="image/png;base64",
+                                   content=image, visibility="public")
+
+        # one row per follower, none of them carries the image
+        entries = push(self.author1, None, {"type": "post", "id": post.fqid, "content": image})
+        self.assertEqual(len(entries), 2)
+        self.assertTrue(all("content" not in entry.payload and entry.post_id == post.id for entry in entries))
+
+        with patch.object(client, "post", return_value=Mock(status_code=200, ok=True)) as send:
+            outbox.deliver(entries[0].id)
+        self.assertEqual(send.call_args.kwargs["json"], {"type": "post", "id": post.fqid, "content": image})
+
+    def test_failed_delivery_backs_off_then_dead_letters(self):
+        entry = models.Outbox.objects.create(node=self.node, url=f"{self.remote_author.fqid}/inbox",
+                                             recipient=self.remote_author.fqid, payload={"type": "post"})
+        # full jitter may pick any delay up to the cap; take the longest
+        with patch.object(client, "post", return_value=Mock(status_code=503, ok=False)), \
+             patch.object(outbox.random, "uniform", side_effect=lambda low, high: high):
+            outbox.deliver(entry.id)
+            entry.refresh_from_db()
+            self.assertEqual((entry.status, entry.attempts, entry.last_status_code), ("pending", 1, 503))
+            self.assertGreater(entry.next_attempt_at, timezone.now())
+            # not due yet
+            self.assertIsNone(outbox.deliver(entry.id))
+
+            models.Outbox.objects.filter(pk=entry.pk).update(attempts=outbox.MAX_ATTEMPTS - 1, next_attempt_at=timezone.now())
+            outbox.deliver(entry.id)
+            entry.refresh_from_db()
+            self.assertEqual(entry.status, "dead")
+
+        stats = models.Outbox.objects.stats()
+        self.assertEqual((stats[0]["url"], stats[0]["dead"], stats[0]["pending"]), (self.node.url, 1, 0))
+        self.assertTrue(all(0 <= outbox.backoff(attempts) <= outbox.BACKOFF_MAX for attempts in range(1, 30)))
+
+    def test_pool_limits_tasks_per_node(self):
+        pool = delivery.DeliveryPool(max_workers=4, max_per_node=1)
+        in_flight = []
+        peak = []
+        done = []
+        lock = threading.Lock()
+
+        def task(i):
+            with lock:
+                in_flight.append(i)
+                peak.append(len(in_flight))
+            time.sleep(0.05)
+            with lock:
+                in_flight.remove(i)
+                done.append(i)
+
+        for i in range(3):
+            pool.submit("http://remote.test/", task, i)
+        deadline = time.time() + 5
+        while len(done) < 3 and time.time() < deadline:
+            time.sleep(0.01)
+
+        self.assertEqual(max(peak), 1)
+        self.assertEqual(sorted(done), [0, 1, 2])
+
+
+class FederationClientTest(TestCase):
+
+    def test_connections_are_reused_per_host(self):
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                body = self.headers.get("Authorization", "").encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        url = f"http://127.0.0.1:{server.server_port}/api/"
+        node = models.Node.objects.create(name="stub", url=url, username="node", password="secret", is_allowed=True)
+        federation = FederationClient(connect_timeout=1, read_timeout=1, retries=0, pool_size=1)
+        responses = [federation.get(f"{url}authors/", node=node) for _ in range(3)]
+
+        self.assertTrue(all(response.text.startswith("Basic ") for response in responses))
+        self.assertEqual(federation.stats(), [{"host": url, "requests": 3, "connections": 1, "reused": 2}])
+
+
+class FriendGraphTest(BaseAPITestCase):
+
+    def test_friend_graph_is_cached_and_follows_invalidate_it(self):
+        models.Follow.objects.create(follower=self.author1, followed=self.author2, pending="no")
+        follow = models.Follow.objects.create(follower=self.author2, followed=self.author1, pending="yes")
+        models.Follow.objects.create(follower=self.author3, followed=self.author1, pending="no")
+
+        self.assertFalse(friends.are_friends(self.author1, self.author2))
+        follow.accept()
+        self.assertTrue(friends.are_friends(self.author1, self.author2))
+        self.assertTrue(self.author2.is_friend_with(self.author1))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(friends.followers_of(self.author1), {self.author2.id, self.author3.id})
+            self.assertEqual(friends.friends_among(self.author1, [self.author2, self.author3]), {self.author2.id})
+
+        follow.delete()
+        self.assertFalse(friends.are_friends(self.author1, self.author2))
+        self.assertEqual(friends.friends_of(self.author1), set())
+
+    def test_friend_graph_lookups_under_the_configured_cache(self):
+        models.Follow.objects.create(follower=self.author1, followed=self.author2, pending="no")
+        models.Follow.objects.create(follower=self.author2, followed=self.author1, pending="no")
+        self.assertTrue(friends.are_friends(self.author1, self.author2))
+
+        # repeat lookups are answered by the process, not by the database cache
+        with self.assertNumQueries(0):
+            self.assertTrue(friends.are_friends(self.author1, self.author2))
+            self.assertEqual(friends.friends_among(self.author1, [self.author2, self.author3]), {self.author2.id})
+        # once the process copy expires, one read of the shared cache
+        friends.graphs.clear()
+        with self.assertNumQueries(1):
+            self.assertTrue(friends.are_friends(self.author1, self.author2))
+
+    def test_graph_read_before_a_follow_change_is_not_served(self):
+        set_graph = friends.graphs.set
+
+        def set_after_a_follow(key, value, timeout):
+            # the follow is saved (and invalidates) between the query and the write
+            if key == friends._key(self.author1.id):
+                models.Follow.objects.create(follower=self.author2, followed=self.author1, pending="no")
+            set_graph(key, value, timeout)
+
+        with patch.object(friends.graphs, "set", side_effect=set_after_a_follow):
+            self.assertEqual(friends.followers_of(self.author1), set())
+        self.assertEqual(friends.followers_of(self.author1), {self.author2.id})
+
+
+class PaginationCountTest(BaseAPITestCase):
+
+    def test_cached_counts_and_pages_without_count(self):
+        post = Post.objects.create(author=self.author2, title="Post", content_type="text/markdown", content="content", visibility="public")
+        for i in range(3):
+            self.client.post(reverse('author_comment_list', args=[self.author1.serial]),
+                             {"type": "comment", "comment": f"comment {i}", "contentType": "text/markdown", "post": post.fqid}, format="json")
+
+        response = self.client.get(reverse('author_comment_list', args=[self.author1.serial]), {"size": 2})
+        self.assertEqual((len(response.data["src"]), response.data["count"]), (2, 3))
+        # the total is reused for a while, then counted again
+        self.author1.comments.first().delete()
+        response = self.client.get(reverse('author_comment_list', args=[self.author1.serial]), {"size": 2})
+        self.assertEqual(response.data["count"], 3)
+        cache.clear()
+        response = self.client.get(reverse('author_comment_list', args=[self.author1.serial]), {"size": 2})
+        self.assertEqual(response.data["count"], 2)
+
+        # lists that report a counter never count
+        post.refresh_from_db()
+        with patch("service.utils.pagination.count_rows") as count_rows:
+            response = self.client.get(reverse('comment_list', args=[self.author2.serial, post.serial]), {"size": 2, "page": 1})
+            self.assertEqual(response.data["count"], post.comment_count)
+            count_rows.assert_not_called()
+
+        # outside 'exact' mode a page is a single SELECT
+        paginator = CountingPaginator(Post.objects.order_by('id'), 1, count_mode='cached')
+        with self.assertNumQueries(1):
+            self.assertEqual(list(paginator.page(1)), [post])
+        with self.assertRaises(EmptyPage):
+            paginator.page(2)
+
+
+class JwtAuthenticationTest(BaseAPITestCase):
+
+    def authenticate(self, token):
+        return JwtQueryParamsAuthentication().authenticate(APIRequestFactory().get("/api/authors/", HTTP_AUTHORIZATION=f"Bearer {token}"))
+
+    def test_login_token_needs_no_user_query(self):
+        self.authenticate(self.token)
+        with self.assertNumQueries(0):
+            user, _ = self.authenticate(self.token)
+            self.assertTrue(user.is_authenticated)
+            self.assertEqual((user.pk, user.username, user.is_staff), (self.user1.pk, "testuser0", False))
+            self.assertEqual(user.author.pk, self.author1.pk)
+            self.assertEqual(user.author, self.author1)
+        # anything else loads the rows
+        self.assertEqual(user.author.display_name, "test user")
+
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(reverse('author-detail', args=[self.author1.serial])).status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if 'auth_user"."password' in query['sql']])
+
+    def test_authenticated_requests_under_the_configured_cache(self):
+        Post.objects.create(author=self.author1, title="Mine", content_type="text/markdown", content="mine", visibility="friends")
+        self.client.get(reverse("get_all_visible_post"))
+        with self.assertNumQueries(0):
+            self.authenticate(self.token)
+        # neither the database cache nor the user and author rows are read, filtering
+        # by `request.user.author` only needs its id
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("get_all_visible_post"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse([query for query in queries if "django_cache" in query["sql"]
+                          or "auth_user" in query["sql"] or "LIMIT 21" in query["sql"]])
+
+    def test_password_change_revokes_tokens(self):
+        self.user1.set_password("changed")
+        self.user1.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.token)
+        # tokens without the author claims still load the user
+        user, _ = self.authenticate(create_token({'id': self.user1.id, 'username': "testuser0"}))
+        self.assertEqual(user, self.user1)
+
+
+class ProfileCacheTest(BaseAPITestCase):
+
+    def test_profiles_are_rendered_once_until_changed(self):
+        with patch.object(AuthorSerializer, "to_representation", autospec=True, side_effect=AuthorSerializer.to_representation) as render:
+            first = CachedAuthorSerializer(self.author2).data
+            # another process: only the shared cache is left
+            profiles.clear()
+            self.assertEqual(CachedAuthorSerializer(Author.objects.get(pk=self.author2.pk)).data, first)
+            self.assertEqual(render.call_count, 1)
+
+            self.author2.display_name = "renamed"
+            self.author2.save()
+            self.assertEqual(CachedAuthorSerializer(self.author2).data["displayName"], "renamed")
+            self.assertEqual(render.call_count, 2)
+
+    def test_remote_refresh_invalidates_profile(self):
+        payload = {"type": "author", "id": "http://remote.example/api/authors/1", "host": "http://remote.example/api/",
+                   "displayName": "remote", "github": "", "profileImage": ""}
+        upsert_remote_authors([payload])
+        self.assertEqual(CachedAuthorSerializer(Author.objects.get(fqid=payload["id"])).data["displayName"], "remote")
+        upsert_remote_authors([{**payload, "displayName": "refreshed"}])
+        self.assertEqual(CachedAuthorSerializer(Author.objects.get(fqid=payload["id"])).data["displayName"], "refreshed")
+
+
+class GithubPollTest(BaseAPITestCase):
+
+    def setUp(self):
+        super().setUp()
+        requests_seen = self.requests_seen = []
+        limited = self.limited = threading.Event()
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                requests_seen.append((self.path, self.headers.get("If-None-Match")))
+                if limited.is_set():
+                    self.send_response(403)
+                    self.send_header("X-RateLimit-Remaining", "0")
+                    self.send_header("X-RateLimit-Reset", str(int(time.time()) + 3600))
+                    body = b""
+                elif self.headers.get("If-None-Match") == '"v1"':
+                    self.send_response(304)
+                    body = b""
+                else:
+                    self.send_response(200)
+                    self.send_header("ETag", '"v1"')
+                    body = (b'[{"id": "1", "type": "PushEvent", "repo": {"name": "me/repo"}, "payload": {}},'
+                            b' {"id": "2", "type": "WatchEvent", "repo": {"name": "me/repo"}, "payload": {}}]')
+                self.send_header("X-Poll-Interval", "120")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        patcher = patch.object(github, "API_URL", f"http://127.0.0.1:{server.server_port}")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        Author.objects.filter(pk__in=[self.author2.pk, self.author3.pk]).update(github_url=None)
+        Author.objects.filter(pk=self.author1.pk).update(github_url="https://github.com/me")
+
+    def make_due(self):
+        models.GithubPoll.objects.update(next_poll_at=timezone.now())
+
+    def test_unchanged_feeds_are_not_modified_responses(self):
+        self.assertEqual(github.poll_github_activity(), 1)
+        self.assertTrue(Post.objects.filter(author=self.author1, github_event_id="1").exists())
+        poll = models.GithubPoll.objects.get(author=self.author1)
+        self.assertEqual((poll.etag, poll.poll_interval), ('"v1"', 120))
+
+        # not due before X-Poll-Interval has passed
+        self.assertEqual(github.poll_github_activity(), 0)
+        self.assertEqual(len(self.requests_seen), 1)
+
+        self.make_due()
+        self.assertEqual(github.poll_github_activity(), 0)
+        self.assertEqual(self.requests_seen[-1], ("/users/me/events/public", '"v1"'))
+        self.assertEqual(models.GithubPoll.objects.get(author=self.author1).last_status_code, 304)
+
+    def test_rate_limit_pauses_polling(self):
+        self.limited.set()
+        github.poll_github_activity()
+        self.assertGreater(models.GithubPoll.objects.get(author=self.author1).next_poll_at, timezone.now() + timedelta(minutes=30))
+        # no request at all until the limit resets
+        self.make_due()
+        github.poll_github_activity()
+        self.assertEqual(len(self.requests_seen), 1)
+
+
+class BackendAuthenticationTest(BaseAPITestCase):
+
+    def authenticate(self, username, password):
+        header = "Basic " + base64.b64encode(f"{username}:{password}".encode()).decode()
+        return BackendAuthentication().authenticate(APIRequestFactory().get("/api/inbox", HTTP_AUTHORIZATION=header))
+
+    def test_verified_credentials_skip_the_hasher(self):
+        credentials.clear()
+        with patch.object(User, "check_password", autospec=True, side_effect=User.check_password) as check_password:
+            self.assertEqual(self.authenticate("testuser1", "password")[0], self.user2)
+            self.assertEqual(self.authenticate("testuser1", "password")[0], self.user2)
+            self.assertEqual(check_password.call_count, 1)
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate("testuser1", "wrong")
+
+            # a new password or a deactivated user invalidates the cached credential
+            self.user2.set_password("changed")
+            self.user2.save()
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate("testuser1", "password")
+            self.authenticate("testuser1", "changed")
+            self.user2.is_active = False
+            self.user2.save()
+            with self.assertRaises(AuthenticationFailed):
+                self.authenticate("testuser1", "changed")
@@ -27,9 +27,12 @@ urlpatterns = [
     path('authors/<int:AUTHOR_SERIAL>/followers', views.get_followers, name='get_followers'),
     path('authors/<int:AUTHOR_SERIAL>/followers/<path:FOREIGN_AUTHOR_FQID>', views.foreign_followers, name='foreign_followers'),
     path('authors/<int:AUTHOR_SERIAL>/inbox', views.inbox, name='inbox'),
+    path('inbox/batch', views.inbox_batch, name='inbox_batch'),
     path('forward/', views.forward_follow_request, name="forward_follow_request"),
     path('follows/', views.get_follow_requests, name="get_follow_requests"),
-    path('follows/<int:FOLLOW_ID>', views.handle_follow_request, name="handle_follow_request")
+    path('follows/<int:FOLLOW_ID>', views.handle_follow_request, name="handle_follow_request"),
+    path('outbox/stats', views.outbox_stats, name="outbox_stats"),
+    path('authors/<int:AUTHOR_SERIAL>/outbox', views.outbox_status, name="outbox_status"),
 ]
 
 urlpatterns += router.urls
\ No newline at end of file
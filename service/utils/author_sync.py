@@ -0,0 +1,157 @@
+import logging
+import requests
+from datetime import timedelta
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.exceptions import ValidationError
+from author.models import Author
+from author.serializers import RemoteAuthorSerializer
+from service.models import Node
+from service.utils.federation import client
+from service.utils.profiles import profiles
+from service.utils import response_cache
+from service.utils.response_cache import author_tag
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = getattr(settings, 'AUTHOR_SYNC_PAGE_SIZE', 100)
+MAX_PAGES = getattr(settings, 'AUTHOR_SYNC_MAX_PAGES', 100)
+# re-read a little before the watermark to absorb clock skew between nodes
+OVERLAP = timedelta(minutes=5)
+
+
+def fetch_node_authors(node, since=None, first_page=1):
+    """
+    Reads the author payloads of `node` page by page, at most MAX_PAGES pages starting
+    at `first_page`. `since` is sent as `updated_since`; nodes that ignore it return
+    every author.
+
+    Returns:
+    - `(payloads, next page)`; the next page is None once the last page was read.
+    """
+    params = {"size": PAGE_SIZE}
+    if since is not None:
+        params["updated_since"] = (since - OVERLAP).isoformat()
+
+    payloads = []
+    for page in range(first_page, first_page + MAX_PAGES):
+        response = client.get(f"{node.url}authors/", node=node, params={**params, "page": page})
+        if response.status_code == 404 and page > 1:
+            # ran past the last page
+            return payloads, None
+        response.raise_for_status()
+        authors = response.json().get("authors", [])
+        payloads.extend(authors)
+        if len(authors) < PAGE_SIZE:
+            return payloads, None
+    return payloads, first_page + MAX_PAGES
+
+
+UPSERT_FIELDS = ['display_name', 'host', 'updated_at']
+# only overwritten when the payload has them (`github`, `profileImage`)
+OPTIONAL_FIELDS = ['github_url', 'profile_image']
+BATCH_SIZE = 500
+
+
+def validate_remote_authors(payloads):
+    """
+    Validates remote author payloads without touching the database.
+
+    Returns:
+    - dict of fqid -> validated data (the last payload wins for repeated fqids).
+    - dict of fqid -> validation errors.
+    """
+    valid, errors = {}, {}
+    for payload in payloads:
+        serializer = RemoteAuthorSerializer(data=payload)
+        if serializer.is_valid():
+            valid[serializer.validated_data['fqid']] = serializer.validated_data
+        else:
+            errors[str(payload.get("id")) if isinstance(payload, dict) else None] = serializer.errors
+    return valid, errors
+
+
+def upsert_remote_authors(payloads):
+    """
+    Validates remote author payloads and stores them with `store_remote_authors`.
+    Payloads that fail validation are skipped.
+
+    Returns:
+    - dict of fqid -> local Author id for every stored payload.
+    """
+    valid, errors = validate_remote_authors(payloads)
+    for fqid, error in errors.items():
+        logger.warning(f"Author validation failed {fqid}: {error}")
+    return store_remote_authors(valid)
+
+
+def store_remote_authors(valid):
+    """
+    Creates or refreshes the local copies of remote authors in bulk from validated data
+    (see `validate_remote_authors`): one query for local authors, one
+    INSERT ... ON CONFLICT (fqid) DO UPDATE per BATCH_SIZE authors sending the same
+    fields and one query for the ids. Fields missing from a payload keep their stored
+    value. Payloads that claim the fqid of a local author are skipped.
+
+    Returns:
+    - dict of fqid -> local Author id for every stored payload.
+    """
+    if not valid:
+        return {}
+
+    local = set(Author.objects.filter(fqid__in=valid, user__isnull=False).values_list('fqid', flat=True))
+    now = timezone.now()
+    groups = {}
+    for fqid, data in valid.items():
+        if fqid not in local:
+            present = tuple(field for field in OPTIONAL_FIELDS if field in data)
+            groups.setdefault(present, []).append(Author(updated_at=now, **data))
+    for present, group in groups.items():
+        Author.objects.bulk_create(group, batch_size=BATCH_SIZE, update_conflicts=True,
+                                   unique_fields=['fqid'], update_fields=UPSERT_FIELDS + list(present))
+    fqids = [author.fqid for group in groups.values() for author in group]
+    # bulk_create sends no signals
+    profiles.invalidate(*fqids)
+    response_cache.invalidate(*(author_tag(fqid) for fqid in fqids))
+    return dict(Author.objects.filter(fqid__in=fqids).values_list('fqid', 'id'))
+
+
+def sync_node_authors(node):
+    """
+    Pulls the authors added or changed on `node` since its last sync and advances the
+    node's watermark. The watermark is left untouched when the node cannot be reached,
+    so the next run retries the same window. A sync that stops at MAX_PAGES also keeps
+    the watermark and records the next page: the next run continues from there.
+
+    Returns:
+    - number of author copies stored, or None if the sync failed.
+    """
+    if node.authors_sync_page is None:
+        started, first_page = timezone.now(), 1
+    else:
+        # finish the window of the previous, truncated run
+        started, first_page = node.authors_sync_started_at, node.authors_sync_page
+    try:
+        payloads, next_page = fetch_node_authors(node, node.authors_synced_at, first_page)
+        synced = len(upsert_remote_authors(payloads))
+    except (requests.RequestException, ValueError, ValidationError) as e:
+        logger.warning(f"Error syncing authors from {node.url}: {e}")
+        return None
+
+    if next_page is None:
+        fields = {'authors_synced_at': started, 'authors_sync_page': None, 'authors_sync_started_at': None}
+    else:
+        logger.warning(f"Author sync of {node.url} stopped at page {next_page - 1}, the next run continues")
+        fields = {'authors_sync_page': next_page, 'authors_sync_started_at': started}
+    Node.objects.filter(pk=node.pk).update(**fields)
+    for name, value in fields.items():
+        setattr(node, name, value)
+    return synced
+
+
+def sync_remote_authors():
+    """
+    Syncs the authors of every allowed node. Meant to run periodically from `runapscheduler`.
+    Returns a dict of node url -> number of author copies stored (None on failure).
+    """
+    return {node.url: sync_node_authors(node) for node in Node.objects.filter(is_allowed=True)}
@@ -0,0 +1,33 @@
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+
+def _count_of(model, field):
+    """
+    Subquery counting the `model` rows whose foreign key `field` points at the outer row.
+    """
+    rows = (model.objects.filter(**{field: OuterRef('pk')}).order_by()
+            .values(field).annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+def reconcile_counts(post_model, comment_model, like_model):
+    """
+    Recomputes the like/comment counters of posts and comments from the rows that
+    reference them and rewrites the ones that drifted.
+
+    Returns:
+    - dict of counter -> number of rows repaired.
+    """
+    counters = [
+        (post_model, 'like_count', _count_of(like_model, 'local_post')),
+        (post_model, 'comment_count', _count_of(comment_model, 'local_post')),
+        (comment_model, 'like_count', _count_of(like_model, 'local_comment')),
+    ]
+    repaired = {}
+    for model, field, actual in counters:
+        drifted = model.objects.annotate(actual=actual).filter(~Q(**{field: F('actual')}))
+        ids = list(drifted.values_list('pk', flat=True))
+        model.objects.filter(pk__in=ids).update(**{field: actual})
+        repaired[f"{model._meta.model_name}.{field}"] = len(ids)
+    return repaired
@@ -0,0 +1,57 @@
+import hashlib
+import hmac
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+
+
+class CredentialCache:
+    """
+    Bounded LRU cache of verified Basic auth credentials, so repeat requests from a node
+    skip the password hasher (PBKDF2 costs hundreds of milliseconds per check).
+
+    Entries are keyed by an HMAC of `username:password`, the password itself is never
+    kept. An entry only counts while the user's password hash is the one it was verified
+    against and for `ttl` seconds, so changing the password invalidates it right away.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # digest -> (password hash, expiry)
+
+    def digest(self, username, password):
+        message = f"{username}:{password}".encode('utf-8')
+        return hmac.new(settings.SECRET_KEY.encode('utf-8'), message, hashlib.sha256).hexdigest()
+
+    def verify(self, user, password):
+        """
+        Whether `password` is the password of `user`, checked with the hasher on a miss.
+        """
+        key = self.digest(user.username, password)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == user.password and entry[1] > now:
+                self._entries.move_to_end(key)
+                return True
+        if not user.check_password(password):
+            return False
+        with self._lock:
+            # check_password may have upgraded the hash, store the current one
+            self._entries[key] = (user.password, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+credentials = CredentialCache(
+    max_size=getattr(settings, 'BACKEND_AUTH_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'BACKEND_AUTH_CACHE_TTL', 300),
+)
@@ -0,0 +1,74 @@
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryPool:
+    """
+    Runs delivery tasks on a bounded thread pool, allowing at most `max_per_node`
+    concurrent tasks for the same node; extra tasks wait in a per-node queue so a
+    slow node never occupies every worker.
+    """
+    def __init__(self, max_workers, max_per_node):
+        self.max_workers = max_workers
+        self.max_per_node = max_per_node
+        self._executor = None
+        self._lock = threading.Lock()
+        self._active = {}      # node_key -> number of tasks in flight
+        self._waiting = {}     # node_key -> deque of tasks
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='inbox-delivery')
+        return self._executor
+
+    def submit(self, node_key, fn, *args):
+        task = (fn, args)
+        with self._lock:
+            if self._active.get(node_key, 0) >= self.max_per_node:
+                self._waiting.setdefault(node_key, deque()).append(task)
+                return
+            self._active[node_key] = self._active.get(node_key, 0) + 1
+        self.executor.submit(self._run, node_key, task)
+
+    def queued(self, node_key=None):
+        """
+        Number of tasks waiting for a free slot, for one node or all of them.
+        """
+        with self._lock:
+            if node_key is not None:
+                return len(self._waiting.get(node_key, ()))
+            return sum(len(waiting) for waiting in self._waiting.values())
+
+    def _run(self, node_key, task):
+        fn, args = task
+        try:
+            fn(*args)
+        except Exception:
+            logger.exception(f"Delivery task for {node_key} failed")
+        finally:
+            # worker threads hold their own database connection
+            close_old_connections()
+            self._next(node_key)
+
+    def _next(self, node_key):
+        with self._lock:
+            waiting = self._waiting.get(node_key)
+            if waiting:
+                task = waiting.popleft()
+            else:
+                self._active[node_key] -= 1
+                return
+        self.executor.submit(self._run, node_key, task)
+
+
+pool = DeliveryPool(
+    max_workers=getattr(settings, 'DELIVERY_MAX_WORKERS', 8),
+    max_per_node=getattr(settings, 'DELIVERY_MAX_PER_NODE', 2),
+)
@@ -0,0 +1,97 @@
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from django.conf import settings
+from service.utils.jwt_auth import create_hearders
+
+
+class FederationClient:
+    """
+    Shared HTTP client for node-to-node traffic.
+
+    Every remote host gets its own `requests.Session` so TCP/TLS connections are kept
+    alive and reused between calls. All requests get connect/read timeouts; idempotent
+    requests (GET, HEAD, PUT, DELETE, ...) are retried on connection errors and 502/503/504,
+    POSTs are only retried when the connection could not be opened.
+
+    Usage:
+    - `client.get(url, node=node)`: authenticated request to an allowed node.
+    - `client.get(url)`: plain request (e.g. GitHub), pooled by host.
+    """
+    def __init__(self, connect_timeout, read_timeout, retries, pool_size):
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._sessions = {}    # host key -> Session
+        self._headers = {}     # node pk -> (credentials, headers)
+
+    def session(self, key):
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                retry = Retry(total=self.retries, connect=self.retries, read=self.retries, status=self.retries,
+                              backoff_factor=0.5, status_forcelist=(502, 503, 504), raise_on_status=False)
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+                session = requests.Session()
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._sessions[key] = session
+            return session
+
+    def headers(self, node):
+        """
+        Authorization headers of `node`, rebuilt only when its credentials change.
+        """
+        credentials = (node.username, node.password)
+        with self._lock:
+            cached = self._headers.get(node.pk)
+            if cached is None or cached[0] != credentials:
+                cached = (credentials, create_hearders(node))
+                self._headers[node.pk] = cached
+        return dict(cached[1])
+
+    def request(self, method, url, node=None, headers=None, **kwargs):
+        if node is not None:
+            key = node.url
+            headers = {**self.headers(node), **(headers or {})}
+        else:
+            parts = urlsplit(url)
+            key = f"{parts.scheme}://{parts.netloc}"
+        kwargs.setdefault('timeout', self.timeout)
+        return self.session(key).request(method, url, headers=headers, **kwargs)
+
+    def get(self, url, node=None, **kwargs):
+        return self.request('GET', url, node=node, **kwargs)
+
+    def post(self, url, node=None, **kwargs):
+        return self.request('POST', url, node=node, **kwargs)
+
+    def stats(self):
+        """
+        Connection reuse per remote host: `requests` sent and `connections` opened since
+        the process started (`reused` = requests that did not need a new connection).
+        """
+        with self._lock:
+            sessions = dict(self._sessions)
+        stats = []
+        for key, session in sessions.items():
+            sent = opened = 0
+            for adapter in set(session.adapters.values()):
+                for pool_key in adapter.poolmanager.pools.keys():
+                    pool = adapter.poolmanager.pools.get(pool_key)
+                    if pool is not None:
+                        sent += pool.num_requests
+                        opened += pool.num_connections
+            stats.append({"host": key, "requests": sent, "connections": opened, "reused": max(sent - opened, 0)})
+        return stats
+
+
+client = FederationClient(
+    connect_timeout=getattr(settings, 'FEDERATION_CONNECT_TIMEOUT', 5),
+    read_timeout=getattr(settings, 'FEDERATION_READ_TIMEOUT', 10),
+    retries=getattr(settings, 'FEDERATION_RETRIES', 2),
+    pool_size=getattr(settings, 'FEDERATION_POOL_SIZE', 4),
+)
@@ -0,0 +1,137 @@
+from django.db import transaction
+from django.db.models import Q
+from author.models import Author
+from post.models import Post, FeedEntry
+from service.utils import friends
+from service.utils.delivery import pool
+
+# visibilities that are written into streams; public posts are read from the public
+# timeline instead (see `stream`)
+FEED_VISIBILITIES = ['unlisted', 'friends']
+BATCH_SIZE = 500
+POOL_KEY = 'feed'
+
+
+def local_readers():
+    """
+    Authors that have a stream on this node (remote author copies have no user).
+    """
+    return Author.objects.filter(user__isnull=False, is_deleted=False)
+
+
+def stream(reader, prepare=None):
+    """
+    Returns the posts in `reader`'s stream, newest first: the public timeline (an
+    indexed range on (visibility, updated_at, id)) merged with the reader's FeedEntry
+    rows, which hold the non-public posts they can see. `prepare` is applied to both
+    halves before they are merged (select_related, defer, annotate).
+    """
+    public = Post.objects.filter(visibility='public', is_deleted=False)
+    private = Post.objects.filter(feed_entries__owner=reader, visibility__in=FEED_VISIBILITIES, is_deleted=False)
+    if prepare is not None:
+        public, private = prepare(public), prepare(private)
+    return public.union(private, all=True).order_by('-updated_at', '-id')
+
+
+def readers_of(post):
+    """
+    Returns the local authors whose FeedEntry rows must hold `post`.
+    - unlisted: the post author and their followers
+    - friends: the post author and their friends
+    - public: nobody, public posts are part of every stream
+    """
+    if post.is_deleted or post.visibility not in FEED_VISIBILITIES:
+        return Author.objects.none()
+
+    readers = local_readers()
+    if post.visibility == 'friends':
+        return readers.filter(Q(id=post.author_id) | Q(id__in=friends.friends_of(post.author_id)))
+
+    return readers.filter(Q(id=post.author_id) | Q(id__in=friends.followers_of(post.author_id)))
+
+
+def visible_posts_for(reader, author):
+    """
+    Returns the non-public posts of `author` that belong in `reader`'s stream.
+    """
+    posts = Post.objects.filter(author=author, is_deleted=False, visibility__in=FEED_VISIBILITIES)
+    if reader.id == author.id:
+        return posts
+
+    visibilities = []
+    if author.id in friends.following_of(reader):
+        visibilities.append('unlisted')
+        if friends.are_friends(reader, author):
+            visibilities.append('friends')
+    return posts.filter(visibility__in=visibilities)
+
+
+def _add_entries(owner_ids, posts):
+    entries = [FeedEntry(owner_id=owner_id, post_id=post.id, updated_at=post.updated_at)
+               for owner_id in owner_ids for post in posts]
+    FeedEntry.objects.bulk_create(entries, batch_size=BATCH_SIZE, update_conflicts=True,
+                                  unique_fields=['owner', 'post'], update_fields=['updated_at'])
+
+
+def fan_out_post(post_id):
+    """
+    Writes a post into the streams of the local authors that can see it and removes it
+    from the streams of everyone else (visibility change, soft delete).
+    """
+    post = Post.objects.filter(pk=post_id).only('id', 'author_id', 'visibility', 'is_deleted', 'updated_at').first()
+    if post is None:
+        return
+    reader_ids = list(readers_of(post).values_list('id', flat=True))
+    FeedEntry.objects.filter(post=post).exclude(owner__in=reader_ids).delete()
+    _add_entries(reader_ids, [post])
+
+
+def refresh_feed_between(reader_id, author_id):
+    """
+    Re-syncs the posts of `author` inside `reader`'s stream.
+    Called when a follow between the two is created, accepted or removed.
+    """
+    reader = local_readers().filter(pk=reader_id).first()
+    if reader is None:
+        return
+    posts = list(visible_posts_for(reader, Author(pk=author_id)).only('id', 'updated_at'))
+    FeedEntry.objects.filter(owner=reader, post__author_id=author_id).exclude(post__in=[post.id for post in posts]).delete()
+    _add_entries([reader.id], posts)
+
+
+def schedule(fn, *args):
+    """
+    Runs a stream update on the delivery pool once the current transaction commits, so
+    the request that saved the post or follow does not pay for the fan-out.
+    """
+    transaction.on_commit(lambda: pool.submit(POOL_KEY, fn, *args))
+
+
+def rebuild_feed(reader):
+    """
+    Rebuilds `reader`'s whole stream from scratch. Used by the `rebuild_feed`
+    management command.
+    """
+    FeedEntry.objects.filter(owner=reader).delete()
+    if reader.user_id is None or reader.is_deleted:
+        return 0
+
+    following = friends.following_of(reader)
+    friends_ids = friends.friends_of(reader)
+
+    posts = Post.objects.filter(is_deleted=False, visibility__in=FEED_VISIBILITIES).filter(
+        Q(author=reader)
+        | Q(author__in=following, visibility='unlisted')
+        | Q(author__in=friends_ids, visibility='friends')
+    ).only('id', 'updated_at')
+
+    count = 0
+    batch = []
+    for post in posts.iterator(chunk_size=BATCH_SIZE):
+        batch.append(post)
+        if len(batch) == BATCH_SIZE:
+            _add_entries([reader.id], batch)
+            count += len(batch)
+            batch = []
+    _add_entries([reader.id], batch)
+    return count + len(batch)
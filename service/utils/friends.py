@@ -0,0 +1,98 @@
+import uuid
+from django.conf import settings
+from django.db.models import Q
+from service.models import Follow
+from service.utils.local_cache import LocalCache
+
+# seconds an author's follow graph stays cached; Follow signals invalidate it earlier
+TIMEOUT = getattr(settings, 'FRIENDS_CACHE_TIMEOUT', 600)
+# follow graphs are also kept in the process for LOCAL_TTL seconds: repeat lookups cost
+# no query, and another process's follow changes are seen after at most that long
+graphs = LocalCache(
+    max_size=getattr(settings, 'FRIENDS_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'FRIENDS_CACHE_LOCAL_TTL', 5),
+)
+
+
+def _id(author):
+    return getattr(author, 'pk', author)
+
+
+def _key(author_id):
+    return f"friends:{author_id}"
+
+
+def _generation_key(author_id):
+    return f"friends-generation:{author_id}"
+
+
+def adjacency(author):
+    """
+    Returns `(followers, following)`, the ids of the authors with an accepted follow
+    to and from `author`. Cached per author, in the process and in CACHES; one query on
+    a miss.
+    A graph is stored with the generation of the author read before the query and only
+    used while that is still the author's generation, so a graph read before a follow
+    change and written after its `invalidate` is never served.
+    """
+    author_id = _id(author)
+    found = graphs.get_many([_key(author_id), _generation_key(author_id)])
+    generation = found.get(_generation_key(author_id))
+    cached = found.get(_key(author_id))
+    if cached is not None and cached[0] == generation:
+        return cached[1]
+    if generation is None:
+        generation = graphs.add(_generation_key(author_id), uuid.uuid4().hex, TIMEOUT)
+    followers, following = set(), set()
+    follows = Follow.objects.filter(Q(follower=author_id) | Q(followed=author_id), pending='no')
+    for follower_id, followed_id in follows.values_list('follower', 'followed'):
+        if followed_id == author_id:
+            followers.add(follower_id)
+        if follower_id == author_id:
+            following.add(followed_id)
+    graph = (frozenset(followers), frozenset(following))
+    graphs.set(_key(author_id), (generation, graph), TIMEOUT)
+    return graph
+
+
+def invalidate(*authors):
+    """
+    Starts a new generation of the graphs of `authors`.
+    """
+    ids = [_id(author) for author in authors]
+    for author_id in ids:
+        graphs.set(_generation_key(author_id), uuid.uuid4().hex, TIMEOUT)
+    graphs.delete_many([_key(author_id) for author_id in ids])
+
+
+def followers_of(author):
+    return adjacency(author)[0]
+
+
+def following_of(author):
+    return adjacency(author)[1]
+
+
+def friends_of(author):
+    """
+    Ids of the authors that follow `author` and are followed back.
+    """
+    followers, following = adjacency(author)
+    return followers & following
+
+
+def are_friends(author1, author2):
+    if author1 is None or author2 is None:
+        return False
+    return _id(author2) in friends_of(author1)
+
+
+def friends_among(author, candidates):
+    """
+    Ids of the `candidates` (authors or ids) that are friends of `author`.
+    Answers a whole page of visibility checks with at most one query.
+    """
+    if author is None:
+        return set()
+    friends = friends_of(author)
+    return {_id(candidate) for candidate in candidates if _id(candidate) in friends}
@@ -0,0 +1,130 @@
+import logging
+import requests
+from datetime import datetime, timedelta, timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from author.models import Author
+from post.models import Post
+from service.models import GithubPoll
+from service.utils.federation import client
+
+logger = logging.getLogger(__name__)
+
+API_URL = getattr(settings, 'GITHUB_API_URL', 'https://api.github.com').rstrip('/')
+# seconds between polls of one feed when GitHub sends no X-Poll-Interval
+POLL_INTERVAL = getattr(settings, 'GITHUB_POLL_INTERVAL', 60)
+# set while GitHub's rate limit is exhausted, to the time it resets
+PAUSED_KEY = "github:paused-until"
+
+
+def github_username(github_url):
+    return github_url.rstrip('/').split('/')[-1]
+
+
+def _header_int(response, name):
+    try:
+        return int(response.headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+def rate_limit_reset(response):
+    """
+    When GitHub allows requests again after `response`, None if it is not rate limiting.
+    """
+    now = timezone.now()
+    retry_after = _header_int(response, 'Retry-After')
+    if retry_after is not None:
+        return now + timedelta(seconds=retry_after)
+    if _header_int(response, 'X-RateLimit-Remaining') == 0:
+        reset = _header_int(response, 'X-RateLimit-Reset')
+        if reset is not None:
+            return max(now, datetime.fromtimestamp(reset, tz=dt_timezone.utc))
+        return now + timedelta(seconds=POLL_INTERVAL)
+    return None
+
+
+def create_push_posts(author, events):
+    """
+    Creates a post for every PushEvent of `events` that has none yet. Returns how many.
+    """
+    pushes = {event['id']: event for event in events if event.get('type') == 'PushEvent'}
+    existing = set(Post.objects.filter(github_event_id__in=pushes).values_list('github_event_id', flat=True))
+    created = 0
+    for event_id, event in pushes.items():
+        if event_id in existing:
+            continue
+        Post.objects.create(
+            author=author,
+            title=f"{event['type']} on {event['repo']['name']}",
+            content=f"Event data: {event['payload']}",
+            created_at=timezone.now(),
+            github_event_id=event_id,
+        )
+        created += 1
+    return created
+
+
+def poll_author(author, poll):
+    """
+    Reads the public events of `author` with `If-None-Match`, so an unchanged feed is a
+    304 that needs no event processing. Stores the new ETag and the next poll time
+    (GitHub's `X-Poll-Interval`, pushed back while the rate limit is exhausted) on `poll`.
+    Returns the number of posts created.
+    """
+    username = github_username(author.github_url)
+    if poll.username != username:
+        poll.username, poll.etag = username, None
+    headers = {'Accept': 'application/vnd.github.v3+json'}
+    if poll.etag:
+        headers['If-None-Match'] = poll.etag
+    response = client.get(f"{API_URL}/users/{username}/events/public", headers=headers)
+
+    created = 0
+    if response.status_code == 200:
+        created = create_push_posts(author, response.json())
+        poll.etag = response.headers.get('ETag')
+        logger.info(f"Created {created} new posts for {username}")
+    elif response.status_code != 304:
+        logger.error(f"Failed to fetch GitHub events for {username}. Status code: {response.status_code}")
+
+    now = timezone.now()
+    poll.poll_interval = _header_int(response, 'X-Poll-Interval') or POLL_INTERVAL
+    poll.next_poll_at = now + timedelta(seconds=poll.poll_interval)
+    poll.last_status_code = response.status_code
+    reset = rate_limit_reset(response)
+    if reset is not None:
+        logger.warning(f"GitHub rate limit reached, pausing until {reset}")
+        cache.set(PAUSED_KEY, reset, max(int((reset - now).total_seconds()), 1))
+        poll.next_poll_at = max(poll.next_poll_at, reset)
+    poll.save()
+    return created
+
+
+def poll_github_activity():
+    """
+    Polls the GitHub events of every local author with a GitHub url whose next poll is
+    due, stopping while the rate limit is exhausted. Meant to run periodically from
+    `runapscheduler`. Returns the number of posts created.
+    """
+    if cache.get(PAUSED_KEY) is not None:
+        return 0
+    authors = list(Author.objects.exclude(serial=0).exclude(github_url__isnull=True).exclude(github_url=''))
+    polls = GithubPoll.objects.in_bulk([author.pk for author in authors])
+    now = timezone.now()
+    created = 0
+    for author in authors:
+        poll = polls.get(author.pk)
+        if poll is None:
+            poll = GithubPoll(author=author)
+        elif poll.next_poll_at > now:
+            continue
+        try:
+            created += poll_author(author, poll)
+        except (requests.RequestException, ValueError, KeyError) as e:
+            logger.warning(f"Error fetching GitHub events of {author.github_url}: {e}")
+            continue
+        if cache.get(PAUSED_KEY) is not None:
+            break
+    return created
@@ -0,0 +1,235 @@
+import base64
+import binascii
+import hashlib
+import logging
+from io import BytesIO
+from PIL import Image, ImageOps, UnidentifiedImageError
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from service.utils.delivery import pool
+
+logger = logging.getLogger(__name__)
+
+# largest image upload accepted, in bytes
+MAX_UPLOAD_SIZE = getattr(settings, 'IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 * 1024)
+UPLOAD_TYPES = ('image/jpeg', 'image/png')
+
+# widths (in pixels) of the downscaled copies served for `?w=`
+VARIANT_WIDTHS = tuple(sorted(getattr(settings, 'IMAGE_VARIANT_WIDTHS', (320, 640, 1280))))
+VARIANT_QUALITY = getattr(settings, 'IMAGE_VARIANT_QUALITY', 80)
+VARIANT_FORMATS = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+
+
+class DatabaseImageStore:
+    """
+    Keeps the image bytes in the `PostImage.data` column. The column is written in one go,
+    so each upload is read into memory whole; for hosts without a persistent disk.
+    """
+    name = 'database'
+
+    def save(self, image, file):
+        image.data = file.read()
+
+    def open(self, image):
+        return bytes(image.data)
+
+
+class FileSystemImageStore:
+    """
+    Keeps the image bytes in Django's default storage (MEDIA_ROOT), one file per key.
+    """
+    name = 'filesystem'
+
+    def path(self, key):
+        return f"post_images/{key[:2]}/{key}"
+
+    def save(self, image, file):
+        path = self.path(image.key)
+        if not default_storage.exists(path):
+            # copied chunk by chunk
+            default_storage.save(path, file)
+
+    def open(self, image):
+        with default_storage.open(self.path(image.key)) as file:
+            return file.read()
+
+
+STORES = {store.name: store for store in (DatabaseImageStore(), FileSystemImageStore())}
+
+
+def get_store(name=None):
+    """
+    The image store called `name`, IMAGE_STORE by default.
+    """
+    return STORES[name or getattr(settings, 'IMAGE_STORE', 'filesystem')]
+
+
+def decode_content(content):
+    """
+    Bytes of a base64 post content (data URLs included), None if it is not base64.
+    """
+    if content.startswith('data:'):
+        content = content.partition(',')[2]
+    try:
+        return base64.b64decode(''.join(content.split()), validate=True)
+    except (binascii.Error, ValueError):
+        return None
+
+
+def dimensions(file):
+    """
+    `(width, height)` of the image in `file` (read from its header), `(None, None)` if it
+    is not an image.
+    """
+    file.seek(0)
+    try:
+        with Image.open(file) as image:
+            return image.size
+    except (UnidentifiedImageError, OSError):
+        return None, None
+    finally:
+        file.seek(0)
+
+
+class ImageTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = f"Images are limited to {MAX_UPLOAD_SIZE} bytes."
+    default_code = 'image_too_large'
+
+
+def validate_upload(upload):
+    """
+    Checks an uploaded image file (type, size, decodable header) before it is stored with
+    `store_file`. Raises `ImageTooLarge` or `ValidationError`.
+    """
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise ImageTooLarge()
+    if upload.content_type not in UPLOAD_TYPES:
+        raise ValidationError({"content": f"Unsupported image type {upload.content_type}, expected one of {', '.join(UPLOAD_TYPES)}."})
+    if dimensions(upload) == (None, None):
+        raise ValidationError({"content": "The uploaded file is not a valid image."})
+
+
+def store_image(data, content_type):
+    """
+    Saves `data` (bytes) in the configured store, see `store_file`.
+    """
+    return store_file(ContentFile(data), content_type)
+
+
+def store_file(file, content_type):
+    """
+    Saves `file` (a Django `File`, e.g. an upload) in the configured store and returns its
+    `PostImage`. The file is hashed and copied in chunks, so only the database store ever
+    holds a whole image in memory. Images are keyed by their SHA-256: identical uploads
+    share one row and one copy of the bytes. The variants are rendered in the background
+    once the transaction commits.
+    """
+    from post.models import PostImage
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in file.chunks():
+        digest.update(chunk)
+    key = digest.hexdigest()
+    image = PostImage.objects.filter(pk=key).defer('data').first()
+    if image is None:
+        store = get_store()
+        width, height = dimensions(file)
+        image = PostImage(key=key, content_type=content_type, size=file.size, width=width, height=height, storage=store.name)
+        store.save(image, file)
+        try:
+            with transaction.atomic():
+                image.save(force_insert=True)
+        except IntegrityError:
+            # stored by a concurrent upload of the same bytes
+            return PostImage.objects.defer('data').get(pk=key)
+        transaction.on_commit(lambda: pool.submit('image-variants', generate_variants, key))
+    return image
+
+
+def read_image(image):
+    """
+    Bytes of `image`, read from the store it was saved in. Bytes in a deferred `data`
+    column are queried but not kept on `image`.
+    """
+    if image.storage == DatabaseImageStore.name and 'data' in image.get_deferred_fields():
+        return bytes(type(image).objects.values_list('data', flat=True).get(pk=image.pk))
+    return get_store(image.storage).open(image)
+
+
+def read_base64(image):
+    return base64.b64encode(read_image(image)).decode('utf-8')
+
+
+def variant_width(image, requested):
+    """
+    The VARIANT_WIDTHS entry serving a request for `requested` pixels: the smallest one
+    that is wide enough, or the widest. None when the original is not wider than that.
+    """
+    max_width = next((width for width in VARIANT_WIDTHS if width >= requested), VARIANT_WIDTHS[-1])
+    if image.width is not None and image.width <= max_width:
+        return None
+    return max_width
+
+
+def render_variant(data, max_width, format):
+    """
+    Returns `(bytes, (width, height))` of `data` scaled down to at most `max_width`
+    pixels wide, encoded as `format` (a VARIANT_FORMATS key).
+    """
+    with Image.open(BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        image.thumbnail((max_width, image.height))
+        if format == 'jpeg' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        elif format == 'webp' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        output = BytesIO()
+        image.save(output, format=format.upper(), quality=VARIANT_QUALITY)
+        return output.getvalue(), image.size
+
+
+def get_variant(image, max_width, format, data=None):
+    """
+    The `ImageVariant` of `image` for `max_width` and `format`, rendered and stored on
+    first use. `data` is the original's bytes when the caller already has them.
+    Returns None if the original cannot be decoded.
+    """
+    from post.models import ImageVariant
+    variant = ImageVariant.objects.filter(image=image, max_width=max_width, format=format).defer('data').first()
+    if variant is not None:
+        return variant
+    try:
+        rendered, (width, height) = render_variant(read_image(image) if data is None else data, max_width, format)
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        logger.warning(f"Cannot render {image} at {max_width}px: {e}")
+        return None
+    store = get_store()
+    variant = ImageVariant(image=image, max_width=max_width, format=format, content_type=VARIANT_FORMATS[format],
+                           size=len(rendered), width=width, height=height, storage=store.name)
+    store.save(variant, ContentFile(rendered))
+    try:
+        with transaction.atomic():
+            variant.save(force_insert=True)
+    except IntegrityError:
+        # rendered by a concurrent request
+        return ImageVariant.objects.defer('data').get(image=image, max_width=max_width, format=format)
+    return variant
+
+
+def generate_variants(key):
+    """
+    Renders every variant of the image `key` that is smaller than the original.
+    Runs in the background after an image is stored, so most requests find them ready.
+    """
+    from post.models import PostImage
+    image = PostImage.objects.filter(pk=key).first()
+    if image is None:
+        return 0
+    data = read_image(image)
+    widths = {variant_width(image, width) for width in VARIANT_WIDTHS} - {None}
+    return sum(get_variant(image, width, format, data) is not None for width in widths for format in VARIANT_FORMATS)
@@ -1,7 +1,18 @@
 import jwt
 import datetime
 from django.conf import settings
+from django.db.models import F
 import base64
+from service.utils.local_cache import LocalCache
+
+# seconds a token version stays cached; revoke_tokens invalidates it right away
+TOKEN_VERSION_TIMEOUT = getattr(settings, 'JWT_TOKEN_VERSION_TIMEOUT', 300)
+# token versions are also kept in the process, so authenticating costs no query; other
+# processes accept revoked tokens for at most JWT_TOKEN_VERSION_LOCAL_TTL seconds
+versions = LocalCache(
+    max_size=getattr(settings, 'JWT_TOKEN_VERSION_CACHE_SIZE', 4096),
+    ttl=getattr(settings, 'JWT_TOKEN_VERSION_LOCAL_TTL', 30),
+)
 
 
 def create_token(payload, timeout=60):
@@ -17,6 +28,50 @@ def create_token(payload, timeout=60):
     
     return jwt.encode(payload=payload, key=salt, algorithm='HS256', headers=headers)
 
+def _version_key(author_id):
+    return f"token-version:{author_id}"
+
+
+def create_user_token(user, author, timeout=60):
+    """
+    Login token of `user`. Besides `id` and `username` it carries what most requests need
+    (author id, active and staff flags) and the author's token version, so
+    `JwtQueryParamsAuthentication` can accept it without loading the user.
+    """
+    return create_token({
+        'id': author.serial,
+        'username': user.username,
+        'author': author.pk,
+        'active': user.is_active,
+        'staff': user.is_staff,
+        'ver': author.token_version,
+    }, timeout)
+
+
+def token_version(author_id):
+    """
+    Current token version of an author, None if the author is gone. Cached in the process
+    and in CACHES, one query on a miss.
+    """
+    version = versions.get(_version_key(author_id))
+    if version is None:
+        from author.models import Author
+        version = Author.objects.filter(pk=author_id).values_list('token_version', flat=True).first()
+        if version is not None:
+            versions.set(_version_key(author_id), version, TOKEN_VERSION_TIMEOUT)
+    return version
+
+
+def revoke_tokens(author_id):
+    """
+    Invalidates every login token issued so far to the author `author_id`: right away in
+    this process, within JWT_TOKEN_VERSION_LOCAL_TTL seconds in the others.
+    """
+    from author.models import Author
+    Author.objects.filter(pk=author_id).update(token_version=F('token_version') + 1)
+    versions.delete_many([_version_key(author_id)])
+
+
 def create_server_token(username, password):
     credentials = f"{username}:{password}"
     
@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import cache
+
+
+class LocalCache:
+    """
+    Bounded in-process LRU with a short `ttl` in front of Django's cache (CACHES, shared
+    by every process).
+
+    A hit in the process costs no query even when CACHES is the database cache. Values
+    changed by another process are seen once the local copy expires, after at most `ttl`
+    seconds; `delete_many` drops the local and shared copies right away.
+    """
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (value, expiry)
+
+    def get(self, key):
+        """
+        The value of `key`, from the process or else from the shared cache. None on a miss.
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(key)
+                return entry[0]
+        value = cache.get(key)
+        if value is not None:
+            self._remember(key, value, now)
+        return value
+
+    def get_many(self, keys):
+        """
+        `{key: value}` of the `keys` found, in the process or else with one read of the
+        shared cache.
+        """
+        now = time.monotonic()
+        found, missing = {}, []
+        with self._lock:
+            for key in keys:
+                entry = self._entries.get(key)
+                if entry is not None and entry[1] > now:
+                    self._entries.move_to_end(key)
+                    found[key] = entry[0]
+                else:
+                    missing.append(key)
+        if missing:
+            for key, value in cache.get_many(missing).items():
+                self._remember(key, value, now)
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout):
+        cache.set(key, value, timeout)
+        self._remember(key, value, time.monotonic())
+
+    def add(self, key, value, timeout):
+        """
+        Stores `value` unless the shared cache has a value for `key`; returns the value
+        that is kept.
+        """
+        if not cache.add(key, value, timeout):
+            value = cache.get(key, value)
+        self._remember(key, value, time.monotonic())
+        return value
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+        cache.delete_many(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def _remember(self, key, value, now):
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
@@ -0,0 +1,262 @@
+import logging
+import random
+import threading
+import requests
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from service.models import Node, Outbox
+from service.utils import images
+from service.utils.delivery import pool
+from service.utils.federation import client
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = getattr(settings, 'OUTBOX_MAX_ATTEMPTS', 8)
+BACKOFF_BASE = getattr(settings, 'OUTBOX_BACKOFF_BASE', 30)
+BACKOFF_MAX = getattr(settings, 'OUTBOX_BACKOFF_MAX', 6 * 60 * 60)
+BATCH_MAX = getattr(settings, 'INBOX_BATCH_MAX', 500)
+BATCH_TYPE = 'inbox-batch'
+# answers from a peer whose batch inbox endpoint does not exist (anymore)
+BATCH_UNSUPPORTED = (404, 405, 501)
+# a delivery stuck in 'sending' this long belongs to a crashed worker
+SENDING_TIMEOUT = timedelta(minutes=5)
+
+
+def backoff(attempts):
+    """
+    Seconds to wait after the `attempts`-th failure: exponential, capped at BACKOFF_MAX,
+    with full jitter (uniform between 0 and the capped delay).
+    """
+    delay = min(BACKOFF_BASE * 2 ** max(attempts - 1, 0), BACKOFF_MAX)
+    return random.uniform(0, delay)
+
+
+def enqueue(node, url, payload, recipient, author=None, post=None):
+    """
+    Records a delivery of `payload` to the inbox at `url` and tries it right after the
+    current transaction commits. Failures are retried by `process_outbox`.
+    With `post`, `payload` is the post without its content (see `body`).
+    """
+    entry = Outbox.objects.create(node=node, url=url, payload=payload, recipient=recipient, author=author, post=post,
+                                  object=object_of(payload))
+    transaction.on_commit(lambda: pool.submit(node.url, deliver, entry.id))
+    return entry
+
+
+def object_of(payload):
+    """
+    Fqid of the post, comment or like delivered by `payload`, a batch's object included.
+    """
+    if payload.get("type") == BATCH_TYPE:
+        payload = payload["object"]
+    fqid = payload.get("id")
+    return fqid if isinstance(fqid, str) else None
+
+
+def serial_of(fqid):
+    """
+    Last path segment of an author fqid, e.g. `http://node/api/authors/7` -> `7`.
+    """
+    return fqid.rstrip('/').split('/')[-1]
+
+
+def enqueue_batch(node, recipients, payload, author=None, post=None):
+    """
+    Records the delivery of one `payload` to several authors (`recipients`, a list of
+    fqids) on the same `node`.
+
+    Behavior:
+    - If the node advertises a batch inbox, one delivery to `{node.url}inbox/batch` is
+      recorded per BATCH_MAX recipients, carrying the object once.
+    - Otherwise one delivery per recipient inbox is recorded. Nodes that were never
+      probed are probed in the background so later deliveries can be batched.
+
+    Returns:
+    - list of `Outbox` entries.
+    """
+    if node.supports_batch_inbox and len(recipients) > 1:
+        entries = []
+        for start in range(0, len(recipients), BATCH_MAX):
+            chunk = recipients[start:start + BATCH_MAX]
+            batch = {"type": BATCH_TYPE, "recipients": [serial_of(fqid) for fqid in chunk], "object": payload}
+            entries.append(enqueue(node, f"{node.url}inbox/batch", batch, node.url, author, post))
+        return entries
+
+    if node.supports_batch_inbox is None:
+        transaction.on_commit(lambda: pool.submit(node.url, probe_batch_inbox, node.id))
+    return [enqueue(node, f"{fqid}/inbox", payload, fqid, author, post) for fqid in recipients]
+
+
+def probe_batch_inbox(node_id):
+    """
+    Asks a node whether it accepts batched inbox deliveries (GET `{node.url}inbox/batch`)
+    and remembers the answer on the node. Network errors leave the node unprobed.
+    """
+    node = Node.objects.get(pk=node_id)
+    try:
+        response = client.get(f"{node.url}inbox/batch", node=node)
+    except requests.RequestException as e:
+        logger.warning(f"Error probing batch inbox of {node.url}: {e}")
+        return None
+    try:
+        supported = response.ok and response.json().get("type") == BATCH_TYPE
+    except ValueError:
+        supported = False
+    Node.objects.filter(pk=node_id).update(supports_batch_inbox=supported)
+    return supported
+
+
+def split_batch(entry):
+    """
+    Replaces a batch delivery refused by its node with one delivery per recipient and
+    stops batching for that node.
+    """
+    node = entry.node
+    Node.objects.filter(pk=node.pk).update(supports_batch_inbox=False)
+    payload = entry.payload["object"]
+    Outbox.objects.bulk_create([
+        Outbox(node=node, author_id=entry.author_id, post_id=entry.post_id, object=entry.object,
+               recipient=f"{node.url}authors/{serial}",
+               url=f"{node.url}authors/{serial}/inbox", payload=payload)
+        for serial in entry.payload["recipients"]
+    ])
+    entry.delete()
+
+
+def dead_letter(recipient, error, payload, author=None, post=None):
+    """
+    Records a delivery that can never be sent (e.g. the recipient's node is not allowed).
+    """
+    logger.warning(error)
+    return Outbox.objects.create(recipient=recipient, payload=payload, author=author, post=post,
+                                 object=object_of(payload), status='dead', last_error=error)
+
+
+def body(entry):
+    """
+    The JSON sent for `entry`: its payload with the content of its post put back in,
+    text as is and images base64 encoded from the image store.
+    """
+    if entry.post_id is None:
+        return entry.payload
+    post = entry.post
+    content = post.content if post.image_id is None else images.read_base64(post.image)
+    if entry.payload.get("type") == BATCH_TYPE:
+        return {**entry.payload, "object": {**entry.payload["object"], "content": content}}
+    return {**entry.payload, "content": content}
+
+
+def deliver(entry_id):
+    """
+    Sends one pending delivery. The row is claimed with a conditional UPDATE so the
+    web process and the scheduler never send the same delivery twice.
+    """
+    now = timezone.now()
+    claimed = Outbox.objects.filter(pk=entry_id, status='pending', next_attempt_at__lte=now).update(status='sending', next_attempt_at=now)
+    if not claimed:
+        return None
+    entry = Outbox.objects.select_related('node', 'post__image').get(pk=entry_id)
+    entry.attempts += 1
+
+    try:
+        response = client.post(entry.url, node=entry.node, json=body(entry))
+        entry.last_status_code = response.status_code
+        entry.last_error = None if response.ok else f"Failed to notify {entry.recipient} with {response}"
+    except requests.RequestException as e:
+        entry.last_status_code = None
+        entry.last_error = f"Error notifying {entry.recipient}: {e}"
+
+    if entry.payload.get("type") == BATCH_TYPE:
+        if entry.last_status_code in BATCH_UNSUPPORTED:
+            # the node dropped batch support, the split deliveries go out with the next run
+            split_batch(entry)
+            return None
+        if entry.last_error is None:
+            entry.results = batch_results(response)
+
+    finished = timezone.now()
+    if entry.last_error is None:
+        entry.status = 'delivered'
+        entry.delivered_at = finished
+        entry.latency_ms = int((finished - entry.created_at).total_seconds() * 1000)
+    elif entry.attempts >= MAX_ATTEMPTS:
+        entry.status = 'dead'
+        logger.error(f"Giving up on {entry}: {entry.last_error}")
+    else:
+        entry.status = 'pending'
+        entry.next_attempt_at = finished + timedelta(seconds=backoff(entry.attempts))
+        logger.warning(entry.last_error)
+
+    entry.save(update_fields=['status', 'attempts', 'next_attempt_at', 'last_status_code',
+                              'last_error', 'delivered_at', 'latency_ms', 'results'])
+    return entry
+
+
+def batch_results(response):
+    """
+    The inbox status code of every recipient serial in the answer to a batch delivery
+    (see `service.views.inbox_batch`), None if the node did not send them.
+    """
+    try:
+        results = response.json().get("results")
+    except (ValueError, AttributeError):
+        return None
+    return results if isinstance(results, dict) else None
+
+
+def delivery_status(author, object_fqid):
+    """
+    Where the deliveries of `object_fqid` sent by `author` stand, per recipient.
+
+    Behavior:
+    - Batch deliveries are expanded to their recipients. Once a batch is delivered its
+      recipients report the inbox status code the node gave each of them.
+    - An object pushed again (e.g. an edited post) reports its latest delivery.
+
+    Returns:
+    - list of dicts with `recipient` (fqid), `status` (pending/sending/delivered/dead),
+      `status_code`, `attempts`, `error` and `delivered_at`.
+    """
+    entries = (Outbox.objects.filter(author=author, object=object_fqid)
+               .select_related('node').order_by('created_at', 'id'))
+    deliveries = {}
+    for entry in entries:
+        state = {"status": entry.status, "attempts": entry.attempts, "error": entry.last_error,
+                 "delivered_at": entry.delivered_at}
+        if entry.payload.get("type") != BATCH_TYPE:
+            deliveries[entry.recipient] = {"recipient": entry.recipient, "status_code": entry.last_status_code, **state}
+            continue
+        results = entry.results or {}
+        for serial in entry.payload["recipients"]:
+            recipient = f"{entry.node.url}authors/{serial}"
+            deliveries[recipient] = {"recipient": recipient, "status_code": results.get(str(serial), entry.last_status_code), **state}
+    return list(deliveries.values())
+
+
+def process_outbox(limit=500, wait=True):
+    """
+    Sends every due delivery through the delivery pool. Meant to run periodically
+    from `runapscheduler`.
+    """
+    now = timezone.now()
+    # recover deliveries abandoned by a crashed worker
+    Outbox.objects.filter(status='sending', next_attempt_at__lt=now - SENDING_TIMEOUT).update(status='pending')
+
+    due = list(Outbox.objects.filter(status='pending', next_attempt_at__lte=now)
+               .order_by('next_attempt_at').values_list('id', 'node__url')[:limit])
+    done = threading.Semaphore(0)
+
+    def run(entry_id):
+        try:
+            deliver(entry_id)
+        finally:
+            done.release()
+
+    for entry_id, node_url in due:
+        pool.submit(node_url, run, entry_id)
+    if wait:
+        for _ in due:
+            done.acquire()
+    return len(due)
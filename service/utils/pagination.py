@@ -0,0 +1,229 @@
+import base64
+import binascii
+import hashlib
+import json
+from functools import cached_property, partial
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import EmptyPage, InvalidPage, PageNotAnInteger, Paginator
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+
+COUNT_CACHE_TIMEOUT = getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+ESTIMATE_THRESHOLD = getattr(settings, 'PAGINATION_ESTIMATE_THRESHOLD', 10000)
+COUNT_MODES = ('exact', 'cached', 'estimate')
+
+
+def estimate_rows(queryset):
+    """
+    The query planner's row estimate for `queryset` (PostgreSQL only), None elsewhere.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return None
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+def count_rows(queryset, mode='exact'):
+    """
+    Total rows of `queryset`:
+    - exact: `COUNT(*)`.
+    - cached: `COUNT(*)` shared by identical queries for COUNT_CACHE_TIMEOUT seconds.
+    - estimate: the planner estimate, counted exactly when it is below
+      ESTIMATE_THRESHOLD or the database has no estimates.
+    """
+    if mode == 'estimate':
+        estimate = estimate_rows(queryset)
+        if estimate is not None and estimate >= ESTIMATE_THRESHOLD:
+            return estimate
+        return queryset.count()
+    if mode == 'cached':
+        sql, params = queryset.query.sql_with_params()
+        key = "count:" + hashlib.md5(repr((sql, params)).encode()).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, COUNT_CACHE_TIMEOUT)
+        return count
+    return queryset.count()
+
+
+def filter_rows(queryset, condition):
+    """
+    `queryset.filter(condition)`, also for a union: the condition is applied to each of
+    its parts, which keep their own indexes.
+    """
+    query = queryset.query
+    if query.combinator != 'union':
+        return queryset.filter(condition)
+    parts = []
+    for part_query in query.combined_queries:
+        part = queryset.model.objects.none()
+        part.query = part_query.chain()
+        parts.append(part.filter(condition))
+    return parts[0].union(*parts[1:], all=query.combinator_all).order_by(*query.order_by)
+
+
+class CountingPaginator(Paginator):
+    """
+    Django paginator that only counts when the total is asked for, following `count_mode`.
+    Outside 'exact' mode pages are sliced directly and an empty page past the first
+    is the end of the list.
+    """
+    def __init__(self, object_list, per_page, count_mode='exact', **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.count_mode = count_mode
+
+    @cached_property
+    def count(self):
+        return count_rows(self.object_list, self.count_mode)
+
+    def page(self, number):
+        if self.count_mode == 'exact':
+            return super().page(number)
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+        bottom = (number - 1) * self.per_page
+        object_list = list(self.object_list[bottom:bottom + self.per_page])
+        if not object_list and number > 1:
+            raise EmptyPage("That page contains no results")
+        return self._get_page(object_list, number, self)
+
+
+class KeysetPaginationMixin:
+    """
+    Adds keyset (cursor) pagination to a `PageNumberPagination`.
+
+    Behavior:
+    - Without `?cursor=` the paginator works by page number as before.
+    - With `?cursor=` (empty for the first page) the page is read with
+      `WHERE (ordering) > (last row) ... LIMIT size + 1` instead of OFFSET, so deep pages
+      cost the same as the first one and rows inserted meanwhile are neither skipped
+      nor repeated. The response envelope gets a `next` cursor (None on the last page).
+    - The ordering comes from the queryset (`cursor_ordering` if it is unordered) and
+      always ends with `id` as a tie breaker. Every field must be a plain column.
+    - `count_mode` (see `count_rows`) decides how `get_count` totals the list. Endpoints
+      with a denormalized counter report it instead and never count, except in 'exact'
+      mode, where Django's paginator counts to validate the page number.
+    """
+    cursor_query_param = 'cursor'
+    cursor_ordering = ('created_at', 'id')
+    count_mode = 'exact'
+    # no browsable API page controls, they need the page count
+    template = None
+
+    @property
+    def django_paginator_class(self):
+        return partial(CountingPaginator, count_mode=self.count_mode)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        if self.cursor_query_param not in request.query_params:
+            self.cursor = None
+            return self.paginate_by_number(queryset, request)
+
+        ordering = list(queryset.query.order_by) or list(self.cursor_ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering.append('-id' if ordering[0].startswith('-') else 'id')
+        values, number = self.decode_cursor(request.query_params[self.cursor_query_param], len(ordering))
+        queryset = queryset.order_by(*ordering)
+        self.cursor = CursorPage(number, queryset)
+        if values is not None:
+            queryset = filter_rows(queryset, self.after(ordering, values))
+
+        size = self.get_page_size(request)
+        rows = list(queryset[:size + 1])
+        if len(rows) > size:
+            rows = rows[:size]
+            last = rows[-1]
+            self.cursor.next = self.encode_cursor([getattr(last, field.lstrip('-')) for field in ordering], number + 1)
+        return rows
+
+    def paginate_by_number(self, queryset, request):
+        """
+        `PageNumberPagination.paginate_queryset` without its `num_pages` check for the
+        browsable API page controls, which would count the rows on every page.
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+        paginator = self.django_paginator_class(queryset, page_size)
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+        return list(self.page)
+
+    @property
+    def page_number(self):
+        return self.cursor.number if self.cursor is not None else self.page.number
+
+    def get_count(self):
+        """
+        Total number of rows being paginated.
+        """
+        if self.cursor is not None:
+            return count_rows(self.cursor.queryset, self.count_mode)
+        return self.page.paginator.count
+
+    def cursor_data(self):
+        """
+        Extra envelope keys of a cursor page.
+        """
+        return {"next": self.cursor.next} if self.cursor is not None else {}
+
+    @staticmethod
+    def after(ordering, values):
+        """
+        Rows that sort after `values` in `ordering`:
+        (a > x) OR (a = x AND b > y) OR ... with `lt` for descending fields.
+        """
+        condition = Q()
+        for i, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            term = Q(**{f"{name}__{lookup}": values[i]})
+            for previous, value in zip(ordering[:i], values):
+                term &= Q(**{previous.lstrip('-'): value})
+            condition |= term
+        return condition
+
+    @staticmethod
+    def encode_cursor(values, number):
+        data = json.dumps({"v": values, "p": number}, default=str, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    @staticmethod
+    def decode_cursor(cursor, length):
+        """
+        Returns `(values, page number)`; `(None, 1)` for an empty cursor.
+        """
+        if not cursor:
+            return None, 1
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values, number = data["v"], int(data["p"])
+        except (binascii.Error, ValueError, TypeError, KeyError):
+            raise NotFound("Invalid cursor.")
+        if not isinstance(values, list) or len(values) != length:
+            raise NotFound("Invalid cursor.")
+        return values, number
+
+
+class CursorPage:
+    def __init__(self, number, queryset):
+        self.number = number
+        self.queryset = queryset
+        self.next = None
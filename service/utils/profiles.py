@@ -0,0 +1,74 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+
+
+class ProfileCache:
+    """
+    Serialized author profiles (`AuthorSerializer` output) keyed by fqid: a bounded
+    in-process LRU in front of Django's cache.
+
+    Every entry remembers the `updated_at` of the author it was rendered from and is only
+    used for an instance with the same `updated_at`, so a profile edited by another
+    process is never served from a stale copy. Saves, deletes and remote refreshes also
+    drop the entries right away (`invalidate`).
+    """
+    def __init__(self, max_size, local_ttl, timeout):
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # fqid -> (updated_at, data, expiry)
+
+    @staticmethod
+    def key(fqid):
+        # fqids are URLs of up to 500 characters, too long for some cache backends
+        return "author-profile:" + hashlib.sha1(fqid.encode('utf-8')).hexdigest()
+
+    def get(self, author, render):
+        """
+        The serialized profile of `author`, `render(author)` on a miss.
+        """
+        if author.pk is None or not author.fqid:
+            return render(author)
+        fqid, stamp = author.fqid, author.updated_at
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(fqid)
+            if entry is not None and entry[0] == stamp and entry[2] > now:
+                self._entries.move_to_end(fqid)
+                return dict(entry[1])
+
+        shared = cache.get(self.key(fqid))
+        if shared is not None and shared[0] == stamp:
+            data = shared[1]
+        else:
+            data = dict(render(author))
+            cache.set(self.key(fqid), (stamp, data), self.timeout)
+        with self._lock:
+            self._entries[fqid] = (stamp, data, now + self.local_ttl)
+            self._entries.move_to_end(fqid)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return dict(data)
+
+    def invalidate(self, *fqids):
+        fqids = [fqid for fqid in fqids if fqid]
+        with self._lock:
+            for fqid in fqids:
+                self._entries.pop(fqid, None)
+        cache.delete_many([self.key(fqid) for fqid in fqids])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+profiles = ProfileCache(
+    max_size=getattr(settings, 'AUTHOR_CACHE_SIZE', 4096),
+    local_ttl=getattr(settings, 'AUTHOR_CACHE_LOCAL_TTL', 60),
+    timeout=getattr(settings, 'AUTHOR_CACHE_TIMEOUT', 600),
+)
@@ -1,112 +1,82 @@
-import requests
-from service.utils.jwt_auth import create_hearders
+from post.models import Post
 from service.models import Node
-from rest_framework.exceptions import ValidationError
-from rest_framework.response import Response
-from rest_framework import status
+from service.utils import outbox
+
+
+def find_node(nodes, url, exact=False):
+    for node in nodes:
+        if (exact and url == node.url) or (not exact and url.startswith(node.url)):
+            return node
+    return None
+
 
 def push(author, request, data):
-    log = []
+    """
+    Queues the inbox deliveries of `data` (a serialized post, comment or like) and
+    returns without waiting for remote nodes.
+
+    Behavior:
+    - post: one delivery per accepted follower of `author`, or one per remote node for
+      nodes that accept batched inbox deliveries.
+    - comment/like: one delivery to the owner of the commented/liked object.
+    - Remote recipients on allowed nodes get a durable `Outbox` entry that is sent from
+      the background pool and retried with backoff (see `service.utils.outbox`).
+    - Local recipients already share our tables, nothing is sent.
+    - Recipients on unknown nodes are recorded as dead letters.
+    - Posts are recorded without their content, every entry points at the post and the
+      content (base64 for images) is only read when the delivery is sent.
+
+    Returns:
+    - list of `Outbox` entries, one per remote recipient or batch. `entry.recipient` is
+      the recipient fqid (the node url for batches) and `entry.status` is
+      pending/sending/delivered/dead. The status per recipient is looked up later with
+      `outbox.delivery_status` (GET /api/authors/{serial}/outbox?object=...).
+    """
+    entries = []
     type = data.get('type')
-    
+    allowed_nodes = list(Node.objects.filter(is_allowed=True))
+
     if type == 'post':
-        follow_objects = author.followers.filter(pending='no')
+        post = Post.objects.filter(fqid=data.get('id')).only('id').first()
+        if post is not None:
+            data = {key: value for key, value in data.items() if key != 'content'}
+        follow_objects = author.followers.filter(pending='no').select_related('follower')
+        recipients = {}  # node -> follower fqids, sent together when the node supports batching
         # check all followers
         for follow in follow_objects:
-            print(follow)
             follower = follow.follower
-            nodes_exists = Node.objects.filter(is_allowed=True, url=follower.host).exists()
+            node = find_node(allowed_nodes, follower.host, exact=True)
             # request to remote if node exists
-            if nodes_exists:
-                print("send to remote followers")
-                node = Node.objects.get(is_allowed=True, url=follower.host)
-                headers = create_hearders(node)
-                try:
-                    response = requests.post(f"{follower.fqid}/inbox", headers=headers, json=data)
-                    if response.status_code == 201:
-                        response_data = f"Notify {follower} in {node.url} with {response} Successfully"
-                    else:
-                        response_data = f"Failed to notify {follower} in {node.url} with {response}"
-                        
-                except requests.RequestException as e:
-                    print(f"Error notifying {follower} in {node.url}: {e}")
-                    return Response(f"Error notifying {follower} in {node.url}: {e}", status=status.HTTP_400_BAD_REQUEST)
-            # handle local followers
-            elif follower.host == author.host:
-                print("send to local followers")
-                headers = {"Authorization": f"Bearer {request.auth}"}
-                response = requests.post(f"{follower.fqid}/inbox", headers=headers, json=data)
-                response_data = f"Notify {follower} in local with {response} Successfully"
-            else:
-                response_data = f"Error fetching from {follower.host}"
-            
-            log.append(response_data)
-    
+            if node:
+                recipients.setdefault(node, []).append(follower.fqid)
+            # local followers read the same tables
+            elif follower.host != author.host:
+                entries.append(outbox.dead_letter(follower.fqid, f"Error fetching from {follower.host}", data, author, post))
+        for node, fqids in recipients.items():
+            entries.extend(outbox.enqueue_batch(node, fqids, data, author, post))
+
     elif type == 'comment':
         post_fqid = data.get("post")
-        print(post_fqid)
         url = post_fqid.split("/posts/")[0]
-        allowed_nodes = Node.objects.filter(is_allowed=True)
-        matching_nodes = [node for node in allowed_nodes if url.startswith(node.url)]
-        nodes_exists = bool(matching_nodes)
+        node = find_node(allowed_nodes, url)
         # request to remote if node exists
-        if nodes_exists:
-            print("send to remote post owner")
-            node = matching_nodes[0]
-            headers = create_hearders(node)
-            try:
-                response = requests.post(f"{url}/inbox", headers=headers, json=data)
-                if response.status_code == 201 or response.status_code == 200:
-                    response_data = f"Notify {url} in {node.url} with {response} Successfully"
-                else:
-                    response_data = f"Failed to notify {url} in {node.url} with {response}"
-                    
-            except requests.RequestException as e:
-                print(f"Error notifying {url} in {node.url}: {e}")
-                return Response(f"Error notifying {url} in {node.url}: {e}", status=status.HTTP_400_BAD_REQUEST)
-        # handle local author 
-        elif author.host in post_fqid:
-            print("send to local post owner")
-            headers = {"Authorization": f"Bearer {request.auth}"}
-            response_data = f"Notify {author} in local Successfully"
-        else:
-            response_data = f"Error fetching from {url}"
-        
-        log.append(response_data)
-    
+        if node:
+            entries.append(outbox.enqueue(node, f"{url}/inbox", data, url, author))
+        # local post owners read the same tables
+        elif author.host not in post_fqid:
+            entries.append(outbox.dead_letter(url, f"Error fetching from {url}", data, author))
+
     elif type == 'like':
         object_fqid = data.get("object")
         serial = object_fqid.split('authors/')[1].split('/')[0]
-        print(object_fqid, serial)
         url = object_fqid.split("/posts/")[0]
-        allowed_nodes = Node.objects.filter(is_allowed=True)
-        matching_nodes = [node for node in allowed_nodes if url.startswith(node.url)]
-        nodes_exists = bool(matching_nodes)
+        node = find_node(allowed_nodes, url)
         # request to remote if node exists
-        if nodes_exists:
-            print("send to remote post owner")
-            node = node = matching_nodes[0]
-            headers = create_hearders(node)
-            try:
-                response = requests.post(f"{node.url}authors/{serial}/inbox", headers=headers, json=data)
-                if response.status_code == 201 or response.status_code == 200:
-                    response_data = f"Notify {node.url}authors/{serial} in {node.url} with {response} Successfully"
-                else:
-                    response_data = f"Failed to notify {node.url}authors/{serial} in {node.url} with {response}"
-                    
-            except requests.RequestException as e:
-                print(f"Error notifying {node.url}authors/{serial} in {node.url}: {e}")
-                return Response(f"Error notifying {node.url}authors/{serial} in {node.url}: {e}", status=status.HTTP_400_BAD_REQUEST)
-        # handle local author
-        elif author.host in object_fqid:
-            print("send to local post owner")
-            headers = {"Authorization": f"Bearer {request.auth}"}
-            response_data = f"Notify {author} in local Successfully"
-        else:
-            response_data = f"Error fetching from {author}"
-        
-        log.append(response_data)
-        
-        
-    print(log)
-    return log
\ No newline at end of file
+        if node:
+            recipient = f"{node.url}authors/{serial}"
+            entries.append(outbox.enqueue(node, f"{recipient}/inbox", data, recipient, author))
+        # local object owners read the same tables
+        elif author.host not in object_fqid:
+            entries.append(outbox.dead_letter(url, f"Error fetching from {author}", data, author))
+
+    return entries
@@ -0,0 +1,181 @@
+import hashlib
+import json
+import threading
+import uuid
+from collections import OrderedDict
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+# seconds a cached response is kept; changes invalidate it earlier through its tags
+TIMEOUT = getattr(settings, 'RESPONSE_CACHE_TIMEOUT', 300)
+# URLs whose tag version keys this process remembers (see `_version_keys_of`)
+HINT_SIZE = getattr(settings, 'RESPONSE_CACHE_HINT_SIZE', 4096)
+
+# CACHES['responses'], an in-memory cache: in the shared database cache a hit costs
+# queries of its own (the entry, then the visibility check), nearly as many as the views
+# it would spare
+cache = ConnectionProxy(caches, 'responses')
+
+_hints_lock = threading.Lock()
+_hints = OrderedDict()   # entry key -> version keys of its tags
+
+
+def _hash(value):
+    return hashlib.md5(value.encode('utf-8')).hexdigest()
+
+
+def post_tag(post_id):
+    return f"post:{post_id}"
+
+
+def author_tag(fqid):
+    return f"author:{fqid}"
+
+
+def _version_key(tag):
+    return "response-tag:" + _hash(tag)
+
+
+def _entry_key(request):
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    return "response:" + _hash(f"{request.scheme}://{request.get_host()}{request.path}?{query}")
+
+
+def _authors_in(data):
+    """
+    Fqids of the authors nested anywhere in a response.
+    """
+    if isinstance(data, dict):
+        if data.get('type') == 'author' and isinstance(data.get('id'), str):
+            yield data['id']
+        for value in data.values():
+            yield from _authors_in(value)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _authors_in(value)
+
+
+def _current_versions(tags):
+    """
+    Version of every tag, created for the tags that have none yet.
+    """
+    keys = {tag: _version_key(tag) for tag in tags}
+    found = cache.get_many(keys.values())
+    versions = {}
+    for tag, key in keys.items():
+        version = found.get(key)
+        if version is None:
+            version = uuid.uuid4().hex
+            if not cache.add(key, version, None):
+                version = cache.get(key, version)
+        versions[tag] = version
+    return versions
+
+
+def _version_keys_of(key):
+    """
+    The version keys of the entry at `key` when it was last read or written in this
+    process, so a hit fetches the entry and its versions with one `get_many`.
+    """
+    with _hints_lock:
+        keys = _hints.get(key, ())
+        if keys:
+            _hints.move_to_end(key)
+        return keys
+
+
+def _remember_version_keys(key, version_keys):
+    with _hints_lock:
+        _hints[key] = tuple(version_keys)
+        _hints.move_to_end(key)
+        while len(_hints) > HINT_SIZE:
+            _hints.popitem(last=False)
+
+
+def _is_public(post_id):
+    from post.models import Post
+    return Post.objects.filter(pk=post_id, visibility='public', is_deleted=False).exists()
+
+
+def _respond(request, data, etag):
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data, status=status.HTTP_200_OK)
+    response['ETag'] = etag
+    return response
+
+
+def cached_response(request):
+    """
+    The cached response to a GET of the request URL (query included), None on a miss.
+    Answers 304 when `If-None-Match` has its ETag. The entry and the versions of its tags
+    are read with one `get_many`. Responses about a post are only served while the post
+    is still public and not deleted (one query), so a lost invalidation never shows a
+    post that was made private.
+    """
+    if request.method != 'GET':
+        return None
+    key = _entry_key(request)
+    hinted = _version_keys_of(key)
+    found = cache.get_many([key, *hinted])
+    entry = found.get(key)
+    if entry is None:
+        return None
+    version_keys = {tag: _version_key(tag) for tag in entry['versions']}
+    missing = [version_key for version_key in version_keys.values() if version_key not in hinted]
+    if missing:
+        # first read in this process, or the entry was cached again with other tags
+        found.update(cache.get_many(missing))
+        _remember_version_keys(key, version_keys.values())
+    if any(found.get(version_keys[tag]) != version for tag, version in entry['versions'].items()):
+        return None
+    if entry.get('post') is not None and not _is_public(entry['post']):
+        return None
+    return _respond(request, entry['data'], entry['etag'])
+
+
+def cache_response(request, response, tags=(), post=None):
+    """
+    Caches a 200 `response` to a GET of the request URL. Only pass responses that are the
+    same for every caller, i.e. of public objects; `post` is the public post the response
+    is about.
+    The entry is tagged with `tags`, the post and every author nested in the data, and
+    dropped when one of them is invalidated. Returns the response to send (with an ETag,
+    or a 304).
+    """
+    if request.method != 'GET' or response.status_code != status.HTTP_200_OK:
+        return response
+    text = json.dumps(response.data, cls=JSONEncoder)
+    data = json.loads(text)
+    etag = f'"{_hash(text)}"'
+    tags = set(tags) | {author_tag(fqid) for fqid in _authors_in(data)}
+    if post is not None:
+        tags.add(post_tag(post.pk))
+    entry = {'versions': _current_versions(tags), 'post': post and post.pk, 'data': data, 'etag': etag}
+    key = _entry_key(request)
+    cache.set(key, entry, TIMEOUT)
+    _remember_version_keys(key, [_version_key(tag) for tag in tags])
+    return _respond(request, data, etag)
+
+
+def invalidate(*tags):
+    """
+    Drops every cached response tagged with one of `tags`.
+    """
+    cache.delete_many([_version_key(tag) for tag in tags])
+
+
+def clear():
+    """
+    Drops every cached response.
+    """
+    cache.clear()
+    with _hints_lock:
+        _hints.clear()
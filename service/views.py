@@ -1,11 +1,11 @@
 from django.shortcuts import render, get_object_or_404
 from django.http import HttpResponse
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 from rest_framework import status
-from service.utils.jwt_auth import create_token
+from service.utils.jwt_auth import create_token, create_user_token
 from django.contrib.auth.hashers import make_password, check_password
 from . import authentication, serializers, models
 from django.contrib.auth.models import User
@@ -15,16 +15,17 @@ from drf_spectacular.utils import extend_schema, OpenApiParameter, OpenApiTypes
 from author.models import Author
 from post.models import Post
 from service.serializers import Follow, FollowSerializer
-from rest_framework.permissions import AllowAny
+from rest_framework.permissions import AllowAny, IsAdminUser
 from author.serializers import AuthorSerializer
 from like.serializers import LikeSerializer
 from comment.serializer import CommentSerializer, Comment
 from post.serializers import PostSerializer
 import urllib.parse
-import requests
 from rest_framework.exceptions import ValidationError
 from service.models import Node
-from service.utils.jwt_auth import create_hearders
+from service.utils import friends, outbox
+from service.utils.federation import client
+from service.utils.author_sync import store_remote_authors, validate_remote_authors
 
 # Later on, the index function will be used to handle incoming requests to polls/ and it will return the hello world string shown below.
 def index(request):
@@ -52,6 +53,8 @@ class Login(APIView):
         5. Generates an authentication token for the user, with a payload containing:
         - The author's serial ID.
         - The user's username.
+        - The author id, active and staff flags and token version, so authenticated
+          requests do not need to load the user (see `create_user_token`).
         - Token validity is set for 100,000 seconds.
         6. Returns HTTP 200 with:
         - A valid authentication token.
@@ -83,7 +86,7 @@ class Login(APIView):
             if not check_password(password, user.password):
                  return Response({'error': 'Invalid username or password.'}, status=status.HTTP_401_UNAUTHORIZED)
             
-            token = create_token({'id': user.author.serial, 'username': user.username}, 100000)
+            token = create_user_token(user, user.author, 100000)
 
             return Response({
                 'token': token,
@@ -191,7 +194,7 @@ def forward_follow_request(request):
     1. **POST**: Sends a follow request from the authenticated user to another author.
     - If the authors are already friends, returns a success message.
     - If a follow request already exists or the user is already following the target author, returns a conflict message.
-    - Creates a `Follow` object with:
+    - Gets or creates the `Follow` object (unique per follower and followed author) with:
         - `pending='no'` if the target author is on a remote node and the node is trusted.
         - `pending='yes'` otherwise.
     - Forwards the follow request to the target author's inbox if the target is on a remote node.
@@ -214,7 +217,7 @@ def forward_follow_request(request):
     - POST:
     - HTTP 201 with follow request details if successful.
     - HTTP 409 if a follow request already exists or the user is already following the target author.
-    - HTTP 400 if the target node rejects the request or if the follow relationship cannot be created.
+    - HTTP 400 if the follow relationship cannot be created.
     - DELETE:
     - HTTP 200 if the unfollow action is successful.
     - HTTP 400 if the unfollow action fails.
@@ -224,7 +227,8 @@ def forward_follow_request(request):
     Special Cases:
     - Handles follow requests for remote nodes:
     - Ensures the target node is trusted (`Node.is_allowed=True`).
-    - Forwards follow requests to the target node's inbox.
+    - Forwards follow requests to the target node's inbox through the durable outbox
+      (`service.utils.outbox`), so an unavailable node is retried instead of failing the request.
     - Supports rejection of follow requests by deleting the `Follow` object.
     """
 
@@ -243,23 +247,17 @@ def forward_follow_request(request):
             # create the object author's object if author doesn't exist
             object = get_or_create_copy_author_object(request.data.get("object", {}))
             
-            follow_exists = Follow.objects.filter(follower=actor, followed=object, pending='no').exists() # already followed
-            unapproved_follow_exists = Follow.objects.filter(follower=actor, followed=object, pending='yes').exists() # not yet approved
-            mutual_follow = Follow.objects.filter(follower=object, followed=actor, pending='no').exists() # object author followed current already
-
-            if follow_exists and mutual_follow:
-                return Response({"detail": "Authors are already friends."}, status=status.HTTP_200_OK)
-            elif follow_exists:
-                return Response({"detail": "Already following."}, status=status.HTTP_409_CONFLICT)
-            elif unapproved_follow_exists:
-                return Response({"detail": "Follow request already exists."}, status=status.HTTP_409_CONFLICT)
-
             # assuming following for remote nodes and not for local
-            nodes_exists = Node.objects.filter(is_allowed=True, url=object.host).exists()
-            if nodes_exists:
-                Follow.objects.create(follower=actor, followed=object, pending='no')
-            else:
-                Follow.objects.create(follower=actor, followed=object, pending='yes')
+            node = Node.objects.filter(is_allowed=True, url=object.host).first()
+            # (follower, followed) is unique, concurrent requests end up with the same row
+            follow, created = Follow.objects.get_or_create(follower=actor, followed=object,
+                                                           defaults={'pending': 'no' if node else 'yes'})
+            if not created:
+                if follow.pending == 'no' and friends.are_friends(actor, object):
+                    return Response({"detail": "Authors are already friends."}, status=status.HTTP_200_OK)
+                elif follow.pending == 'no':
+                    return Response({"detail": "Already following."}, status=status.HTTP_409_CONFLICT)
+                return Response({"detail": "Follow request already exists."}, status=status.HTTP_409_CONFLICT)
 
             response_data = {
                 "type": "follow",
@@ -268,30 +266,12 @@ def forward_follow_request(request):
                 "object": AuthorSerializer(object).data,
             }
             
-            # forward follow request
+            # forward follow request, the outbox retries it until the remote inbox accepts it
             if object.host != actor.host:            
-                if nodes_exists:
-                    node = Node.objects.get(is_allowed=True, url=object.host)                
-                    print(node.username, node.password)
-                    headers = create_hearders(node)
-                    try:
-                        response = requests.post(f"{object.fqid}/inbox", headers=headers, json=request.data)
-                        
-                        if response.status_code == 201 or response.status_code == 200:
-                            try:
-                                response_data = response.json()
-                                
-                            except ValidationError as e:
-                                print(f"Validation Error: {e.detail}")
-                                return Response({"error": e.detail},  status=status.HTTP_400_BAD_REQUEST)
-                        else:
-                            print(f"Failed POST request to {node.url} with {response}")
-                            return Response(f"Failed POST request to  {node.url} with {response}", status=status.HTTP_400_BAD_REQUEST)
-                            
-                    except requests.RequestException as e:
-                        print(f"Error forward follow request to {node.url}: {e}")
+                if node:
+                    outbox.enqueue(node, f"{object.fqid}/inbox", request.data, object.fqid, actor)
                 else:
-                    print(f"Error fetching from {node.url}")
+                    outbox.dead_letter(object.fqid, f"Error fetching from {object.host}", request.data, actor)
 
             return Response(response_data, status=status.HTTP_201_CREATED)
 
@@ -579,25 +559,96 @@ def inbox(request, AUTHOR_SERIAL):
         return Response({"error": "Type is not found in the feild."}, status=status.HTTP_400_BAD_REQUEST)
     
     if type == 'like':
-        return handle_like_inbox(request, author)
+        return handle_like_inbox(request, author, request.data)
         
     elif type == 'follow':
-        return handle_follow_inbox(request, author)
+        return handle_follow_inbox(request, author, request.data)
 
     elif type == 'comment':
-        return handle_comment_inbox(request, author)
+        return handle_comment_inbox(request, author, request.data)
     
     elif type == 'post':
-        return handle_post_inbox(request, author)
+        return handle_post_inbox(request, author, request.data)
        
     return Response({"error": "Nothing matched with feild 'type'"},status=status.HTTP_400_BAD_REQUEST)
 
-def handle_like_inbox(request, author):
+@api_view(['GET', 'POST'])
+def inbox_batch(request):
+    """
+    Receives one object for several local authors in a single request, so a remote
+    node does not have to send the same post to each follower's inbox.
+
+    URL Pattern:
+    - ://service/api/inbox/batch
+    - GET [remote]: Advertises batch support, returns `{"type": "inbox-batch", "max_recipients": N}`.
+    - POST [remote]: Delivers `object` to the inbox of every author in `recipients`.
+
+    Body:
+    - `"type": "inbox-batch"`.
+    - `recipients`: list of author serials on this node.
+    - `object`: the like, follow, comment or post, as sent to a single inbox.
+
+    Behavior:
+    - Posts are stored once, whatever the number of recipients.
+    - Likes and comments are only for the owner of the liked/commented object (the
+      author in its fqid): they are handled for that recipient, the others get 400.
+    - Follow requests are recorded for each recipient.
+
+    Returns:
+    - HTTP 200 with `results`, the inbox status code of every recipient serial
+      (404 for unknown authors).
+    - HTTP 400 if the body is malformed or has more than `max_recipients` recipients.
+    """
+    if request.method == 'GET':
+        return Response({"type": outbox.BATCH_TYPE, "max_recipients": outbox.BATCH_MAX}, status=status.HTTP_200_OK)
+
+    recipients = request.data.get("recipients")
+    data = request.data.get("object")
+    if request.data.get("type") != outbox.BATCH_TYPE or not isinstance(recipients, list) or not isinstance(data, dict):
+        return Response({"error": "Expected type 'inbox-batch' with a 'recipients' list and an 'object'."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(recipients) > outbox.BATCH_MAX:
+        return Response({"error": f"At most {outbox.BATCH_MAX} recipients per batch."}, status=status.HTTP_400_BAD_REQUEST)
+
+    handlers = {
+        'like': handle_like_inbox,
+        'follow': handle_follow_inbox,
+        'comment': handle_comment_inbox,
+        'post': handle_post_inbox,
+    }
+    handler = handlers.get(data.get('type'))
+    if handler is None:
+        return Response({"error": "Nothing matched with feild 'type'"}, status=status.HTTP_400_BAD_REQUEST)
+
+    serials = [int(serial) for serial in recipients if str(serial).isdigit()]
+    authors = {str(author.serial): author for author in Author.objects.filter(serial__in=serials, is_deleted=False)}
+    results = {str(serial): status.HTTP_404_NOT_FOUND for serial in recipients}
+
+    if handler is handle_follow_inbox:
+        for serial, author in authors.items():
+            results[serial] = handler(request, author, data).status_code
+    elif handler is handle_post_inbox:
+        if authors:
+            # the post is shared by every recipient, store it once
+            code = handler(request, next(iter(authors.values())), data).status_code
+            for serial in authors:
+                results[serial] = code
+    else:
+        target = str(data.get("object") if handler is handle_like_inbox else data.get("post"))
+        for serial, author in authors.items():
+            if target.startswith(f"{author.fqid}/"):
+                results[serial] = handler(request, author, data).status_code
+            else:
+                results[serial] = status.HTTP_400_BAD_REQUEST
+
+    return Response({"type": outbox.BATCH_TYPE, "results": results}, status=status.HTTP_200_OK)
+
+def handle_like_inbox(request, author, data):
     """
     Handles incoming like objects sent to an author's inbox.
 
     Parameters:
-    - `request`: The incoming HTTP request containing the like data.
+    - `request`: The incoming HTTP request.
+    - `data`: The like object.
     - `author`: The target author to whom the like is being sent.
 
     Behavior:
@@ -624,41 +675,39 @@ def handle_like_inbox(request, author):
     - Automatically creates a local copy of the sender's author object if it does not exist.
     """
 
-    object = request.data.get("object")
+    object = data.get("object")
     if not object and str(author.host) not in object:
         return Response({"error": f"object is not own by {author}."}, status=status.HTTP_400_BAD_REQUEST)
     
-    like_fqid = request.data.get("id")
-    sender = get_or_create_copy_author_object(request.data.get("author", {}))
+    like_fqid = data.get("id")
+    sender = get_or_create_copy_author_object(data.get("author", {}))
     print(f"{author} received a like from {sender}")
-    serializer = LikeSerializer(data=request.data)
+    serializer = LikeSerializer(data=data)
     if serializer.is_valid():
         serializer.save(author=sender, fqid=like_fqid)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     else:
         return Response({"errors": serializer.errors}, status=status.HTTP_400_BAD_REQUEST)
 
-def handle_follow_inbox(request, author):
+def handle_follow_inbox(request, author, data):
     """
     Handles incoming follow requests sent to an author's inbox.
 
     Parameters:
-    - `request`: The incoming HTTP request containing the follow request data.
+    - `request`: The incoming HTTP request.
+    - `data`: The follow request object.
     - `author`: The target author to whom the follow request is being sent.
 
     Behavior:
     1. Extracts the actor's details from the request data and ensures their author object exists locally:
     - If not, creates a copy using `get_or_create_copy_author_object`.
-    2. Checks the existing follow relationships:
-    - `follow_exists`: If the actor is already following the target author.
-    - `unapproved_follow_exists`: If a follow request from the actor is pending approval.
-    - `mutual_follow`: If the target author is already following the actor.
-    3. Responds based on the follow relationship status:
-    - If the authors are mutual followers (`follow_exists` and `mutual_follow`), returns HTTP 200 with a message indicating they are already friends.
+    2. Gets or creates the `Follow` object (`pending='yes'` when created). `(follower, followed)`
+    is unique, so retried or concurrent deliveries never create a second row.
+    3. If the follow already existed, responds based on its status:
+    - If the authors are mutual followers, returns HTTP 200 with a message indicating they are already friends.
     - If the actor is already following the target author, returns HTTP 409 with a conflict message.
     - If a follow request is pending, returns HTTP 409 with a conflict message.
-    4. If no existing follow relationship conflicts:
-    - Creates a new `Follow` object with `pending='yes'`.
+    4. If the follow request is new:
     - Constructs a response object containing:
         - Type: `"follow"`.
         - Summary: A description of the follow request.
@@ -679,20 +728,16 @@ def handle_follow_inbox(request, author):
 
     object_author = author
 
-    actor = get_or_create_copy_author_object(request.data.get("actor", {}))
-    
-    follow_exists = Follow.objects.filter(follower=actor, followed=object_author, pending='no').exists() # already follow request already exists
-    unapproved_follow_exists = Follow.objects.filter(follower=actor, followed=object_author, pending='yes').exists() # not yet approved
-    mutual_follow = Follow.objects.filter(follower=object_author, followed=actor, pending='no').exists() # object_author followed actor already
-        
-    if follow_exists and mutual_follow:
-        return Response({"detail": "Authors are already friends."}, status=status.HTTP_200_OK)
-    elif follow_exists:
-        return Response({"detail": "Already following."}, status=status.HTTP_409_CONFLICT)
-    elif unapproved_follow_exists:
-        return Response({"detail": "Follow request already exists."}, status=status.HTTP_409_CONFLICT)    
+    actor = get_or_create_copy_author_object(data.get("actor", {}))
     
-    Follow.objects.create(follower=actor, followed=object_author, pending='yes')
+    # (follower, followed) is unique, a retried delivery finds the existing row
+    follow, created = Follow.objects.get_or_create(follower=actor, followed=object_author, defaults={'pending': 'yes'})
+    if not created:
+        if follow.pending == 'no' and friends.are_friends(actor, object_author):
+            return Response({"detail": "Authors are already friends."}, status=status.HTTP_200_OK)
+        elif follow.pending == 'no':
+            return Response({"detail": "Already following."}, status=status.HTTP_409_CONFLICT)
+        return Response({"detail": "Follow request already exists."}, status=status.HTTP_409_CONFLICT)
     
     response_data = {
             "type": "follow",
@@ -703,12 +748,13 @@ def handle_follow_inbox(request, author):
 
     return Response(response_data, status=status.HTTP_201_CREATED)
     
-def handle_comment_inbox(request, author):
+def handle_comment_inbox(request, author, data):
     """
     Handles incoming comment objects sent to an author's inbox.
 
     Parameters:
-    - `request`: The incoming HTTP request containing the comment data.
+    - `request`: The incoming HTTP request.
+    - `data`: The comment object.
     - `author`: The target author to whom the comment is being sent.
 
     Behavior:
@@ -745,24 +791,23 @@ def handle_comment_inbox(request, author):
     """
 
     # check if post exists
-    post_fqid = request.data.get("post")
-    print(request.data)
+    post_fqid = data.get("post")
     post_exists = Post.objects.filter(fqid=post_fqid, is_deleted=False).exists()
     if not post_exists:
         return Response({"error": "post field is required."}, status=status.HTTP_400_BAD_REQUEST)
     post = get_object_or_404(Post, fqid=post_fqid, is_deleted=False)
 
     # create an author copy if author doesn't exists
-    sender = get_or_create_copy_author_object(request.data.get("author", {}))
+    sender = get_or_create_copy_author_object(data.get("author", {}))
     
     print(f"{author} received a comment from {sender}")
     
-    comment_fqid = request.data.get("id")
+    comment_fqid = data.get("id")
     comment_exists = Comment.objects.filter(fqid=comment_fqid, is_deleted=False).exists()
     
     if not comment_exists:
         try:
-            serializer = CommentSerializer(data=request.data, context={'request': request})
+            serializer = CommentSerializer(data=data, context={'request': request})
             if serializer.is_valid():
                 serializer.save(author=sender, fqid=comment_fqid)
                 print(f"Comment copy created successfully: {sender.display_name} (fqid: {sender.fqid})")
@@ -781,19 +826,20 @@ def handle_comment_inbox(request, author):
     
     else:
         print("Comment copy need updates")
-    serializer = CommentSerializer(data=request.data, context={'request': request})
+    serializer = CommentSerializer(data=data, context={'request': request})
     if serializer.is_valid():
         serializer.save(post=post, author=sender)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     return Response({"error": "Post doesn't matched with AUTHOR_SERIAL"},status=status.HTTP_400_BAD_REQUEST)
  
-def handle_post_inbox(request, author):
+def handle_post_inbox(request, author, data):
     """
     Handles incoming post objects sent to an author's inbox.
 
     Parameters:
-    - `request`: The incoming HTTP request containing the post data.
+    - `request`: The incoming HTTP request.
+    - `data`: The post object.
     - `author`: The target author to whom the post is being sent.
 
     Behavior:
@@ -823,15 +869,15 @@ def handle_post_inbox(request, author):
     """
 
     # create an author copy if author doesn't exists
-    sender = get_or_create_copy_author_object(request.data.get("author", {}))
+    sender = get_or_create_copy_author_object(data.get("author", {}))
     
     print(f"{author} received a post from {sender}")
-    post_fqid = request.data.get("id")
+    post_fqid = data.get("id")
     post_exists = Post.objects.filter(fqid=post_fqid, is_deleted=False).exists()
     # create a post copy if post doesn't exists
     if not post_exists:
         try:
-            serializer = PostSerializer(data=request.data, context={'request': request})
+            serializer = PostSerializer(data=data, context={'request': request})
             if serializer.is_valid():
                 serializer.save(author=sender, fqid=post_fqid)
                 print(f"Post copy created successfully: {sender.display_name} (fqid: {sender.fqid})")
@@ -851,7 +897,7 @@ def handle_post_inbox(request, author):
     # update a post
     else:
         post = get_object_or_404(Post, fqid=post_fqid, is_deleted=False)
-        serializer = PostSerializer(post, data=request.data, partial=True)
+        serializer = PostSerializer(post, data=data, partial=True)
         if serializer.is_valid():
             serializer.save()
             print(f"Post copy updated successfully: {sender.display_name} (fqid: {sender.fqid})")
@@ -872,10 +918,9 @@ def get_or_create_copy_author_object(author_data):
     1. Checks if an author with the specified `fqid` exists locally and is not marked as deleted (`is_deleted=False`).
     - If the author exists, retrieves and returns the existing `Author` object.
     2. If the author does not exist:
-    - Validates the provided `author_data` using the `AuthorSerializer`.
-    - Creates and saves a new local copy of the author.
-    - Logs the successful creation of the author copy.
-    - Returns the newly created `Author` object.
+    - Validates the provided `author_data` using the `RemoteAuthorSerializer`.
+    - Upserts a local copy of the author from the validated data through `store_remote_authors`.
+    - Returns the stored `Author` object.
     3. Handles validation errors during the creation process:
     - Raises a `ValidationError` if the provided `author_data` is invalid.
 
@@ -892,19 +937,73 @@ def get_or_create_copy_author_object(author_data):
 
     fqid = author_data.get("id")
     
-    if Author.objects.filter(fqid=fqid, is_deleted=False).exists():
-        return get_object_or_404(Author, fqid=fqid, is_deleted=False)
-    else:
-        serializer = AuthorSerializer(data=author_data)
-        if serializer.is_valid():
-            author = serializer.save(fqid=fqid)
-            print(f"Author copy created successfully: {author.display_name} (fqid: {author.fqid})")
-            return author
-        else:
-            raise ValidationError(serializer.errors)
+    author = Author.objects.filter(fqid=fqid, is_deleted=False).first()
+    if author:
+        return author
+
+    valid, errors = validate_remote_authors([author_data])
+    if errors:
+        raise ValidationError(next(iter(errors.values())))
+    ids = store_remote_authors(valid)
+    if not ids:
+        raise ValidationError({"id": ["This id belongs to a local author."]})
+    author = Author.objects.get(pk=next(iter(ids.values())))
+    print(f"Author copy created successfully: {author.display_name} (fqid: {author.fqid})")
+    return author
             
 
 
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def outbox_stats(request):
+    """
+    Reports the federation delivery queue of every node and HTTP connection reuse.
+
+    URL Pattern:
+    - ://service/api/outbox/stats
+    - GET [local, admin only]: Returns per node queue depth and delivery latency.
+
+    Returns:
+    - HTTP 200 with:
+    - `"type": "outbox"`.
+    - `"nodes"`: one entry per node with `pending`, `dead`, `delivered` (last hour),
+      `avg_latency_ms` (last hour) and `oldest_pending_seconds`.
+    - `"connections"`: connection reuse of this process per remote host
+      (`requests`, `connections` opened, `reused`).
+    """
+    return Response({"type": "outbox", "nodes": models.Outbox.objects.stats(), "connections": client.stats()},
+                    status=status.HTTP_200_OK)
+
+
+
+@api_view(['GET'])
+def outbox_status(request, AUTHOR_SERIAL):
+    """
+    Reports where the deliveries of one of an author's posts, comments or likes stand.
+
+    URL Pattern:
+    - ://service/api/authors/{AUTHOR_SERIAL}/outbox?object={OBJECT_FQID}
+    - GET [local, the author or an admin]: Returns the delivery of the object to every
+      remote recipient.
+
+    Parameters:
+    - object: fqid of the post, comment or like.
+
+    Returns:
+    - HTTP 200 with:
+    - `"type": "deliveries"` and the `"object"` fqid.
+    - `"src"`: one entry per recipient (batch deliveries expanded), see
+      `service.utils.outbox.delivery_status`.
+    - HTTP 400 without `object`, HTTP 403 for other users.
+    """
+    author = get_object_or_404(Author, serial=AUTHOR_SERIAL)
+    if not request.user.is_authenticated or not (request.user.is_staff or request.user.author == author):
+        return Response({"detail": "You are not authorized to see these deliveries."}, status=status.HTTP_403_FORBIDDEN)
+    object_fqid = request.query_params.get("object")
+    if not object_fqid:
+        return Response({"error": "The 'object' parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"type": "deliveries", "object": object_fqid, "src": outbox.delivery_status(author, object_fqid)},
+                    status=status.HTTP_200_OK)
 
 '''
 The edit_profile function allows the user to edit their profile. The user must be logged in to edit their profile.